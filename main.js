@@ -2,11 +2,47 @@ const { app, BrowserWindow, ipcMain, shell } = require('electron');
 const path = require('path');
 const fs = require('fs');
 const os = require('os');
+const http = require('http');
 const { execSync } = require('child_process');
 
 let mainWindow = null;
 const dataDir = path.join(os.homedir(), '.storage_intelligence');
 
+// Python daemon (file_daemon.py --server) answering from its warm scan index
+const daemonPort = parseInt(process.env.STORAGE_INTELLIGENCE_PORT || '8888', 10);
+const daemonCache = {};  // method -> { etag, result }
+
+function callDaemon(method, params = {}, timeoutMs = 2000) {
+    // JSON-RPC call to the daemon; resolves null when it isn't running
+    return new Promise((resolve) => {
+        const body = JSON.stringify({ jsonrpc: '2.0', id: Date.now(), method, params });
+        const headers = { 'Content-Type': 'application/json', 'Content-Length': Buffer.byteLength(body) };
+        const cached = daemonCache[method];
+        if (cached) headers['If-None-Match'] = cached.etag;
+
+        const req = http.request({ host: '127.0.0.1', port: daemonPort, path: '/rpc', method: 'POST', headers }, (res) => {
+            let data = '';
+            res.on('data', (chunk) => { data += chunk; });
+            res.on('end', () => {
+                // Unchanged since the last call: nothing was computed or sent
+                if (res.statusCode === 304 && cached) return resolve(cached.result);
+                try {
+                    const reply = JSON.parse(data);
+                    if (reply.error) return resolve(null);
+                    if (res.headers.etag) daemonCache[method] = { etag: res.headers.etag, result: reply.result };
+                    resolve(reply.result);
+                } catch (e) {
+                    resolve(null);
+                }
+            });
+        });
+        req.on('error', () => resolve(null));
+        req.setTimeout(timeoutMs, () => req.destroy());
+        req.write(body);
+        req.end();
+    });
+}
+
 // Helper functions for system scanning
 function formatBytes(bytes) {
     if (bytes === 0) return '0 B';
@@ -306,8 +342,19 @@ app.on('activate', function() {
 
 ipcMain.handle('run-analysis', async function(event, options) {
     try {
-        // Perform real system analysis
-        var analysis = await performSystemAnalysis(options || {});
+        // The daemon's index answers in milliseconds; scan here when it
+        // isn't running, hasn't finished a first scan, or doesn't monitor
+        // the folders this scan covers (a full system scan always runs here).
+        // `file_daemon.py --server` monitors the home folder alongside
+        // Downloads unless given --path, so the home scan is covered
+        options = options || {};
+        var analysis = null;
+        if (!options.fullSystemScan) {
+            analysis = await callDaemon('dashboard-analysis', { paths: [os.homedir()] });
+        }
+        if (!analysis) {
+            analysis = await performSystemAnalysis(options);
+        }
 
         var analysisPath = path.join(dataDir, 'latest_analysis.json');
         fs.writeFileSync(analysisPath, JSON.stringify(analysis, null, 2));
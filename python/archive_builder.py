@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Archive Builder - Parallel, streaming tar archives for cloud upload
+
+Features:
+- Files grouped per destination and split into chunks of a target size
+- One chunk per worker process: each streams its files into a compressed
+  tar (gzip or lzma from the stdlib), so every core compresses at once
+- Large, settled files read through mmap, others through large buffered
+  reads, hashing (sha256) on the way into the archive
+- A file that shrinks or fails mid-read is padded to the size in its tar
+  header and reported, so the members after it stay readable
+- Chunks are built under a staging directory and swapped in only once the
+  whole build succeeded; a failed build leaves the previous archives alone
+- JSON manifest with per-file and per-archive digests
+"""
+
+import os
+import mmap
+import time
+import shutil
+import tarfile
+import hashlib
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from snapshot_store import atomic_write_json
+
+GB = 1024 ** 3
+READ_BUFFER = 4 * 1024 * 1024
+MMAP_THRESHOLD = 64 * 1024 * 1024
+# Files modified this recently may still be written to: truncating a mapped
+# file kills the reader with SIGBUS, so they are read, not mapped
+MMAP_SETTLED_SECONDS = 300
+
+CODECS = {
+    'gz': ('w|gz', '.tar.gz'),
+    'xz': ('w|xz', '.tar.xz'),
+    'none': ('w|', '.tar'),
+}
+
+
+class _HashingReader:
+    """
+    File-like wrapper that hashes everything tarfile reads through it
+
+    Always delivers the `size` bytes the tar header promised: if the file
+    ends early or a read fails, the rest is zero padding and `error` says
+    why, so the tar stream stays well-formed.
+    """
+
+    def __init__(self, source, size):
+        self.source = source
+        self.remaining = size
+        self.digest = hashlib.sha256()
+        self.error = None
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = b''
+        if self.error is None:
+            try:
+                data = self.source.read(size)
+            except OSError as e:
+                self.error = str(e)
+            else:
+                self.digest.update(data)
+                if len(data) < size:
+                    self.error = 'file shrank while being archived'
+        if len(data) < size:
+            data += bytes(size - len(data))
+        self.remaining -= len(data)
+        return data
+
+
+class _HashingWriter:
+    """File-like wrapper that hashes and counts the compressed output"""
+
+    def __init__(self, target):
+        self.target = target
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.digest.update(data)
+        self.size += len(data)
+        return self.target.write(data)
+
+    def flush(self):
+        self.target.flush()
+
+
+def plan_chunks(files, chunk_size):
+    """
+    Split [(path, arcname, size)] into chunks of at most chunk_size bytes
+
+    Files larger than chunk_size get a chunk of their own. Order is kept, so
+    files from one folder tend to share a chunk (better compression).
+    """
+
+    chunks, current, current_size = [], [], 0
+    for path, arcname, size in files:
+        if current and current_size + size > chunk_size:
+            chunks.append(current)
+            current, current_size = [], 0
+        current.append((path, arcname, size))
+        current_size += size
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _add_file(archive, path, arcname):
+    """
+    Stream one file into the tar; returns (manifest entry, error)
+
+    Everything that can fail before the header is written (open, stat,
+    mmap) is done first, so an unreadable file adds nothing. Once the
+    header is out the member is always completed; a file that changed
+    meanwhile is padded and reported instead of listed.
+    """
+
+    try:
+        f = open(path, 'rb', buffering=READ_BUFFER)
+    except OSError as e:
+        return None, str(e)
+
+    mapped = None
+    try:
+        try:
+            info = archive.gettarinfo(arcname=arcname, fileobj=f)
+            st = os.fstat(f.fileno())
+            if (info.size >= MMAP_THRESHOLD and info.size == st.st_size
+                    and time.time() - st.st_mtime > MMAP_SETTLED_SECONDS):
+                mapped = mmap.mmap(f.fileno(), info.size, access=mmap.ACCESS_READ)
+        except OSError as e:
+            return None, str(e)
+
+        reader = _HashingReader(mapped if mapped is not None else f, info.size)
+        archive.addfile(info, reader)
+    finally:
+        if mapped is not None:
+            mapped.close()
+        f.close()
+
+    if reader.error:
+        return None, f'{reader.error} (archived member padded)'
+    return {'path': path, 'arcname': arcname, 'size': info.size, 'mtime': st.st_mtime,
+            'sha256': reader.digest.hexdigest()}, None
+
+
+def build_chunk(archive_path, files, codec='gz'):
+    """
+    Write one compressed tar (runs in a worker process)
+
+    Returns {'archive', 'files', 'errors', 'size', 'sha256', 'input_bytes'}.
+    """
+
+    mode, _ = CODECS[codec]
+    partial = archive_path + '.partial'
+    entries, errors = [], []
+
+    with open(partial, 'wb', buffering=READ_BUFFER) as raw:
+        writer = _HashingWriter(raw)
+        with tarfile.open(fileobj=writer, mode=mode) as archive:
+            for path, arcname, _ in files:
+                entry, error = _add_file(archive, path, arcname)
+                if entry is None:
+                    errors.append({'path': path, 'error': error})
+                else:
+                    entries.append(entry)
+        raw.flush()
+        os.fsync(raw.fileno())
+
+    os.replace(partial, archive_path)
+    return {
+        'archive': archive_path,
+        'files': entries,
+        'errors': errors,
+        'size': writer.size,
+        'sha256': writer.digest.hexdigest(),
+        'input_bytes': sum(entry['size'] for entry in entries)
+    }
+
+
+class ArchiveBuilder:
+    """
+    Builds chunked, compressed archives across a process pool
+
+    build({destination: [(path, arcname)]}) writes
+    `<output_dir>/<destination>_partNNN<ext>` archives and
+    `<output_dir>/<destination>_manifest.json` per destination. Parts are
+    built in `<output_dir>/.building/` and replace the previous build's
+    only when every chunk succeeded.
+    """
+
+    def __init__(self, output_dir, chunk_size=GB, codec='gz', workers=None):
+        if codec not in CODECS:
+            raise ValueError(f'Unknown codec: {codec}')
+        self.output_dir = Path(output_dir).expanduser()
+        self.chunk_size = chunk_size
+        self.codec = codec
+        self.workers = workers or os.cpu_count() or 1
+
+    def build(self, destinations, progress=None):
+        """Build every destination's archives; returns a summary with manifest paths"""
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        _, extension = CODECS[self.codec]
+        started = time.time()
+
+        # Left over from an interrupted build
+        staging = self.output_dir / '.building'
+        shutil.rmtree(staging, ignore_errors=True)
+        staging.mkdir()
+
+        jobs = []
+        for destination, files in destinations.items():
+            sized = []
+            for path, arcname in files:
+                try:
+                    sized.append((str(path), arcname, os.stat(path).st_size))
+                except OSError:
+                    continue
+            for number, chunk in enumerate(plan_chunks(sized, self.chunk_size), 1):
+                archive_path = str(staging / f'{destination}_part{number:03d}{extension}')
+                jobs.append((destination, archive_path, chunk))
+
+        results = {destination: [] for destination in destinations}
+        try:
+            with ProcessPoolExecutor(max_workers=min(self.workers, max(len(jobs), 1))) as pool:
+                futures = {pool.submit(build_chunk, archive_path, chunk, self.codec): destination
+                           for destination, archive_path, chunk in jobs}
+                for done, future in enumerate(as_completed(futures), 1):
+                    results[futures[future]].append(future.result())
+                    if progress:
+                        progress({'chunks_done': done, 'chunks_total': len(jobs)})
+
+            # Every chunk is built: swap this build's parts in for the last one's
+            for destination, chunks in results.items():
+                for stale in self.output_dir.glob(f'{destination}_part*'):
+                    stale.unlink()
+                for chunk in chunks:
+                    final = str(self.output_dir / os.path.basename(chunk['archive']))
+                    os.replace(chunk['archive'], final)
+                    chunk['archive'] = final
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+        summary = {'destinations': {}, 'input_bytes': 0, 'archive_bytes': 0}
+        for destination, chunks in results.items():
+            chunks.sort(key=lambda chunk: chunk['archive'])
+            manifest = {
+                'destination': destination,
+                'created': datetime.now().isoformat(),
+                'codec': self.codec,
+                'archives': [{'archive': os.path.basename(c['archive']), 'size': c['size'],
+                              'sha256': c['sha256'], 'input_bytes': c['input_bytes'],
+                              'files': c['files']} for c in chunks],
+                'errors': [error for c in chunks for error in c['errors']]
+            }
+            manifest_path = self.output_dir / f'{destination}_manifest.json'
+            atomic_write_json(manifest_path, manifest, indent=2)
+
+            input_bytes = sum(c['input_bytes'] for c in chunks)
+            archive_bytes = sum(c['size'] for c in chunks)
+            summary['destinations'][destination] = {
+                'archives': [c['archive'] for c in chunks],
+                'manifest': str(manifest_path),
+                'files': sum(len(c['files']) for c in chunks),
+                'errors': len(manifest['errors']),
+                'input_bytes': input_bytes,
+                'archive_bytes': archive_bytes
+            }
+            summary['input_bytes'] += input_bytes
+            summary['archive_bytes'] += archive_bytes
+
+        summary['elapsed_seconds'] = round(time.time() - started, 2)
+        return summary
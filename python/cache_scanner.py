@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Cache Scanner - Memoized cache-directory sizes with regrowth tracking
+
+Features:
+- One record per cache entry: size, file count, newest access, and the
+  mtime of every directory in the entry (its signature)
+- Unchanged entries are confirmed with one stat per directory instead of
+  a listing plus a stat per file; only changed entries are rescanned
+- Full-depth scans (no max_depth cut-off)
+- Size history per entry, growth per day, and regrowth after a clear:
+  caches that refill within hours are flagged as not worth deleting
+"""
+
+import os
+import json
+import time
+import stat as stat_module
+from pathlib import Path
+
+from scanner import CancellationToken, MountPolicy, ListingTimeout
+from snapshot_store import atomic_write_json
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+# A drop to below this fraction of the previous size counts as a clear
+CLEAR_RATIO = 0.5
+# Refilled to this fraction of the pre-clear size counts as regrown
+REGROWN_RATIO = 0.8
+# Regrowing faster than this makes deletion pointless
+QUICK_REFILL_HOURS = 48
+HISTORY_POINTS = 30
+
+
+class CacheScanner:
+    """
+    Persistent per-entry cache index
+
+    scan_entry(path) returns the entry's record, rescanning only when a
+    directory in it was added, removed or modified since the last scan.
+    """
+
+    def __init__(self, state_file, policy=None, cancel_token=None):
+        self.state_file = Path(state_file).expanduser()
+        self.policy = policy or MountPolicy()
+        self.cancel_token = cancel_token or CancellationToken()
+        self.entries = {}
+        self.stats = {'entries_rescanned': 0, 'entries_reused': 0}
+        self.load()
+
+    def load(self):
+        if self.state_file.exists():
+            try:
+                with open(self.state_file, 'r') as f:
+                    self.entries = json.load(f).get('entries', {})
+            except (OSError, ValueError):
+                self.entries = {}
+        return self
+
+    def save(self):
+        atomic_write_json(self.state_file, {'entries': self.entries})
+
+    def _signature_matches(self, record):
+        """True if every recorded directory still has its recorded mtime"""
+
+        for relative, mtime in record['directories'].items():
+            self.cancel_token.raise_if_cancelled()
+            path = os.path.join(record['path'], relative) if relative else record['path']
+            try:
+                if os.stat(path).st_mtime != mtime:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def _scan(self, path):
+        """Full-depth size, file count, newest access and directory mtimes"""
+
+        root_stat = os.stat(path)
+        result = {'size': 0, 'file_count': 0, 'newest_access': None, 'directories': {},
+                  'partial': False}
+        stack = [(path, root_stat.st_dev, self.policy.is_slow(path), root_stat.st_mtime)]
+
+        while stack:
+            self.cancel_token.raise_if_cancelled()
+            current, dev, slow, mtime = stack.pop()
+            relative = os.path.relpath(current, path)
+            result['directories']['' if relative == '.' else relative] = mtime
+
+            try:
+                entries = self.policy.list_directory(current, slow, root=path)
+            except ListingTimeout:
+                result['partial'] = True
+                self.policy.partial_paths.append(current)
+                continue
+            except OSError:
+                continue
+
+            for _, entry_path, st in entries:
+                if stat_module.S_ISDIR(st.st_mode):
+                    allowed, child_slow = self.policy.enter(dev, entry_path, st)
+                    if allowed:
+                        stack.append((entry_path, st.st_dev, slow if child_slow is None else child_slow,
+                                      st.st_mtime))
+                elif stat_module.S_ISREG(st.st_mode):
+                    result['size'] += st.st_size
+                    result['file_count'] += 1
+                    if result['newest_access'] is None or st.st_atime > result['newest_access']:
+                        result['newest_access'] = st.st_atime
+
+        return result
+
+    def scan_entry(self, path, now=None):
+        """Current record for one cache entry (None if it can't be read)"""
+
+        path = str(path)
+        now = now or time.time()
+        record = self.entries.get(path)
+
+        if record is not None and not record.get('partial') and self._signature_matches(record):
+            self.stats['entries_reused'] += 1
+        else:
+            try:
+                scanned = self._scan(path)
+            except OSError:
+                self.entries.pop(path, None)
+                return None
+            self.stats['entries_rescanned'] += 1
+            previous = record or {'history': [], 'clears': []}
+            record = dict(previous, path=path, scanned_at=now, **scanned)
+
+        self._observe(record, now)
+        self.entries[path] = record
+        return record
+
+    def _observe(self, record, now):
+        """Append a size observation and update growth and regrowth figures"""
+
+        history = record.setdefault('history', [])
+        clears = record.setdefault('clears', [])
+
+        if history and history[-1][1] > 0 and record['size'] < history[-1][1] * CLEAR_RATIO:
+            clears.append({'at': now, 'size_before': history[-1][1], 'size_after': record['size'],
+                           'regrown_at': None})
+            del clears[:-5]
+
+        history.append([now, record['size']])
+        del history[:-HISTORY_POINTS]
+
+        # Growth per day over the retained history (least squares)
+        record['growth_per_day'] = None
+        if len(history) >= 2:
+            n = len(history)
+            mean_t = sum(t for t, _ in history) / n
+            mean_s = sum(s for _, s in history) / n
+            variance = sum((t - mean_t) ** 2 for t, _ in history)
+            if variance:
+                slope = sum((t - mean_t) * (s - mean_s) for t, s in history) / variance
+                record['growth_per_day'] = slope * DAY
+
+        # Regrowth: how fast the entry refilled after its last clear
+        record['regrowth_hours'] = None
+        record['refills_quickly'] = False
+        if clears:
+            clear = clears[-1]
+            target = clear['size_before'] * REGROWN_RATIO
+            if clear['regrown_at'] is None and record['size'] >= target:
+                clear['regrown_at'] = now
+
+            if clear['regrown_at'] is not None:
+                record['regrowth_hours'] = (clear['regrown_at'] - clear['at']) / HOUR
+            elif now > clear['at'] and record['size'] > clear['size_after']:
+                # Not refilled yet: extrapolate the rate since the clear
+                rate = (record['size'] - clear['size_after']) / (now - clear['at'])
+                record['regrowth_hours'] = (target - clear['size_after']) / rate / HOUR
+
+            record['refills_quickly'] = (record['regrowth_hours'] is not None and
+                                         record['regrowth_hours'] <= QUICK_REFILL_HOURS)
+
+    def forget_missing(self, seen_paths, partial_locations=()):
+        """
+        Drop records for entries not seen in the latest pass
+
+        Entries under `partial_locations` (whose listing failed partway)
+        are kept: not reaching them says nothing about whether they exist.
+        """
+
+        seen = {str(path) for path in seen_paths}
+        partial = tuple(str(location).rstrip('/') + '/' for location in partial_locations)
+        for path in [p for p in self.entries if p not in seen and not p.startswith(partial)]:
+            del self.entries[path]
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Dashboard Service - The dashboard's analysis, answered from the warm index
+
+Features:
+- Same schema as the Electron dashboard's own scan (summary,
+  recommendations, caches, dev_environments, storage_plan)
+- node_modules and Python virtual environments found in the scan trees
+  already held by the daemon's ScanIndex: no directory is listed
+- Incremental: findings are memoized per directory and reused while its
+  subtree hash is unchanged, so only subtrees that changed since the last
+  scan are looked at again
+- Cache directories measured by a CacheScanner (one stat per directory
+  while unchanged), or read from the index when a scan tree covers them
+- Version derived from the trees' scan times, for response caching
+- Answers only for scan paths the indexed roots cover, so a caller asking
+  about more than the daemon watches falls back to its own scan
+"""
+
+import shutil
+import hashlib
+import threading
+import time
+from pathlib import Path
+
+from cache_scanner import CacheScanner
+
+MB = 1024 * 1024
+GB = 1024 * MB
+
+# Folders smaller than this are left out, as in the dashboard's own scan
+MIN_SIZE = MB
+VENV_NAMES = {'venv', '.venv', 'env'}
+# Not searched for project folders (caches are reported separately)
+SKIP_NAMES = {'Library'}
+
+# (name, path relative to home or absolute, safe to delete)
+CACHE_PATHS = [
+    ('Chrome', 'Library/Caches/Google/Chrome', True),
+    ('Safari', 'Library/Caches/com.apple.Safari', True),
+    ('Firefox', 'Library/Caches/Firefox', True),
+    ('Spotify', 'Library/Caches/com.spotify.client', True),
+    ('Slack', 'Library/Caches/com.tinyspeck.slackmacgap', True),
+    ('VS Code', 'Library/Caches/com.microsoft.VSCode', True),
+    ('Discord', 'Library/Caches/com.hnc.Discord', True),
+    ('Zoom', 'Library/Caches/us.zoom.xos', True),
+    ('Teams', 'Library/Caches/com.microsoft.teams', True),
+    ('npm', '.npm/_cacache', True),
+    ('Yarn', 'Library/Caches/Yarn', True),
+    ('Homebrew', 'Library/Caches/Homebrew', True),
+    ('pip', 'Library/Caches/pip', True),
+    ('CocoaPods', 'Library/Caches/CocoaPods', True),
+    ('System Caches', '/Library/Caches', False),
+    ('User Caches', 'Library/Caches', True),
+    ('System Logs', '/var/log', False),
+    ('User Logs', 'Library/Logs', True),
+    ('Trash', '.Trash', True),
+    ('Xcode DerivedData', 'Library/Developer/Xcode/DerivedData', True),
+    ('Xcode Archives', 'Library/Developer/Xcode/Archives', True),
+    ('iOS DeviceSupport', 'Library/Developer/Xcode/iOS DeviceSupport', True),
+    ('Docker', 'Library/Containers/com.docker.docker/Data', True),
+]
+
+
+def _is_venv(node):
+    if any(row[0] == 'pyvenv.cfg' for row in node['files']):
+        return True
+    for child in node['children']:
+        if child['name'] == 'bin':
+            return any(row[0] in ('python', 'activate') for row in child['files'])
+    return False
+
+
+class DashboardService:
+    """
+    Builds the dashboard analysis from a ScanIndex
+
+    One instance can serve every root of a daemon: all trees in the index
+    are covered.
+    """
+
+    def __init__(self, scan_index, state_file, policy=None, format_size=None, home=None):
+        self.scan_index = scan_index
+        self.home = Path(home).expanduser() if home else Path.home()
+        self.cache_scanner = CacheScanner(state_file, policy)
+        self.format_size = format_size or (lambda size: f'{size} B')
+        self._memo = {}   # directory path -> (subtree hash, findings)
+        self._lock = threading.Lock()
+
+    def version(self):
+        """Changes whenever a tree in the index is replaced"""
+
+        roots = self.scan_index.data['roots']
+        stamps = '\0'.join(f'{root}\0{entry["scanned_at"]}' for root, entry in sorted(roots.items()))
+        return hashlib.sha1(stamps.encode('utf-8')).hexdigest()[:16]
+
+    def _findings(self, node, memo, reused):
+        """[(kind, path, size)] for a subtree, reusing memoized subtrees with the same hash"""
+
+        cached = self._memo.get(node['path'])
+        if cached is not None and cached[0] == node.get('hash'):
+            memo[node['path']] = cached
+            reused[0] += 1
+            return cached[1]
+
+        name = node['name']
+        if name == 'node_modules':
+            findings = [('node_modules', node['path'], node['size'])] if node['size'] > MIN_SIZE else []
+        elif name in VENV_NAMES and _is_venv(node):
+            findings = [('python_venv', node['path'], node['size'])] if node['size'] > MIN_SIZE else []
+        else:
+            findings = []
+            for child in node['children']:
+                if child['name'] not in SKIP_NAMES:
+                    findings.extend(self._findings(child, memo, reused))
+
+        # Leaves are cheaper to revisit than to remember
+        if node['children'] and node.get('hash'):
+            memo[node['path']] = (node['hash'], findings)
+        return findings
+
+    @staticmethod
+    def _covered(path, roots):
+        """Whether a scan tree in the index contains `path`"""
+
+        path = str(path).rstrip('/') or '/'
+        return any(path == root or path.startswith(root.rstrip('/') + '/') for root in roots)
+
+    def _index_size(self, path, roots):
+        """Size of a directory from a scan tree that covers it, else None"""
+
+        path = str(path)
+        for root, entry in roots.items():
+            if path != root and not path.startswith(root.rstrip('/') + '/'):
+                continue
+            node = entry['tree']
+            for part in Path(path).relative_to(root).parts:
+                node = next((child for child in node['children'] if child['name'] == part), None)
+                if node is None:
+                    break
+            else:
+                return node['size']
+        return None
+
+    def _caches(self, roots):
+        caches = []
+        for name, location, safe in CACHE_PATHS:
+            path = Path(location) if location.startswith('/') else self.home / location
+            if not path.is_dir():
+                continue
+            size = self._index_size(path, roots)
+            if size is None:
+                record = self.cache_scanner.scan_entry(path)
+                size = record['size'] if record else 0
+            if size > MIN_SIZE:
+                caches.append({'name': name, 'path': str(path), 'size': size, 'safe': safe})
+        self.cache_scanner.save()
+        caches.sort(key=lambda cache: cache['size'], reverse=True)
+        return caches
+
+    def analysis(self, paths=None):
+        """
+        The dashboard analysis schema for `paths` (default: the home folder)
+
+        None before any tree has been indexed, or when the indexed roots do
+        not cover every requested path: a partial answer would silently
+        leave out whatever lies outside them.
+        """
+
+        started = time.time()
+        roots = self.scan_index.data['roots']
+        paths = [str(Path(path).expanduser()) for path in (paths or [self.home])]
+        if not roots or not all(self._covered(path, roots) for path in paths):
+            return None
+
+        with self._lock:
+            memo, reused = {}, [0]
+            findings = []
+            for entry in roots.values():
+                findings.extend(self._findings(entry['tree'], memo, reused))
+            findings = [finding for finding in findings
+                        if any(self._covered(finding[1], [path]) for path in paths)]
+            # Directories gone from the trees are forgotten
+            self._memo = memo
+            caches = self._caches(roots)
+
+        return self._report(findings, caches, roots, paths, reused[0], started)
+
+    def _items(self, entries, limit):
+        return [{'path': path, 'size': self.format_size(size)} for _, path, size in entries[:limit]]
+
+    def _report(self, findings, caches, roots, paths, reused, started):
+        fmt = self.format_size
+        node_modules = sorted((f for f in findings if f[0] == 'node_modules'), key=lambda f: f[2], reverse=True)
+        venvs = sorted((f for f in findings if f[0] == 'python_venv'), key=lambda f: f[2], reverse=True)
+        node_modules_total = sum(f[2] for f in node_modules)
+        venvs_total = sum(f[2] for f in venvs)
+        caches_total = sum(cache['size'] for cache in caches)
+        reclaimable = node_modules_total + venvs_total + caches_total
+
+        try:
+            used = shutil.disk_usage(self.home).used
+        except OSError:
+            used = reclaimable * 2
+
+        recommendations = []
+        if node_modules:
+            recommendations.append({
+                'priority': 'high' if node_modules_total > 10 * GB else 'medium',
+                'category': 'dev_bloat',
+                'title': f'Clean {len(node_modules)} node_modules Folders',
+                'description': f'Found {len(node_modules)} node_modules folders totaling '
+                               f'{fmt(node_modules_total)}. These can be regenerated with npm install.',
+                'space_savings': fmt(node_modules_total),
+                'risk': 'low',
+                'items': self._items(node_modules, 10)
+            })
+        if caches_total > GB:
+            recommendations.append({
+                'priority': 'high',
+                'category': 'caches',
+                'title': 'Clean Application Caches',
+                'description': f'Found {fmt(caches_total)} of caches that can be safely deleted.',
+                'space_savings': fmt(caches_total),
+                'risk': 'low'
+            })
+        if venvs:
+            recommendations.append({
+                'priority': 'medium',
+                'category': 'dev_bloat',
+                'title': f'Clean {len(venvs)} Python Virtual Environments',
+                'description': f'Found {len(venvs)} Python venvs totaling {fmt(venvs_total)}.',
+                'space_savings': fmt(venvs_total),
+                'risk': 'low',
+                'items': self._items(venvs, 10)
+            })
+
+        count = len(node_modules) + len(venvs) + len(caches)
+        elapsed = time.time() - started
+        return {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'scan_duration': f'{elapsed:.3f}s',
+            'source': 'index',
+            'index': {
+                'version': self.version(),
+                'roots': {root: entry['scanned_at'] for root, entry in roots.items()},
+                'covers': paths,
+                'subtrees_reused': reused
+            },
+            'summary': {
+                'total_storage': fmt(used),
+                'reclaimable': fmt(reclaimable),
+                'total_files': count,
+                'caches_size': fmt(caches_total),
+                'dev_bloat_size': fmt(node_modules_total + venvs_total)
+            },
+            'recommendations': recommendations,
+            'caches': [{'name': cache['name'], 'size': fmt(cache['size']), 'path': cache['path'],
+                        'safe': cache['safe']} for cache in caches],
+            'dev_environments': {
+                'node_modules': {'count': len(node_modules), 'size': fmt(node_modules_total),
+                                 'items': self._items(node_modules, 20)},
+                'python_venvs': {'count': len(venvs), 'size': fmt(venvs_total),
+                                 'items': self._items(venvs, 20)}
+            },
+            'storage_plan': {
+                'tier_1_keep_local': {'count': 0, 'size': fmt(0)},
+                'tier_4_safe_delete': {'count': count, 'size': fmt(reclaimable)}
+            }
+        }
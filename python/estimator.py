@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Estimator - Quick subtree size estimates by random directory sampling
+
+Features:
+- Top levels listed exactly; each top-level subtree estimated separately
+- Random descent probes (Knuth's estimator): the bytes and files of each
+  directory on a random root-to-leaf path, weighted by the product of
+  branching factors, are an unbiased estimate of the subtree totals
+- Confidence intervals from the spread of the probe estimates
+- Refinement: directory listings are cached and fully listed subtrees are
+  summed exactly, so every probe lists at least one new directory and the
+  estimates converge to the exact numbers given enough time
+"""
+
+import os
+import math
+import time
+import random
+import stat as stat_module
+from pathlib import Path
+
+from scanner import CancellationToken, MountPolicy, ListingTimeout
+
+# Two-sided normal quantiles for the supported confidence levels
+Z_SCORES = {0.8: 1.282, 0.9: 1.645, 0.95: 1.96, 0.99: 2.576}
+
+# Two-sided Student-t quantiles by degrees of freedom, for intervals from
+# a handful of probes; between rows the smaller df (wider interval) is used
+T_SCORES = {
+    1: {0.8: 3.078, 0.9: 6.314, 0.95: 12.706, 0.99: 63.657},
+    2: {0.8: 1.886, 0.9: 2.920, 0.95: 4.303, 0.99: 9.925},
+    3: {0.8: 1.638, 0.9: 2.353, 0.95: 3.182, 0.99: 5.841},
+    4: {0.8: 1.533, 0.9: 2.132, 0.95: 2.776, 0.99: 4.604},
+    5: {0.8: 1.476, 0.9: 2.015, 0.95: 2.571, 0.99: 4.032},
+    6: {0.8: 1.440, 0.9: 1.943, 0.95: 2.447, 0.99: 3.707},
+    7: {0.8: 1.415, 0.9: 1.895, 0.95: 2.365, 0.99: 3.499},
+    8: {0.8: 1.397, 0.9: 1.860, 0.95: 2.306, 0.99: 3.355},
+    9: {0.8: 1.383, 0.9: 1.833, 0.95: 2.262, 0.99: 3.250},
+    10: {0.8: 1.372, 0.9: 1.812, 0.95: 2.228, 0.99: 3.169},
+    15: {0.8: 1.341, 0.9: 1.753, 0.95: 2.131, 0.99: 2.947},
+    20: {0.8: 1.325, 0.9: 1.725, 0.95: 2.086, 0.99: 2.845},
+    30: {0.8: 1.310, 0.9: 1.697, 0.95: 2.042, 0.99: 2.750},
+    60: {0.8: 1.296, 0.9: 1.671, 0.95: 2.000, 0.99: 2.660},
+    120: {0.8: 1.289, 0.9: 1.658, 0.95: 1.980, 0.99: 2.617},
+}
+
+
+class _Listing:
+    """One directory's own files and its traversable subdirectories"""
+
+    __slots__ = ('size', 'files', 'subdirs')
+
+    def __init__(self, size, files, subdirs):
+        self.size = size
+        self.files = files
+        self.subdirs = subdirs   # [(path, dev, slow)]
+
+
+class _Target:
+    """Running estimate for one top-level subtree"""
+
+    def __init__(self, path, dev, slow):
+        self.path = path
+        self.dev = dev
+        self.slow = slow
+        self.size_samples = []
+        self.count_samples = []
+        self.listed_bytes = 0
+        self.listed_files = 0
+
+
+class QuickEstimator:
+    """
+    Sampling-based size estimates for the subtrees under a root
+
+    estimate() spends a time budget and returns a report; refine() spends
+    more time on the widest intervals. A subtree whose directories have all
+    been listed reports exact numbers with a zero-width interval.
+    """
+
+    def __init__(self, root, policy=None, skip_hidden=True, cancel_token=None, confidence=0.95,
+                 rng=None):
+        self.root = str(Path(root).expanduser())
+        self.policy = policy or MountPolicy()
+        self.skip_hidden = skip_hidden
+        self.cancel_token = cancel_token or CancellationToken()
+        self.confidence = confidence if confidence in Z_SCORES else 0.95
+        self.rng = rng or random.Random()
+
+        self.listings = {}   # path -> _Listing
+        self.exact = {}      # path -> (size, files) once the whole subtree is listed
+        self.targets = []
+        self.root_listing = None
+        self.elapsed = 0.0
+        self.directories_listed = 0
+        self.partial_paths = []
+
+    def _list(self, path, dev, slow):
+        listing = self.listings.get(path)
+        if listing is not None:
+            return listing
+
+        size = files = 0
+        subdirs = []
+        try:
+            entries = self.policy.list_directory(path, slow, self.skip_hidden, root=self.root)
+        except ListingTimeout:
+            self.partial_paths.append(path)
+            entries = []
+        except OSError:
+            entries = []
+
+        for _, entry_path, st in entries:
+            if stat_module.S_ISDIR(st.st_mode):
+                allowed, child_slow = self.policy.enter(dev, entry_path, st)
+                if allowed:
+                    subdirs.append((entry_path, st.st_dev, slow if child_slow is None else child_slow))
+            elif stat_module.S_ISREG(st.st_mode):
+                size += st.st_size
+                files += 1
+
+        listing = self.listings[path] = _Listing(size, files, subdirs)
+        self.directories_listed += 1
+        if not subdirs:
+            self.exact[path] = (size, files)
+        return listing
+
+    def _start(self):
+        root_stat = os.stat(self.root)
+        self.root_listing = self._list(self.root, root_stat.st_dev, self.policy.is_slow(self.root))
+        self.targets = [_Target(path, dev, slow) for path, dev, slow in self.root_listing.subdirs]
+
+    def _list_for(self, target, path, dev, slow):
+        known = path in self.listings
+        listing = self._list(path, dev, slow)
+        if not known:
+            target.listed_bytes += listing.size
+            target.listed_files += listing.files
+        return listing
+
+    def _probe(self, target):
+        """
+        One random descent; returns (size_estimate, count_estimate)
+
+        At each step the children are listed one level ahead and the probe
+        picks child i with probability p_i proportional to a size hint (its
+        own bytes in units of the average directory, plus its fan-out).
+        Scaling by 1/p_i keeps the estimate unbiased, and following the
+        heavy children cuts the variance on skewed trees.
+        """
+
+        path, dev, slow = target.path, target.dev, target.slow
+        weight = 1.0
+        size_estimate = count_estimate = 0.0
+        trail = []
+
+        while True:
+            self.cancel_token.raise_if_cancelled()
+
+            listing = self._list_for(target, path, dev, slow)
+            size_estimate += weight * listing.size
+            count_estimate += weight * listing.files
+            trail.append(path)
+
+            # Exactly known children are added as-is; the probe continues
+            # into one of the rest
+            unknown = []
+            for child in listing.subdirs:
+                self._list_for(target, *child)
+                exact = self.exact.get(child[0])
+                if exact is None:
+                    unknown.append(child)
+                else:
+                    size_estimate += weight * exact[0]
+                    count_estimate += weight * exact[1]
+
+            if not unknown:
+                break
+
+            average_bytes = max(target.listed_bytes / max(self.directories_listed, 1), 1.0)
+            hints = []
+            for child in unknown:
+                child_listing = self.listings[child[0]]
+                hints.append(1.0 + child_listing.size / average_bytes + len(child_listing.subdirs))
+            total_hint = sum(hints)
+
+            pick = self.rng.random() * total_hint
+            for child, hint in zip(unknown, hints):
+                pick -= hint
+                if pick <= 0:
+                    break
+            weight *= total_hint / hint
+            path, dev, slow = child
+
+        # Directories whose children all became exact are exact themselves
+        for path in reversed(trail):
+            if path in self.exact:
+                continue
+            listing = self.listings[path]
+            children = [self.exact.get(child[0]) for child in listing.subdirs]
+            if any(child is None for child in children):
+                break
+            self.exact[path] = (listing.size + sum(c[0] for c in children),
+                                listing.files + sum(c[1] for c in children))
+
+        return size_estimate, count_estimate
+
+    def _quantile(self, df):
+        """Two-sided quantile for the confidence level with df degrees of freedom"""
+
+        rows = [row for row in T_SCORES if row <= df]
+        if df > max(T_SCORES) or not rows:
+            return Z_SCORES[self.confidence]
+        return T_SCORES[max(rows)][self.confidence]
+
+    @staticmethod
+    def _spread(samples):
+        """(mean, variance of the mean) of the probe estimates"""
+
+        n = len(samples)
+        mean = sum(samples) / n
+        if n < 2:
+            return mean, None
+        return mean, sum((s - mean) ** 2 for s in samples) / (n - 1) / n
+
+    def _interval(self, samples, listed):
+        """(estimate, low, high); only the reported figures are raised to what is listed"""
+
+        mean, variance = self._spread(samples)
+        if variance is None:
+            return max(mean, listed), listed, None
+        half = self._quantile(len(samples) - 1) * math.sqrt(variance)
+        return max(mean, listed), max(mean - half, listed), max(mean + half, listed)
+
+    def _target_estimate(self, target):
+        exact = self.exact.get(target.path)
+        if exact is not None:
+            size, files = exact
+            return {'path': target.path, 'exact': True, 'size': size, 'size_low': size,
+                    'size_high': size, 'file_count': files, 'file_count_low': files,
+                    'file_count_high': files, 'probes': len(target.size_samples)}
+
+        if not target.size_samples:
+            return {'path': target.path, 'exact': False, 'size': None, 'size_low': 0,
+                    'size_high': None, 'file_count': None, 'file_count_low': 0,
+                    'file_count_high': None, 'probes': 0}
+
+        size, size_low, size_high = self._interval(target.size_samples, target.listed_bytes)
+        count, count_low, count_high = self._interval(target.count_samples, target.listed_files)
+        return {'path': target.path, 'exact': False, 'size': size, 'size_low': size_low,
+                'size_high': size_high, 'file_count': count, 'file_count_low': count_low,
+                'file_count_high': count_high, 'probes': len(target.size_samples)}
+
+    def _next_target(self):
+        """Unprobed targets first, then the one with the widest size interval"""
+
+        best, best_width = None, -1.0
+        for target in self.targets:
+            if target.path in self.exact:
+                continue
+            if len(target.size_samples) < 2:
+                return target
+            estimate = self._target_estimate(target)
+            if estimate['size_high'] is None:
+                return target
+            width = estimate['size_high'] - estimate['size_low']
+            if width > best_width:
+                best, best_width = target, width
+        return best
+
+    def estimate(self, budget_seconds=5.0, on_update=None, update_interval=1.0):
+        """List the top levels, then probe until the budget is spent; returns report()"""
+
+        if self.root_listing is None:
+            started = time.monotonic()
+            self._start()
+            self.elapsed += time.monotonic() - started
+        return self.refine(budget_seconds, on_update, update_interval)
+
+    def refine(self, budget_seconds=5.0, on_update=None, update_interval=1.0):
+        """
+        Spend up to budget_seconds tightening the estimates
+
+        `on_update(report)` is called every `update_interval` seconds.
+        Stops early once every subtree is exact.
+        """
+
+        started = time.monotonic()
+        last_update = started
+
+        try:
+            while time.monotonic() - started < budget_seconds:
+                target = self._next_target()
+                if target is None:
+                    break
+
+                size_estimate, count_estimate = self._probe(target)
+                target.size_samples.append(size_estimate)
+                target.count_samples.append(count_estimate)
+
+                if on_update and time.monotonic() - last_update >= update_interval:
+                    on_update(self.report())
+                    last_update = time.monotonic()
+        finally:
+            self.elapsed += time.monotonic() - started
+
+        return self.report()
+
+    def report(self):
+        """Current estimates: totals plus one entry per top-level subtree, largest first"""
+
+        subtrees = sorted((self._target_estimate(t) for t in self.targets),
+                          key=lambda e: e['size'] or 0, reverse=True)
+
+        own_size = self.root_listing.size if self.root_listing else 0
+        own_files = self.root_listing.files if self.root_listing else 0
+        totals = {'size': own_size, 'size_low': own_size, 'size_high': own_size,
+                  'file_count': own_files, 'file_count_low': own_files, 'file_count_high': own_files}
+
+        # Subtrees are estimated independently: sum means and the unclamped
+        # variances of the means, with Welch-Satterthwaite degrees of freedom
+        # (an unbounded subtree interval makes the total unbounded too)
+        spreads = {'size': [], 'file_count': []}
+        bounded = True
+        for entry in subtrees:
+            totals['size'] += entry['size'] or 0
+            totals['file_count'] += entry['file_count'] or 0
+            totals['size_low'] += entry['size_low']
+            totals['file_count_low'] += entry['file_count_low']
+            bounded = bounded and entry['size_high'] is not None and entry['file_count_high'] is not None
+        for target in self.targets:
+            if target.path not in self.exact and len(target.size_samples) >= 2:
+                df = len(target.size_samples) - 1
+                spreads['size'].append((self._spread(target.size_samples)[1], df))
+                spreads['file_count'].append((self._spread(target.count_samples)[1], df))
+
+        for key in ('size', 'file_count'):
+            if not bounded:
+                totals[f'{key}_high'] = None
+                continue
+            variance = sum(v for v, _ in spreads[key])
+            half = 0.0
+            if variance > 0:
+                df = variance ** 2 / sum(v ** 2 / df for v, df in spreads[key])
+                half = self._quantile(df) * math.sqrt(variance)
+            totals[f'{key}_low'] = max(totals[f'{key}_low'], totals[key] - half)
+            totals[f'{key}_high'] = totals[key] + half
+
+        return {
+            'root': self.root,
+            'confidence': self.confidence,
+            'exact': all(entry['exact'] for entry in subtrees),
+            'elapsed_seconds': round(self.elapsed, 2),
+            'directories_listed': self.directories_listed,
+            'partial_paths': sorted(set(self.partial_paths)),
+            'total': totals,
+            'subtrees': subtrees
+        }
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Exclusions - Compiled gitignore-style exclusion rules
+
+Features:
+- gitignore syntax: `*`, `?`, `[...]`, `**`, trailing `/` for directories
+  only, leading `!` to re-include, `#` comments
+- Patterns without a slash match a name at any depth; patterns with one
+  are anchored to the scan root; `~/...` patterns are absolute paths
+- Optional conditions after the pattern: `size>100M`, `age>180d` (since
+  modified), `idle>90d` (since accessed)
+- Compiled once: literal names go into a set, the other patterns into one
+  combined regex per kind, so a name is checked in a single match
+- Checked by MountPolicy.list_directory on each entry before it is
+  stat'ed, so excluded subtrees are never listed (conditions stat lazily)
+"""
+
+import os
+import re
+import time
+import hashlib
+from pathlib import Path
+
+DEFAULT_RULES_FILE = '~/.storage_intelligence/exclude'
+
+SIZE_UNITS = {'': 1, 'b': 1, 'k': 1024, 'kb': 1024, 'm': 1024 ** 2, 'mb': 1024 ** 2,
+              'g': 1024 ** 3, 'gb': 1024 ** 3, 't': 1024 ** 4, 'tb': 1024 ** 4}
+TIME_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800, 'y': 365 * 86400}
+
+CONDITION_RE = re.compile(r'^(size|age|idle)(<=|>=|<|>)(\d+(?:\.\d+)?)([a-zA-Z]*)$')
+GLOB_CHARS = re.compile(r'[*?\[\\]')
+
+
+def glob_to_regex(pattern):
+    """Regex source for a gitignore glob (`*` and `?` stop at '/', `**` doesn't)"""
+
+    out, i, n = [], 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith('**/', i):
+            out.append('(?:.*/)?')
+            i += 3
+        elif pattern.startswith('/**', i) and i + 3 == n:
+            out.append('/.*')
+            i += 3
+        elif pattern.startswith('**', i):
+            out.append('.*')
+            i += 2
+        elif c == '*':
+            out.append('[^/]*')
+            i += 1
+        elif c == '?':
+            out.append('[^/]')
+            i += 1
+        elif c == '[':
+            end = pattern.find(']', i + 2)
+            if end < 0:
+                out.append(re.escape(c))
+                i += 1
+                continue
+            body = pattern[i + 1:end]
+            if body.startswith('!'):
+                body = '^' + body[1:]
+            out.append('[' + body.replace('\\', '\\\\') + ']')
+            i = end + 1
+        elif c == '\\' and i + 1 < n:
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(c))
+            i += 1
+    return ''.join(out)
+
+
+def _parse_condition(token):
+    match = CONDITION_RE.match(token)
+    if not match:
+        raise ValueError(f'Invalid exclusion condition: {token!r}')
+    field, op, number, unit = match.groups()
+    units = SIZE_UNITS if field == 'size' else TIME_UNITS
+    if unit.lower() not in units:
+        raise ValueError(f'Invalid unit in exclusion condition: {token!r}')
+    return field, op, float(number) * units[unit.lower()]
+
+
+class _Rule:
+    __slots__ = ('source', 'negated', 'dir_only', 'target', 'regex', 'literal', 'conditions')
+
+    def __init__(self, line):
+        self.source = line
+        tokens = re.split(r'(?<!\\)\s+', line.strip())
+        pattern, conditions = tokens[0], tokens[1:]
+
+        self.negated = pattern.startswith('!')
+        if self.negated:
+            pattern = pattern[1:]
+        self.dir_only = pattern.endswith('/')
+        pattern = pattern.rstrip('/')
+
+        if pattern.startswith('~'):
+            self.target = 'absolute'
+            pattern = str(Path(pattern).expanduser())
+        elif '/' in pattern:
+            self.target = 'relative'
+            pattern = pattern.lstrip('/')
+        else:
+            self.target = 'name'
+
+        self.literal = pattern.replace('\\', '') if not GLOB_CHARS.search(pattern) else None
+        self.regex = glob_to_regex(pattern)
+        self.conditions = [_parse_condition(token) for token in conditions]
+
+    def matches_path(self, name, relative, absolute):
+        subject = name if self.target == 'name' else relative if self.target == 'relative' else absolute
+        if subject is None:
+            return False
+        if self.literal is not None:
+            return subject == self.literal
+        return re.fullmatch(self.regex, subject) is not None
+
+
+class ExclusionRules:
+    """
+    An ordered, compiled rule set
+
+    excluded(path, name, is_dir, root, stat) answers whether an entry is
+    excluded; `root` is the scan root anchored patterns are relative to,
+    and `stat` a zero-argument callable, only called when a matching rule
+    has conditions. Size conditions never match directories (their size is
+    unknown before descent).
+    """
+
+    def __init__(self, rules=()):
+        self.rules = [_Rule(line) for line in rules
+                      if line.strip() and not line.lstrip().startswith('#')]
+        self._derived = {}
+        self._compile()
+
+    @classmethod
+    def load(cls, path=None, extra=()):
+        """Rules from a gitignore-style file (missing file: no rules) plus `extra`"""
+
+        path = Path(path or DEFAULT_RULES_FILE).expanduser()
+        lines = []
+        if path.exists():
+            with open(path, 'r') as f:
+                lines = [line.rstrip('\n') for line in f]
+        return cls(lines + list(extra))
+
+    def extend(self, rules, first=False):
+        """
+        A rule set with `rules` added (cached per argument)
+
+        Appended rules win over the existing ones; with `first`, they are
+        placed before them, so the existing (user) rules still have the
+        last word.
+        """
+
+        key = (tuple(rules), first)
+        derived = self._derived.get(key)
+        if derived is None:
+            own = [rule.source for rule in self.rules]
+            derived = self._derived[key] = ExclusionRules(list(key[0]) + own if first else own + list(key[0]))
+        return derived
+
+    def _compile(self):
+        self.ordered = any(rule.negated for rule in self.rules)
+        self.conditional = [rule for rule in self.rules if rule.conditions]
+
+        # Fast path (no negations): every unconditional rule of one kind in
+        # a single set lookup or regex match
+        self._literals = {}
+        self._patterns = {}
+        grouped = {}
+        for rule in self.rules:
+            if rule.conditions or rule.negated:
+                continue
+            key = (rule.target, rule.dir_only)
+            if rule.literal is not None:
+                self._literals.setdefault(key, set()).add(rule.literal)
+            else:
+                grouped.setdefault(key, []).append(rule.regex)
+        self._patterns = {key: re.compile('(?:' + '|'.join(regexes) + r')\Z')
+                          for key, regexes in grouped.items()}
+
+    def __bool__(self):
+        return bool(self.rules)
+
+    @property
+    def signature(self):
+        """Stable digest of the rules ('' when empty), for caches keyed by rule set"""
+
+        if not self.rules:
+            return ''
+        return hashlib.sha1('\n'.join(rule.source for rule in self.rules).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _conditions_hold(rule, is_dir, stat):
+        if stat is None:
+            return False
+        now = time.time()
+        st = stat()
+        for field, op, bound in rule.conditions:
+            if field == 'size':
+                if is_dir:
+                    return False
+                value = st.st_size
+            elif field == 'age':
+                value = now - st.st_mtime
+            else:
+                value = now - st.st_atime
+            if not (value > bound if op == '>' else value < bound if op == '<' else
+                    value >= bound if op == '>=' else value <= bound):
+                return False
+        return True
+
+    def excluded(self, path, name=None, is_dir=False, root=None, stat=None):
+        if not self.rules:
+            return False
+
+        name = name if name is not None else os.path.basename(path)
+        relative = None
+        if root is not None:
+            root = str(root).rstrip('/')
+            if path.startswith(root + '/'):
+                relative = path[len(root) + 1:]
+
+        if self.ordered:
+            # gitignore semantics: the last matching rule decides
+            result = False
+            for rule in self.rules:
+                if rule.dir_only and not is_dir:
+                    continue
+                if rule.matches_path(name, relative, path) and \
+                        (not rule.conditions or self._conditions_hold(rule, is_dir, stat)):
+                    result = not rule.negated
+            return result
+
+        subjects = {'name': name, 'relative': relative, 'absolute': path}
+        for (target, dir_only), literals in self._literals.items():
+            if (is_dir or not dir_only) and subjects[target] in literals:
+                return True
+        for (target, dir_only), regex in self._patterns.items():
+            subject = subjects[target]
+            if subject is not None and (is_dir or not dir_only) and regex.match(subject):
+                return True
+        for rule in self.conditional:
+            if (is_dir or not rule.dir_only) and rule.matches_path(name, relative, path) and \
+                    self._conditions_hold(rule, is_dir, stat):
+                return True
+        return False
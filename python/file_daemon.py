@@ -18,66 +18,265 @@ import time
 import signal
 import subprocess
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timedelta
 import threading
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 import urllib.parse
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 
 # Import the intelligent agent
 sys.path.insert(0, str(Path(__file__).parent))
 from intelligent_agent import FileAnalysisAgent
+from scanner import CancellationToken, ScanCancelled, MountPolicy, IOBudget, walk
+from scan_index import ScanIndex
+from exclusions import ExclusionRules
+from scheduler import JobScheduler, JobCancelled
+from snapshot_store import atomic_write_json
+from near_duplicates import find_clusters
+from plan_executor import PlanExecutor
+from identical_files import find_identical, HashCache
+from archive_builder import ArchiveBuilder
+from chunk_upload import ChunkUploader, LocalDirectoryBackend, RcloneBackend
+from single_flight import SingleFlight
+from dashboard_service import DashboardService
+from subscriptions import SubscriptionHub, MAX_INTERVAL
+import rollups
+
+class MonitoredRoot:
+    """One monitored folder: its agent, its command executor and its analysis state"""
+    
+    def __init__(self, name, path, agent, job_name='analysis', schedule=None):
+        self.name = name
+        self.path = Path(path).expanduser()
+        self.agent = agent
+        self.job_name = job_name
+        self.schedule = schedule
+        self.executor = None
+        self.last_analysis = None
+        self.status = 'idle'
+        self.message = None
+    
+    def status_report(self, scheduler):
+        job = scheduler.jobs.get(self.job_name)
+        next_analysis = job.next_run if job else None
+        return {
+            'path': str(self.path),
+            'status': self.status,
+            'message': self.message,
+            'last_analysis': self.last_analysis.isoformat() if self.last_analysis else None,
+            'next_analysis': next_analysis.isoformat() if next_analysis else None,
+            'reports': str(self.agent.log_path)
+        }
+
 
 class FileManagementDaemon:
-    def __init__(self, downloads_path, analysis_interval=3600):
+    def __init__(self, downloads_path, analysis_interval=3600, schedule_file=None, mount_policy=None,
+                 workers=2, log_path='~/.file_agent'):
         """
         Initialize daemon
         
         Args:
-            downloads_path: Path to Downloads folder
+            downloads_path: Path to Downloads folder, or a list of folders to monitor
             analysis_interval: Analysis interval in seconds (default: 1 hour)
+            schedule_file: Optional JSON file describing scheduled jobs (and extra roots)
+            mount_policy: MountPolicy controlling filesystem crossing, I/O timeouts and I/O budget
+            workers: Analyses that may run at once, across all roots
+        
+        Every root shares one worker pool, one mount policy (and so one I/O
+        budget), one hash cache and one scan index, so adding roots adds
+        schedule entries, not threads or scanners. With several roots each
+        one keeps its reports under <log_path>/roots/<name>/.
         """
-        self.downloads_path = Path(downloads_path).expanduser()
         self.analysis_interval = analysis_interval
-        self.agent = FileAnalysisAgent(downloads_path)
+        self.mount_policy = mount_policy or MountPolicy()
+        self.log_path = Path(log_path).expanduser()
+        self.log_path.mkdir(parents=True, exist_ok=True)
         self.running = False
-        self.last_analysis = None
+        self.stop_event = threading.Event()
+        self.cancel_token = CancellationToken()
+        # Roots finishing at once must not write an older status over a newer one
+        self._status_lock = threading.Lock()
+        
+        schedule = {}
+        if schedule_file:
+            with open(Path(schedule_file).expanduser(), 'r') as f:
+                schedule = json.load(f)
+        
+        paths = [downloads_path] if isinstance(downloads_path, (str, Path)) else list(downloads_path)
+        root_specs = [{'path': path} for path in paths] + schedule.get('roots', [])
+        
+        # Shared by every root
+        self.scan_index = ScanIndex(self.log_path / 'scan_index.json')
+        self.hash_cache = HashCache(self.log_path / 'hash_cache.json')
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='analysis')
+        
+        self.roots = {}
+        for spec in root_specs:
+            path = Path(spec['path']).expanduser()
+            name = spec.get('name') or path.name or 'root'
+            while name in self.roots:
+                name += '_'
+            root_log = self.log_path if len(root_specs) == 1 else self.log_path / 'roots' / name
+            agent = FileAnalysisAgent(path, log_path=root_log, mount_policy=self.mount_policy,
+                                      scan_index=self.scan_index)
+            job_name = 'analysis' if len(root_specs) == 1 else f'analysis:{name}'
+            self.roots[name] = MonitoredRoot(name, path, agent, job_name, spec.get('schedule'))
+        
+        # The first root stands in wherever a single agent is expected
+        first = next(iter(self.roots.values()))
+        self.downloads_path = first.path
+        self.agent = first.agent
+        self.executor = None
+        self.dashboard = DashboardService(self.scan_index, self.log_path / 'dashboard_caches.json',
+                                          self.mount_policy, self.agent.format_size)
+        # Clients watching subtrees get changed aggregates as trees are replaced
+        self.subscriptions = SubscriptionHub(self.scan_index)
         
         # Status file for dashboard
-        self.status_file = self.agent.log_path / "daemon_status.json"
+        self.status_file = self.log_path / "daemon_status.json"
+        
+        self.scheduler = JobScheduler(self.log_path / "scheduler_state.json", pool=self.pool)
+        self.load_schedule(schedule.get('jobs', []))
+    
+    @property
+    def last_analysis(self):
+        times = [root.last_analysis for root in self.roots.values() if root.last_analysis]
+        return max(times) if times else None
+    
+    def load_schedule(self, jobs=None):
+        """
+        Register scheduled jobs
+        
+        Each root gets an analysis job ("analysis" with one root,
+        "analysis:<name>" with several) defaulting to the root's own
+        schedule, else the "analysis" job's, else `analysis_interval`.
+        A schedule file can override them, add command jobs (optionally
+        bound to a root) and add roots, e.g.:
+        
+            {"roots": [{"path": "~/Documents", "schedule": "every 6h"}],
+             "jobs": [
+                {"name": "analysis", "schedule": "every 10m"},
+                {"name": "duplicates", "command": "find-duplicates", "root": "Documents",
+                 "schedule": "@weekly", "windows": ["01:00-05:00"], "jitter": 1800}
+            ]}
+        """
+        jobs = list(jobs or [])
+        by_name = {job['name']: job for job in jobs}
+        default = by_name.get('analysis', {'schedule': self.analysis_interval})
+        
+        for root in self.roots.values():
+            job = by_name.get(root.job_name)
+            if job is None:
+                job = dict(default, name=root.job_name)
+                if root.schedule:
+                    job['schedule'] = root.schedule
+                jobs.append(job)
+        
+        analysis_jobs = {root.job_name: root for root in self.roots.values()}
+        for job in jobs:
+            options = {k: job[k] for k in ('windows', 'jitter', 'catch_up', 'base_backoff', 'max_backoff')
+                       if k in job}
+            if job['name'] in analysis_jobs:
+                func = self.analysis_job(analysis_jobs[job['name']])
+            elif job['name'] == 'analysis' or job['name'].startswith('analysis:'):
+                continue  # default for the per-root jobs, or a root that isn't configured
+            elif job.get('command'):
+                func = self.command_job(job['command'], job.get('params'), job.get('root'))
+            else:
+                raise ValueError(f"Scheduled job '{job['name']}' needs a command")
+            
+            self.scheduler.add_job(job['name'], func, job['schedule'], **options)
+    
+    def analysis_job(self, root):
+        """Scheduled analysis of one root; raises so the scheduler can back off"""
+        def run():
+            if self.run_analysis(root) is None:
+                if self.cancel_token.cancelled:
+                    raise JobCancelled('Analysis interrupted')
+                raise RuntimeError('Analysis failed')
+        return run
+    
+    def root_executor(self, root):
+        if root.executor is None:
+            root.executor = CommandExecutor(root.path, self.mount_policy, root.agent, self.hash_cache,
+                                            self.dashboard, self.subscriptions)
+        return root.executor
+    
+    def command_executor(self):
+        """Executor for the command server: the root's own, or one routing on params['root']"""
+        if self.executor is None:
+            executors = {name: self.root_executor(root) for name, root in self.roots.items()}
+            self.executor = (next(iter(executors.values())) if len(executors) == 1
+                             else MultiRootExecutor(executors))
+        return self.executor
+    
+    def command_job(self, command, params=None, root_name=None):
+        """Build a scheduled job that runs a dashboard command"""
+        def run():
+            root = self.roots[root_name] if root_name else next(iter(self.roots.values()))
+            print(f"⏰ Running scheduled command: {command} ({root.name})")
+            result = self.root_executor(root).execute(command, params or {})
+            if not result['success']:
+                raise RuntimeError(result['message'])
+            return result
+        return run
         
     def update_status(self, status, message=None):
         """Update daemon status"""
+        with self._status_lock:
+            self._write_status(status, message)
+    
+    def _write_status(self, status, message):
+        analysis_job = self.scheduler.jobs.get(next(iter(self.roots.values())).job_name)
+        next_analysis = analysis_job.next_run if analysis_job else None
+        last_analysis = self.last_analysis
+        
         status_data = {
             'status': status,
             'timestamp': datetime.now().isoformat(),
             'message': message,
-            'last_analysis': self.last_analysis.isoformat() if self.last_analysis else None,
-            'next_analysis': (self.last_analysis + timedelta(seconds=self.analysis_interval)).isoformat() 
-                             if self.last_analysis else None
+            'last_analysis': last_analysis.isoformat() if last_analysis else None,
+            'next_analysis': next_analysis.isoformat() if next_analysis else None,
+            'roots': {name: root.status_report(self.scheduler) for name, root in self.roots.items()},
+            'jobs': self.scheduler.status()
         }
         
-        with open(self.status_file, 'w') as f:
-            json.dump(status_data, f, indent=2)
+        atomic_write_json(self.status_file, status_data, indent=2)
     
-    def run_analysis(self):
-        """Run periodic analysis"""
+    def _set_root_status(self, root, status, message):
+        root.status, root.message = status, message
+        busy = [r for r in self.roots.values() if r.status == 'analyzing']
+        self.update_status('analyzing' if busy else status, message)
+    
+    def run_analysis(self, root=None):
+        """Run periodic analysis of one root (default: every root, one after another)"""
+        if root is None:
+            reports = [self.run_analysis(r) for r in self.roots.values()]
+            return reports[0] if len(reports) == 1 else reports
+        
         print(f"\n{'='*70}")
-        print(f"🤖 Running scheduled analysis at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        print(f"🤖 Running scheduled analysis of {root.path} at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         print(f"{'='*70}\n")
         
         try:
-            self.update_status('analyzing', 'Running file analysis...')
-            report = self.agent.generate_report()
-            self.last_analysis = datetime.now()
-            self.update_status('idle', 'Analysis complete')
+            self._set_root_status(root, 'analyzing', 'Running file analysis...')
+            report = root.agent.generate_report(self.cancel_token)
+            root.last_analysis = datetime.now()
+            self._set_root_status(root, 'idle', 'Analysis complete')
             
-            print(f"\n✅ Analysis complete. Next run in {self.analysis_interval/3600:.1f} hours.")
+            print(f"\n✅ Analysis complete.")
             
             return report
+        
+        except ScanCancelled:
+            print("⏸️  Analysis interrupted; progress checkpointed and will resume next run")
+            self._set_root_status(root, 'interrupted', 'Analysis checkpointed, will resume')
+            return None
             
         except Exception as e:
             print(f"❌ Analysis failed: {e}")
-            self.update_status('error', str(e))
+            self._set_root_status(root, 'error', str(e))
             return None
     
     def start(self):
@@ -85,39 +284,45 @@ class FileManagementDaemon:
         print("="*70)
         print("🤖 FILE MANAGEMENT DAEMON STARTING")
         print("="*70)
-        print(f"\nMonitoring: {self.downloads_path}")
-        print(f"Analysis interval: {self.analysis_interval/3600:.1f} hours")
+        for root in self.roots.values():
+            print(f"\nMonitoring: {root.path}")
+        print("Scheduled jobs:")
+        for job in self.scheduler.jobs.values():
+            windows = f" in {', '.join(w.spec for w in job.windows)}" if job.windows else ""
+            print(f"   • {job.name}: {job.schedule}{windows} "
+                  f"(next {job.next_run.strftime('%Y-%m-%d %H:%M:%S')})")
         print(f"Started: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         print("\nPress Ctrl+C to stop\n")
         print("="*70 + "\n")
         
         self.running = True
+        self.stop_event.clear()
+        self.cancel_token = CancellationToken()
         self.update_status('starting', 'Daemon initializing...')
         
-        # Initial analysis
-        self.run_analysis()
-        
-        # Periodic analysis loop
-        while self.running:
-            try:
-                time.sleep(self.analysis_interval)
-                if self.running:
-                    self.run_analysis()
-            except KeyboardInterrupt:
-                break
-            except Exception as e:
-                print(f"❌ Error: {e}")
-                time.sleep(60)  # Wait 1 minute before retry
+        try:
+            self.scheduler.run_forever(self.stop_event)
+        except KeyboardInterrupt:
+            pass
         
         self.stop()
     
+    def request_stop(self):
+        """Ask a running daemon to stop; an in-progress scan checkpoints and exits"""
+        self.running = False
+        self.cancel_token.cancel()
+        self.stop_event.set()
+    
     def stop(self):
         """Stop daemon"""
         print("\n" + "="*70)
         print("🛑 STOPPING DAEMON")
         print("="*70)
         
-        self.running = False
+        self.request_stop()
+        # Running analyses see the cancelled token and checkpoint
+        self.pool.shutdown(wait=True)
+        self.hash_cache.save()
         self.update_status('stopped', 'Daemon stopped')
         
         print(f"Stopped at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -126,25 +331,101 @@ class FileManagementDaemon:
 class CommandExecutor:
     """Execute dashboard commands"""
     
-    def __init__(self, downloads_path):
+    # Commands that only read published snapshots or the scan index, so
+    # their results change only with its version; the command server
+    # coalesces and caches them per version
+    CACHEABLE = {'diff-snapshots', 'storage-trends', 'latest-analysis', 'query', 'search-names',
+                 'scan-progress', 'dashboard-analysis'}
+    # Dry runs that read the live folder: files changed by anyone else must
+    # show up, so they are never cached, but they change nothing either
+    LIVE_READS = {'find-duplicates', 'dedupe-files', 'sort-files', 'archive-old', 'clean-temp',
+                  'consolidate-kim', 'archive-extract', 'organize-extractions', 'open-plans'}
+    
+    def __init__(self, downloads_path, mount_policy=None, agent=None, hash_cache=None, dashboard=None,
+                 subscriptions=None):
         self.downloads_path = Path(downloads_path).expanduser()
-        self.agent = FileAnalysisAgent(downloads_path)
+        # Share the daemon's agent when given, so commands read the versions it publishes
+        self.agent = agent or FileAnalysisAgent(downloads_path, mount_policy=mount_policy)
+        # Digests of unchanged files are reused across runs (and across roots)
+        self.hash_cache = hash_cache or HashCache(self.agent.log_path / 'hash_cache.json')
+        # The Electron dashboard's analysis, from the scan index (shared across roots)
+        self.dashboard = dashboard or DashboardService(self.agent.scan_index,
+                                                       self.agent.log_path / 'dashboard_caches.json',
+                                                       self.agent.mount_policy, self.agent.format_size)
+        # Subtree watches served by the command server's /subscribe stream
+        self.subscriptions = subscriptions or SubscriptionHub(self.agent.scan_index)
+        
+        # Moves and deletes run through a journaled executor; finish any
+        # plan a previous process was interrupted in
+        self.plan_executor = PlanExecutor(self.agent.log_path / 'journals',
+                                          allowed_roots=[self.downloads_path])
+        recovered = self.plan_executor.recover()
+        if recovered:
+            print(f"♻️  Recovered interrupted file plans: {recovered}")
+        
+        # Bumped whenever a command that may change files has run
+        self._generation = 0
+        self._generation_lock = threading.Lock()
     
-    def execute(self, command, params=None):
-        """Execute a command"""
+    def data_version(self, command, params=None):
+        """
+        Version of the data a command's result depends on, or None if the
+        result must not be reused (it acts on files, or isn't cacheable)
+        """
+        
+        params = params or {}
+        if command not in self.CACHEABLE or params.get('execute'):
+            return None
+        if command == 'dashboard-analysis':
+            return f'{self.dashboard.version()}.{self._generation}'
+        store = self.agent.progress_store if command == 'scan-progress' else self.agent.analysis_store
+        snapshot = store.current()
+        return f'{snapshot.version if snapshot else 0}.{self._generation}'
+    
+    def changes_files(self, command, params=None):
+        """Whether a command may move, delete or create files (dry runs and unknown commands don't)"""
         
-        commands = {
+        params = params or {}
+        if command not in self._commands():
+            return False
+        return bool(params.get('execute')) or command not in self.CACHEABLE | self.LIVE_READS
+    
+    def _walk(self, top=None, hidden_files=False):
+        """walk() under the user's exclusion rules, never entering hidden folders"""
+        
+        policy = self.agent.mount_policy
+        exclusions = policy.exclusions.extend(['.*/'] if hidden_files else ['.*'], first=True)
+        return walk(top or self.downloads_path, policy, exclusions=exclusions)
+    
+    def _commands(self):
+        return {
             'create-structure': self.create_structure,
             'find-duplicates': self.find_duplicates,
+            'dedupe-files': self.dedupe_files,
             'sort-files': self.sort_files,
             'archive-old': self.archive_old,
             'clean-temp': self.clean_temp,
             'consolidate-kim': self.consolidate_kim,
             'archive-extract': self.archive_extract,
             'organize-extractions': self.organize_extractions,
-            'cloud-archive': self.prepare_cloud_archive
+            'cloud-archive': self.prepare_cloud_archive,
+            'diff-snapshots': self.diff_snapshots,
+            'storage-trends': self.storage_trends,
+            'latest-analysis': self.latest_analysis,
+            'query': self.query_files,
+            'search-names': self.search_names,
+            'scan-progress': self.scan_progress,
+            'execute-plan': self.execute_plan,
+            'rollback-plan': self.rollback_plan,
+            'commit-plan': self.commit_plan,
+            'open-plans': self.open_plans,
+            'dashboard-analysis': self.dashboard_analysis
         }
+    
+    def execute(self, command, params=None):
+        """Execute a command"""
         
+        commands = self._commands()
         if command not in commands:
             return {'success': False, 'message': f'Unknown command: {command}'}
         
@@ -153,6 +434,10 @@ class CommandExecutor:
             return {'success': True, 'result': result}
         except Exception as e:
             return {'success': False, 'message': str(e)}
+        finally:
+            if self.changes_files(command, params):
+                with self._generation_lock:
+                    self._generation += 1
     
     def create_structure(self, params):
         """Create folder structure"""
@@ -185,40 +470,172 @@ class CommandExecutor:
             'folders': created
         }
     
-    def find_duplicates(self, params):
-        """Find duplicate files"""
-        
-        from collections import defaultdict
+    def _near_duplicate_clusters(self):
+        """Clusters from the last indexed scan, or from a fresh walk before the first one"""
         
-        files_by_name = defaultdict(list)
+        if self.agent.scan_index.get_tree(self.downloads_path) is not None:
+            return self.agent.find_near_duplicates()
         
-        for root, dirs, files in os.walk(self.downloads_path):
-            dirs[:] = [d for d in dirs if not d.startswith('.')]
-            
+        entries = []
+        for root, dirs, files in self._walk():
             for filename in files:
-                if filename.startswith('.'):
+                filepath = os.path.join(root, filename)
+                try:
+                    st = os.stat(filepath)
+                except OSError:
                     continue
-                
-                base_name = Path(filename).stem.lower()
-                files_by_name[base_name].append(os.path.join(root, filename))
+                entries.append((filepath, filename, st.st_size, st.st_mtime))
         
-        duplicates = {name: paths for name, paths in files_by_name.items() if len(paths) > 1}
+        clusters = find_clusters(entries)
+        for cluster in clusters:
+            cluster['total_size_formatted'] = self.agent.format_size(cluster['total_size'])
+            cluster['reclaimable_formatted'] = self.agent.format_size(cluster['reclaimable'])
+        return clusters
+    
+    def find_duplicates(self, params):
+        """Find near-duplicate files (copies, versions, dated variants of one name)"""
+        
+        params = params or {}
+        clusters = self._near_duplicate_clusters()
+        limit = params.get('limit', 10)
         
         return {
-            'duplicate_sets': len(duplicates),
-            'examples': {k: v for k, v in list(duplicates.items())[:10]}
+            'duplicate_sets': len(clusters),
+            'reclaimable': sum(c['reclaimable'] for c in clusters),
+            'examples': {c['newest']['name']: [f['path'] for f in c['files']] for c in clusters[:limit]},
+            'clusters': clusters[:limit]
         }
     
+    def dedupe_files(self, params):
+        """
+        Replace byte-identical copies with reflinks (or hardlinks) of the oldest copy
+        
+        Dry run unless params['execute']; params['method'] is 'auto',
+        'reflink' or 'hardlink'. Each link is journaled and can be undone
+        with rollback-plan until the plan is committed.
+        """
+        
+        params = params or {}
+        index = self.agent.get_file_index()
+        if index is not None:
+            matches = index.query(min_size=params.get('min_size', 4096), sort='size', limit=None)
+            entries = [(entry['path'], entry['size'], entry['mtime']) for entry in matches['results']]
+        else:
+            entries = []
+            for root, dirs, files in self._walk(hidden_files=True):
+                for filename in files:
+                    filepath = os.path.join(root, filename)
+                    try:
+                        st = os.stat(filepath)
+                    except OSError:
+                        continue
+                    entries.append((filepath, st.st_size, st.st_mtime))
+        
+        sets = find_identical(entries, min_size=params.get('min_size', 4096), hash_cache=self.hash_cache)
+        self.hash_cache.save()
+        method = params.get('method', 'auto')
+        plan = [{'op': 'link', 'src': path, 'dst': identical['keeper'], 'method': method,
+                 'size': size, 'mtime': mtime}
+                for identical in sets for path, size, mtime in identical['duplicates']]
+        
+        result = self._run_plan(plan, params, 'Deduplicate identical files',
+                                'Byte-identical copies', f'{method} links')
+        reclaimable = sum(identical['reclaimable'] for identical in sets)
+        result['identical_sets'] = len(sets)
+        result['reclaimable'] = reclaimable
+        result['reclaimable_formatted'] = self.agent.format_size(reclaimable)
+        result['sets'] = [dict(identical, duplicates=[d[0] for d in identical['duplicates']])
+                          for identical in sets[:params.get('limit', 10)]]
+        if params.get('execute'):
+            result['bytes_reclaimed_formatted'] = self.agent.format_size(result['bytes_reclaimed'])
+            result['message'] = f"Linked {result['linked']} files, reclaimed {result['bytes_reclaimed_formatted']}"
+        else:
+            result['message'] = (f'{len(plan)} identical copies ({result["reclaimable_formatted"]}) '
+                                 f'would be linked (pass execute=true to link them)')
+        return result
+    
+    # Destination folder (see create_structure) per file class for sort-files
+    SORT_DESTINATIONS = {
+        'pdf': 'Research-Papers/Other-Topics',
+        'documents': 'Clinical-Documents/Manuscripts',
+        'presentations': 'Clinical-Documents/Presentations',
+        'spreadsheets': 'Data-Extractions/Active-Projects',
+        'data': 'Data-Extractions/Active-Projects',
+        'code': 'Code-Projects/Utilities',
+        'images': 'Medical-Images',
+        'archives': 'Archives',
+    }
+    
+    def _relocate(self, entries, destination_root):
+        """
+        Move ops sending each (path, size, mtime) under destination_root,
+        keeping relative paths. Files already anywhere under Archives/ are
+        left alone, so older archives are not archived again.
+        """
+        
+        plan = []
+        destination_root = self.downloads_path / destination_root
+        archives = self.downloads_path / 'Archives'
+        for path, size, mtime in entries:
+            try:
+                relative = Path(path).relative_to(self.downloads_path)
+            except ValueError:
+                continue
+            if destination_root in Path(path).parents or archives in Path(path).parents:
+                continue  # already archived
+            plan.append({'op': 'move', 'src': str(path), 'dst': str(destination_root / relative),
+                         'size': size, 'mtime': mtime})
+        return plan
+    
+    def _run_plan(self, plan, params, action, reason, destination):
+        """Dry run by default; with params['execute'] run the plan and log it"""
+        
+        if not params.get('execute'):
+            return {'dry_run': True, 'operations': len(plan), 'plan': plan[:100]}
+        
+        summary = self.plan_executor.execute(plan, commit=params.get('commit', True))
+        if summary['done']:
+            self.agent.log_archive_action(
+                action=action,
+                files=[Path(op['src']).name for op in plan[:50]],
+                reason=reason,
+                method=f"Plan {summary['plan_id']}",
+                destination=destination
+            )
+        return summary
+    
     def sort_files(self, params):
-        """Auto-sort files by type"""
+        """Auto-sort loose files in the Downloads root into the folder structure by type"""
         
-        sorted_files = {'pdf': 0, 'xlsx': 0, 'py': 0, 'js': 0}
+        params = params or {}
+        sorted_files = defaultdict(int)
+        plan = []
+        exclusions = self.agent.mount_policy.exclusions
         
-        # This would actually move files - skeleton implementation
-        return {
-            'message': 'File sorting complete',
-            'sorted': sorted_files
-        }
+        with os.scandir(self.downloads_path) as it:
+            for entry in it:
+                if entry.name.startswith('.') or not entry.is_file(follow_symlinks=False):
+                    continue
+                # Files the user excluded from scans are left where they are
+                if exclusions.excluded(entry.path, entry.name, False, self.downloads_path,
+                                       lambda: entry.stat(follow_symlinks=False)):
+                    continue
+                cls = rollups.extension_class(entry.name)
+                folder = self.SORT_DESTINATIONS.get(cls)
+                if folder is None:
+                    continue
+                st = entry.stat(follow_symlinks=False)
+                plan.append({'op': 'move', 'src': entry.path,
+                             'dst': str(self.downloads_path / folder / entry.name),
+                             'size': st.st_size, 'mtime': st.st_mtime})
+                sorted_files[cls] += 1
+        
+        result = self._run_plan(plan, params, 'Sort files by type', 'Loose files in Downloads root',
+                                'Folder structure')
+        result['sorted'] = dict(sorted_files)
+        result['message'] = (f"Sorted {result.get('done', 0)} files" if params.get('execute')
+                             else f'{len(plan)} files would be sorted (pass execute=true to move them)')
+        return result
     
     def archive_old(self, params):
         """Archive old files"""
@@ -226,36 +643,32 @@ class CommandExecutor:
         cutoff_days = params.get('days', 180) if params else 180
         cutoff_time = time.time() - (cutoff_days * 24 * 3600)
         
-        old_files = []
-        
-        for root, dirs, files in os.walk(self.downloads_path):
-            dirs[:] = [d for d in dirs if not d.startswith('.')]
+        index = self.agent.get_file_index()
+        if index is not None:
+            # Answered from the last scan instead of stat-ing every file again
+            matches = index.query(max_mtime=cutoff_time, sort='mtime', descending=False, limit=None)
+            old_files = [(entry['path'], entry['size'], entry['mtime']) for entry in matches['results']]
+        else:
+            old_files = []
             
-            for filename in files:
-                if filename.startswith('.'):
-                    continue
-                
-                filepath = os.path.join(root, filename)
-                try:
-                    if os.path.getmtime(filepath) < cutoff_time:
-                        old_files.append(filepath)
-                except:
-                    continue
+            for root, dirs, files in self._walk():
+                for filename in files:
+                    filepath = os.path.join(root, filename)
+                    try:
+                        st = os.stat(filepath)
+                    except OSError:
+                        continue
+                    if st.st_mtime < cutoff_time:
+                        old_files.append((filepath, st.st_size, st.st_mtime))
         
-        # Log archive action
-        if old_files:
-            self.agent.log_archive_action(
-                action='Bulk archive old files',
-                files=[Path(f).name for f in old_files[:10]],  # Log first 10
-                reason=f'Files older than {cutoff_days} days',
-                method='Automatic cleanup',
-                destination=f'Archives/Archive-{datetime.now().year}/'
-            )
+        destination = f'Archives/Archive-{datetime.now().year}'
+        plan = self._relocate(old_files, destination)
         
-        return {
-            'files_found': len(old_files),
-            'message': f'Found {len(old_files)} files older than {cutoff_days} days'
-        }
+        result = self._run_plan(plan, params or {}, 'Bulk archive old files',
+                                f'Files older than {cutoff_days} days', destination + '/')
+        result['files_found'] = len(plan)
+        result['message'] = f'Found {len(plan)} files older than {cutoff_days} days'
+        return result
     
     def clean_temp(self, params):
         """Clean temporary files"""
@@ -263,9 +676,7 @@ class CommandExecutor:
         temp_patterns = ['~$', 'untitled', '(1)', '(2)', 'backup', 'temp', 'tmp']
         temp_files = []
         
-        for root, dirs, files in os.walk(self.downloads_path):
-            dirs[:] = [d for d in dirs if not d.startswith('.')]
-            
+        for root, dirs, files in self._walk(hidden_files=True):
             for filename in files:
                 if any(pattern in filename.lower() for pattern in temp_patterns):
                     temp_files.append(os.path.join(root, filename))
@@ -276,62 +687,71 @@ class CommandExecutor:
         }
     
     def consolidate_kim(self, params):
-        """Consolidate Kim2016 files"""
+        """Consolidate near-duplicate files, keeping the newest of each cluster"""
         
-        kim_files = []
+        params = params or {}
+        match = params.get('match', '').lower()
+        clusters = [c for c in self._near_duplicate_clusters()
+                    if not match or match in c['key'] or any(match in f['name'].lower() for f in c['files'])]
         
-        for root, dirs, files in os.walk(self.downloads_path):
-            dirs[:] = [d for d in dirs if not d.startswith('.')]
-            
-            for filename in files:
-                if 'kim2016' in filename.lower():
-                    kim_files.append(os.path.join(root, filename))
-        
-        if kim_files:
+        older = [f for c in clusters for f in c['files'][1:]]
+        plan = self._relocate([(f['path'], f['size'], f['mtime']) for f in older], 'Archives/Duplicates')
+        if older and not params.get('execute'):
             self.agent.log_archive_action(
-                action='Consolidate Kim2016 duplicates',
-                files=[Path(f).name for f in kim_files],
-                reason='Multiple versions of same research paper',
-                method='AI recommendation',
-                destination='Research-Papers/Cerebellar-Stroke/'
+                action='Consolidate near-duplicate files',
+                files=[f['name'] for f in older[:50]],
+                reason=f'{len(clusters)} clusters of copies/versions of the same file',
+                method='Near-duplicate clustering',
+                destination='Archives/Duplicates/'
             )
         
-        return {
-            'kim_files_found': len(kim_files),
-            'files': [Path(f).name for f in kim_files]
-        }
+        result = self._run_plan(plan, params, 'Consolidate near-duplicate files',
+                                f'{len(clusters)} clusters of copies/versions of the same file',
+                                'Archives/Duplicates/')
+        result.update({
+            'clusters_found': len(clusters),
+            'files': [f['name'] for f in older],
+            'keep': [c['newest']['name'] for c in clusters],
+            'reclaimable': sum(c['reclaimable'] for c in clusters),
+            'reclaimable_formatted': self.agent.format_size(sum(c['reclaimable'] for c in clusters))
+        })
+        return result
     
     def archive_extract(self, params):
-        """Archive old CEREBELLAR-EXTRACT versions"""
+        """Archive superseded versions: older members of clusters with version tags"""
         
-        extract_files = []
+        params = params or {}
+        match = params.get('match', '').lower()
+        clusters = [c for c in self._near_duplicate_clusters()
+                    if c['versioned'] and (not match or match in c['key'])]
         
-        for root, dirs, files in os.walk(self.downloads_path):
-            if 'cerebellar' in root.lower() or 'extract' in root.lower():
-                for filename in files:
-                    if any(v in filename.lower() for v in ['v1', 'v2', 'old', 'backup']):
-                        extract_files.append(os.path.join(root, filename))
-        
-        if extract_files:
+        superseded = [f for c in clusters for f in c['files'][1:]]
+        plan = self._relocate([(f['path'], f['size'], f['mtime']) for f in superseded], 'Archives/Versions')
+        if superseded and not params.get('execute'):
             self.agent.log_archive_action(
-                action='Archive old CEREBELLAR-EXTRACT versions',
-                files=[Path(f).name for f in extract_files],
-                reason='Obsolete development versions',
-                method='AI recommendation',
-                destination='Archives/Development/CEREBELLAR-EXTRACT/'
+                action='Archive superseded file versions',
+                files=[f['name'] for f in superseded[:50]],
+                reason='Older versions of files with a newer copy',
+                method='Near-duplicate clustering',
+                destination='Archives/Versions/'
             )
         
-        return {
-            'extract_versions_found': len(extract_files),
-            'recommendation': 'Push to GitHub, keep only v3-ultra locally'
-        }
+        result = self._run_plan(plan, params, 'Archive superseded file versions',
+                                'Older versions of files with a newer copy', 'Archives/Versions/')
+        result.update({
+            'extract_versions_found': len(superseded),
+            'clusters': [{'key': c['key'], 'newest': c['newest']['name'], 'count': c['count'],
+                          'reclaimable': c['reclaimable']} for c in clusters],
+            'recommendation': 'Keep the newest version of each file locally, archive the rest'
+        })
+        return result
     
     def organize_extractions(self, params):
         """Organize extraction files"""
         
         extraction_files = []
         
-        for root, dirs, files in os.walk(self.downloads_path):
+        for root, dirs, files in walk(self.downloads_path, self.agent.mount_policy):
             for filename in files:
                 if filename.endswith('.xlsx') and 'extraction' in filename.lower():
                     filepath = os.path.join(root, filename)
@@ -354,16 +774,60 @@ class CommandExecutor:
             'message': f'Found {active} active and {completed} completed extractions'
         }
     
+    def _archive_destinations(self, archives_path, output_path):
+        """{destination: [(path, arcname)]} for each folder under Archives/, skipping built output"""
+        
+        destinations = {}
+        for entry in sorted(os.scandir(archives_path), key=lambda e: e.name):
+            if entry.name.startswith('.') or not entry.is_dir(follow_symlinks=False):
+                continue
+            if entry.path == str(output_path):
+                continue
+            files = []
+            for root, dirs, filenames in self._walk(entry.path):
+                dirs.sort()
+                for filename in sorted(filenames):
+                    path = os.path.join(root, filename)
+                    files.append((path, os.path.relpath(path, archives_path)))
+            if files:
+                destinations[entry.name] = files
+        return destinations
+    
     def prepare_cloud_archive(self, params):
-        """Prepare archives for cloud upload"""
+        """Prepare archives for cloud upload
+        
+        With params['build'], every folder under Archives/ is packed into
+        chunked tar archives (built in parallel, one chunk per process) in
+        Archives/Cloud-Upload, each with a manifest of per-file digests.
+        With params['upload_to'] (an rclone remote such as "mega:Archives",
+        or a local directory with params['backend'] = 'local'), the archives
+        are uploaded as deduplicated chunks; unchanged chunks are not re-sent
+        and an interrupted upload resumes.
+        """
         
+        params = params or {}
         archive_files = []
         
         archives_path = self.downloads_path / 'Archives'
+        output_path = archives_path / 'Cloud-Upload'
+        built = None
+        
+        if params.get('build') and archives_path.exists():
+            destinations = self._archive_destinations(archives_path, output_path)
+            builder = ArchiveBuilder(output_path,
+                                     chunk_size=int(params.get('chunk_size_mb', 1024)) * 1024 * 1024,
+                                     codec=params.get('codec', 'gz'),
+                                     workers=int(params['workers']) if params.get('workers') else None)
+            built = builder.build(destinations)
+        
         if archives_path.exists():
-            for filepath in archives_path.rglob('*.zip'):
-                if filepath.stat().st_size > 0:
-                    archive_files.append(str(filepath))
+            for filepath in archives_path.rglob('*'):
+                if not filepath.is_file():
+                    continue
+                if filepath.suffix == '.zip' or (filepath.parent == output_path and
+                                                 not filepath.name.endswith('.partial')):
+                    if filepath.stat().st_size > 0:
+                        archive_files.append(str(filepath))
         
         # Create manifest
         manifest_file = self.downloads_path / 'archives_to_upload.txt'
@@ -372,35 +836,262 @@ class CommandExecutor:
         
         total_size = sum(Path(f).stat().st_size for f in archive_files)
         
-        return {
+        result = {
             'archives_found': len(archive_files),
             'total_size': self.agent.format_size(total_size),
             'manifest': str(manifest_file),
             'command': f'rclone copy --files-from {manifest_file} / mega:Archives/'
         }
+        if params.get('upload_to'):
+            backend = (LocalDirectoryBackend(params['upload_to']) if params.get('backend') == 'local'
+                       else RcloneBackend(params['upload_to']))
+            uploader = ChunkUploader(backend, self.agent.log_path / 'uploads', workers=int(params.get('workers', 4)))
+            upload = uploader.upload([(path, os.path.relpath(path, self.downloads_path))
+                                      for path in archive_files])
+            upload['bytes_uploaded_formatted'] = self.agent.format_size(upload['bytes_uploaded'])
+            upload['message'] = (f"Uploaded {upload['bytes_uploaded_formatted']} of "
+                                 f"{self.agent.format_size(upload['bytes_total'])} "
+                                 f"({upload['chunks_reused']} chunks already on the target)")
+            result['upload'] = upload
+        if built is not None:
+            built['input_bytes_formatted'] = self.agent.format_size(built['input_bytes'])
+            built['archive_bytes_formatted'] = self.agent.format_size(built['archive_bytes'])
+            result['built'] = built
+        return result
+
+    def diff_snapshots(self, params):
+        """Show what grew or shrank between two scan snapshots"""
+        
+        params = params or {}
+        index = self.agent.scan_index
+        limit = params.get('limit', 20)
+        
+        old_snapshot = None
+        if params.get('since_days') is not None:
+            old_snapshot = index.find_snapshot(self.downloads_path,
+                                               before=time.time() - params['since_days'] * 24 * 3600)
+        
+        diff = index.diff(self.downloads_path, old_snapshot=old_snapshot, limit=limit)
+        if diff is None:
+            return {'message': 'Need at least two analyses to compare', 'directories': [], 'files': []}
+        
+        diff = self.agent.format_diff(diff)
+        diff['message'] = f"{diff['total_delta_formatted']} between {diff['from']} and {diff['to']}"
+        return diff
+
+    def storage_trends(self, params):
+        """Growth rates and forecasts from the time-series store"""
+        
+        params = params or {}
+        return {
+            'series': self.agent.timeseries.names(),
+            'trends': self.agent.get_trends(params.get('series'), params.get('days', 30),
+                                            params.get('forecast_days', 30))
+        }
+
+    def query_files(self, params):
+        """
+        Files matching indexed predicates, answered from the last scan
+        
+        Params (all optional): path_prefix, extensions, min_size, max_size,
+        min_mtime, max_mtime, min_atime, max_atime, older_than_days,
+        newer_than_days, not_accessed_days, name_pattern, sort, descending, limit
+        """
+        
+        params = dict(params or {})
+        index = self.agent.get_file_index()
+        if index is None:
+            return {'message': 'No scan indexed yet - run an analysis first', 'total_matches': 0, 'results': []}
+        
+        if params.get('path_prefix') and not os.path.isabs(os.path.expanduser(params['path_prefix'])):
+            params['path_prefix'] = str(self.downloads_path / params['path_prefix'])
+        if isinstance(params.get('extensions'), str):
+            params['extensions'] = [params['extensions']]
+        
+        started = time.time()
+        result = index.query(**params)
+        for entry in result['results']:
+            entry['size_formatted'] = self.agent.format_size(entry['size'])
+            entry['modified'] = datetime.fromtimestamp(entry['mtime']).isoformat()
+        
+        result['indexed_files'] = len(index)
+        result['elapsed_ms'] = round((time.time() - started) * 1000, 2)
+        result['message'] = (f"{result['total_matches']} matching files" if result['total_exact']
+                             else f"Showing the first {len(result['results'])} matching files (more exist)")
+        return result
+
+    def search_names(self, params):
+        """Substring or fuzzy file name search over the last scan"""
+        
+        params = params or {}
+        query = params.get('query', '')
+        index = self.agent.scan_index.name_index(self.downloads_path)
+        if index is None:
+            return {'message': 'No scan indexed yet - run an analysis first', 'results': []}
+        
+        path_prefix = params.get('path_prefix')
+        if path_prefix and not os.path.isabs(os.path.expanduser(path_prefix)):
+            path_prefix = str(self.downloads_path / path_prefix)
+        
+        started = time.time()
+        results = index.search(query, limit=params.get('limit', 20), fuzzy=params.get('fuzzy', False),
+                               path_prefix=path_prefix)
+        return {
+            'query': query,
+            'results': results,
+            'indexed_names': len(index),
+            'elapsed_ms': round((time.time() - started) * 1000, 2),
+            'message': f'{len(results)} matching names'
+        }
+
+    def scan_progress(self, params):
+        """Partial results of the scan in progress (or the last one's final state)"""
+        
+        with self.agent.progress_store.reading() as snapshot:
+            if snapshot is None:
+                return {'version': None, 'progress': None}
+            result = snapshot.info()
+            result['progress'] = snapshot.data
+            return result
+
+    def execute_plan(self, params):
+        """
+        Run an explicit plan: {'plan': [{'op': 'move'|'delete', 'src', 'dst', 'size', 'mtime'}],
+        'commit': bool}. Uncommitted plans can be rolled back.
+        """
+        
+        params = params or {}
+        summary = self.plan_executor.execute(params.get('plan', []), commit=params.get('commit', True))
+        if summary['done']:
+            self.agent.log_archive_action(
+                action='Execute file plan',
+                files=[Path(op.get('src', '')).name for op in params.get('plan', [])[:50]],
+                reason=params.get('reason', 'Dashboard plan'),
+                method=f"Plan {summary['plan_id']}"
+            )
+        return summary
+
+    def rollback_plan(self, params):
+        """Undo an uncommitted plan"""
+        
+        plan_id = (params or {}).get('plan_id')
+        undone = self.plan_executor.rollback(plan_id)
+        return {'plan_id': plan_id, 'undone': undone, 'message': f'Undid {undone} operations'}
+
+    def commit_plan(self, params):
+        """Make an uncommitted plan final (purges its trashed deletes)"""
+        
+        plan_id = (params or {}).get('plan_id')
+        self.plan_executor.commit(plan_id)
+        return {'plan_id': plan_id, 'message': 'Plan committed'}
+
+    def open_plans(self, params):
+        return {'plans': self.plan_executor.open_plans()}
+
+    def dashboard_analysis(self, params):
+        """
+        The Electron dashboard's analysis schema from the warm scan index
+
+        params['paths'] lists the folders the dashboard would scan (default:
+        home); None before a scan or when the monitored roots don't cover them.
+        """
+        
+        return self.dashboard.analysis((params or {}).get('paths'))
+
+    def latest_analysis(self, params):
+        """Current published analysis version (consistent, never half-written)"""
+        
+        with self.agent.analysis_store.reading() as snapshot:
+            if snapshot is None:
+                return {'version': None, 'analysis': None}
+            result = snapshot.info()
+            result['analysis'] = snapshot.data
+            return result
+
+class MultiRootExecutor:
+    """Routes commands to a root's CommandExecutor by params['root'] (default: the first root)"""
+    
+    def __init__(self, executors):
+        self.executors = executors
+        # The executors share one scan index, hence one hub
+        self.subscriptions = next(iter(executors.values())).subscriptions
+    
+    def _route(self, params):
+        params = dict(params or {})
+        name = params.pop('root', None)
+        return self.executors.get(name if name is not None else next(iter(self.executors))), params
+    
+    def data_version(self, command, params=None):
+        executor, params = self._route(params)
+        if command == 'roots' or executor is None:
+            return None
+        return executor.data_version(command, params)
+    
+    def changes_files(self, command, params=None):
+        executor, params = self._route(params)
+        if command == 'roots' or executor is None:
+            return False
+        return executor.changes_files(command, params)
+    
+    def execute(self, command, params=None):
+        params = dict(params or {})
+        name = params.pop('root', None)
+        if command == 'roots':
+            return {'success': True, 'result': {
+                'roots': {n: str(executor.downloads_path) for n, executor in self.executors.items()}}}
+        if name is None:
+            name = next(iter(self.executors))
+        if name not in self.executors:
+            return {'success': False, 'message': f'Unknown root: {name}'}
+        return self.executors[name].execute(command, params)
 
 # HTTP Server for command execution from dashboard
 class CommandHandler(BaseHTTPRequestHandler):
     executor = None  # Will be set when server starts
+    flights = None   # SingleFlight shared by all request threads
+    # Uncached commands run one at a time: those that change files, and dry
+    # runs reading the live folder, which must not walk a half-applied plan
+    exclusive = threading.Lock()
+    # Seconds between keep-alive comments on an idle /subscribe stream
+    keepalive = 15
+    # Browser origins allowed to call the server. Some commands move and
+    # delete files, so a request carrying any other Origin is refused and
+    # no wildcard CORS headers are sent; clients that send no Origin (the
+    # Electron main process, scripts) are not browsers and are let through
+    allowed_origins = frozenset()
     
     def do_POST(self):
-        """Handle POST requests from dashboard"""
+        """
+        Handle POST requests from dashboard
+        
+        Identical cacheable requests in flight run once; their encoded
+        responses are cached per data version and carry an ETag, so a
+        refresh sending If-None-Match gets a bodiless 304 while nothing
+        has changed. POST /rpc takes the same commands as JSON-RPC 2.0
+        methods.
+        """
+        
+        if not self._origin_allowed():
+            return self._refuse_origin()
         
         content_length = int(self.headers['Content-Length'])
         post_data = self.rfile.read(content_length)
         
         try:
-            data = json.loads(post_data.decode('utf-8'))
-            command = data.get('command')
-            params = data.get('params', {})
+            try:
+                data = json.loads(post_data.decode('utf-8'))
+            except ValueError:
+                if self.path.rstrip('/') != '/rpc':
+                    raise
+                return self._send_json(200, self._rpc_error(None, -32700, 'Parse error'))
             
-            result = self.executor.execute(command, params)
+            if self.path.rstrip('/') == '/rpc':
+                return self._handle_rpc(data)
             
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.end_headers()
-            self.wfile.write(json.dumps(result).encode('utf-8'))
+            etag, how, value = self._run_command(data.get('command'), data.get('params', {}))
+            if value is None:
+                return self._send_not_modified(etag)
+            self._send_json(200, value[1], etag, how)
             
         except Exception as e:
             self.send_response(500)
@@ -408,24 +1099,219 @@ class CommandHandler(BaseHTTPRequestHandler):
             self.end_headers()
             self.wfile.write(json.dumps({'error': str(e)}).encode('utf-8'))
     
+    def do_GET(self):
+        """
+        GET /subscribe?path=...&category=...&interval=... streams Server-Sent
+        Events: one 'snapshot' with the current aggregates of every watched
+        path and category, then 'delta' events holding only what changed
+        (at most one per interval, bursts merged), with keep-alive comments
+        while nothing does.
+        """
+        
+        if not self._origin_allowed():
+            return self._refuse_origin()
+        
+        url = urllib.parse.urlparse(self.path)
+        if url.path.rstrip('/') != '/subscribe':
+            return self._send_json(404, json.dumps({'error': f'Not found: {url.path}'}).encode('utf-8'))
+        
+        query = urllib.parse.parse_qs(url.query)
+        paths, categories = query.get('path', []), query.get('category', [])
+        if not paths and not categories:
+            return self._send_json(400, json.dumps({'error': 'Watch at least one path or category'}).encode('utf-8'))
+        try:
+            interval = float(query['interval'][0]) if 'interval' in query else None
+            if interval is not None and not 0 <= interval <= MAX_INTERVAL:
+                raise ValueError(interval)
+        except ValueError:
+            return self._send_json(400, json.dumps(
+                {'error': f'interval must be a number of seconds up to {MAX_INTERVAL}'}).encode('utf-8'))
+        if interval is not None:
+            interval = max(0.1, interval)
+        
+        hub = self.executor.subscriptions
+        subscription = hub.subscribe(paths, categories, interval)
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self._send_cors_headers()
+            self.end_headers()
+            
+            sequence = 0
+            self._send_event('snapshot', {'sequence': sequence, 'id': subscription.id,
+                                          'aggregates': subscription.snapshot()})
+            while True:
+                changes = subscription.next_message(timeout=self.keepalive)
+                if changes:
+                    sequence += 1
+                    self._send_event('delta', {'sequence': sequence, 'changes': changes})
+                elif changes is None:
+                    self.wfile.write(b': keep-alive\n\n')
+                    self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass   # The client went away
+        finally:
+            hub.unsubscribe(subscription)
+    
+    def _send_event(self, event, data):
+        self.wfile.write(b'event: %s\ndata: %s\n\n' % (event.encode('utf-8'), json.dumps(data).encode('utf-8')))
+        self.wfile.flush()
+    
+    def _run_command(self, command, params, revalidate=True):
+        """
+        (etag, how, (success, response body, result body)); etag is None for
+        uncached commands, the value None when If-None-Match still holds
+        """
+        
+        def run():
+            response = self.executor.execute(command, params)
+            success = response.get('success', False)
+            result = json.dumps(response.get('result')).encode('utf-8') if success else None
+            return success, json.dumps(response).encode('utf-8'), result
+        
+        version = self.executor.data_version(command, params)
+        if version is None:
+            # A page can POST text/plain cross-origin without a preflight;
+            # commands that change files only take declared JSON
+            if self.executor.changes_files(command, params) and not self._json_content_type():
+                message = 'Commands that change files require Content-Type: application/json'
+                return None, None, (False, json.dumps({'success': False, 'message': message}).encode('utf-8'), None)
+            with self.exclusive:
+                return None, None, run()
+        
+        key = json.dumps([command, params], sort_keys=True, default=str)
+        etag = self.flights.etag(key, version)
+        if revalidate and etag in self._if_none_match():
+            return etag, 'hit', None
+        value, how = self.flights.do(key, version, run, cacheable=lambda value: value[0])
+        return etag, how, value
+    
+    @staticmethod
+    def _rpc_error(request_id, code, message):
+        return json.dumps({'jsonrpc': '2.0', 'id': request_id,
+                           'error': {'code': code, 'message': message}}).encode('utf-8')
+    
+    def _rpc_call(self, request, revalidate=True):
+        """(etag, how, body) for one JSON-RPC request; body None for notifications"""
+        
+        if not isinstance(request, dict) or not isinstance(request.get('method'), str):
+            return None, None, self._rpc_error(None, -32600, 'Invalid Request')
+        request_id = request.get('id')
+        params = request.get('params') or {}
+        if not isinstance(params, dict):
+            return None, None, self._rpc_error(request_id, -32602, 'Params must be an object')
+        
+        etag, how, value = self._run_command(request['method'], params, revalidate)
+        if 'id' not in request:
+            return etag, how, None
+        if value is None:
+            return etag, how, b''
+        success, response, result = value
+        if not success:
+            message = json.loads(response).get('message', 'Command failed')
+            code = -32601 if message.startswith('Unknown command') else -32000
+            return etag, how, self._rpc_error(request_id, code, message)
+        # The cached result bytes are spliced in as they are
+        return etag, how, b'{"jsonrpc": "2.0", "id": %s, "result": %s}' % (
+            json.dumps(request_id).encode('utf-8'), result)
+    
+    def _handle_rpc(self, data):
+        if isinstance(data, list):
+            # One ETag can't describe a batch: every call is answered
+            bodies = [self._rpc_call(request, revalidate=False)[2] for request in data] if data else [
+                self._rpc_error(None, -32600, 'Invalid Request')]
+            bodies = [body for body in bodies if body]
+            if not bodies:
+                return self._send_empty(204)
+            return self._send_json(200, b'[' + b', '.join(bodies) + b']')
+        
+        etag, how, body = self._rpc_call(data)
+        if body == b'':
+            return self._send_not_modified(etag)
+        if body is None:
+            return self._send_empty(204)
+        self._send_json(200, body, etag, how)
+    
+    def _send_json(self, status, body, etag=None, how=None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self._send_cors_headers()
+        if etag:
+            self._send_cache_headers(etag, how)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def _send_not_modified(self, etag):
+        self.send_response(304)
+        self._send_cache_headers(etag, 'hit')
+        self.end_headers()
+    
+    def _send_empty(self, status):
+        self.send_response(status)
+        self._send_cors_headers()
+        self.end_headers()
+    
+    def _origin_allowed(self):
+        origin = self.headers.get('Origin')
+        return origin is None or origin in self.allowed_origins
+    
+    def _refuse_origin(self):
+        body = json.dumps({'error': f"Origin not allowed: {self.headers.get('Origin')}"}).encode('utf-8')
+        self.send_response(403)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def _send_cors_headers(self):
+        """Echo an allowlisted Origin; nothing for requests without one"""
+        
+        origin = self.headers.get('Origin')
+        if origin is not None and origin in self.allowed_origins:
+            self.send_header('Access-Control-Allow-Origin', origin)
+            self.send_header('Vary', 'Origin')
+    
+    def _json_content_type(self):
+        content_type = self.headers.get('Content-Type') or ''
+        return content_type.split(';')[0].strip().lower() == 'application/json'
+    
+    def _if_none_match(self):
+        header = self.headers.get('If-None-Match') or ''
+        return {tag.strip() for tag in header.split(',') if tag.strip()}
+    
+    def _send_cache_headers(self, etag, how):
+        self.send_header('ETag', etag)
+        # Always revalidate: the tag changes as soon as the data does
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('X-Cache', how)
+        self.send_header('Access-Control-Expose-Headers', 'ETag, X-Cache')
+    
     def do_OPTIONS(self):
-        """Handle CORS preflight"""
+        """Handle CORS preflight, for allowlisted origins only"""
+        if not self._origin_allowed():
+            return self._refuse_origin()
         self.send_response(200)
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self._send_cors_headers()
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, If-None-Match')
         self.end_headers()
     
     def log_message(self, format, *args):
         """Suppress default logging"""
         pass
 
-def start_command_server(downloads_path, port=8888):
+def start_command_server(downloads_path, port=8888, mount_policy=None, agent=None, executor=None,
+                         allowed_origins=()):
     """Start HTTP server for command execution"""
     
-    CommandHandler.executor = CommandExecutor(downloads_path)
+    CommandHandler.executor = executor or CommandExecutor(downloads_path, mount_policy, agent)
+    CommandHandler.allowed_origins = frozenset(allowed_origins)
+    CommandHandler.flights = SingleFlight()
     
-    server = HTTPServer(('localhost', port), CommandHandler)
+    # One thread per request, so identical requests can join a run in flight
+    server = ThreadingHTTPServer(('localhost', port), CommandHandler)
     print(f"🌐 Command server started on http://localhost:{port}")
     
     server_thread = threading.Thread(target=server.serve_forever, daemon=True)
@@ -437,28 +1323,61 @@ def main():
     """Main entry point"""
     
     import argparse
-    from datetime import timedelta
     
     parser = argparse.ArgumentParser(description='Intelligent File Management Daemon')
-    parser.add_argument('--path', default='/Users/matheusrech/Downloads',
-                       help='Path to Downloads folder')
+    parser.add_argument('--path', action='append', default=[],
+                       help='Folder to monitor (repeatable; default: /Users/matheusrech/Downloads, '
+                            'plus the home folder with --server)')
     parser.add_argument('--interval', type=int, default=3600,
                        help='Analysis interval in seconds (default: 3600 = 1 hour)')
+    parser.add_argument('--schedule',
+                       help='JSON file with scheduled jobs (cron schedules, off-peak windows, jitter)')
     parser.add_argument('--once', action='store_true',
                        help='Run analysis once and exit')
     parser.add_argument('--server', action='store_true',
-                       help='Start command server (for dashboard integration)')
+                       help='Start command server (for dashboard integration); without --path the '
+                            'home folder is monitored too, so the dashboard is answered from the index')
     parser.add_argument('--port', type=int, default=8888,
                        help='Command server port (default: 8888)')
+    parser.add_argument('--allow-origin', action='append', default=[], metavar='ORIGIN',
+                       help='Browser origin allowed to call the command server, e.g. '
+                            'http://localhost:3000 (repeatable; default: none, so only '
+                            'clients sending no Origin header, like the Electron app, are served)')
+    parser.add_argument('--cross-device', action='append', default=[], metavar='MOUNT',
+                       help='Mount point the scan may cross into (repeatable)')
+    parser.add_argument('--io-timeout', type=float, default=10.0,
+                       help='Seconds before a listing on a network/FUSE mount is abandoned (default: 10)')
+    parser.add_argument('--workers', type=int, default=2,
+                       help='Analyses run at once across all folders (default: 2)')
+    parser.add_argument('--io-budget', type=float, default=0,
+                       help='Directory listings per second across all folders (default: unlimited)')
+    parser.add_argument('--exclude-file', metavar='FILE',
+                       help='gitignore-style exclusion rules (default: ~/.storage_intelligence/exclude)')
+    parser.add_argument('--exclude', action='append', default=[], metavar='RULE',
+                       help='Extra exclusion rule, e.g. "*.iso size>1G" (repeatable)')
     
     args = parser.parse_args()
     
-    # Start command server if requested
-    if args.server:
-        server = start_command_server(args.path, args.port)
+    budget = IOBudget(args.io_budget) if args.io_budget > 0 else None
+    exclusions = ExclusionRules.load(args.exclude_file, args.exclude)
+    mount_policy = MountPolicy(allowed_devices=args.cross_device, timeout=args.io_timeout, budget=budget,
+                               exclusions=exclusions)
+    paths = args.path or ['/Users/matheusrech/Downloads']
+    if args.server and not args.path:
+        # The dashboard analyses the home folder; dashboard-analysis only
+        # answers for folders the index covers. Commands still default to
+        # the first folder, Downloads.
+        paths.append(str(Path.home()))
     
     # Create daemon
-    daemon = FileManagementDaemon(args.path, args.interval)
+    daemon = FileManagementDaemon(paths, args.interval, args.schedule, mount_policy, workers=args.workers)
+    
+    # Start command server if requested; it shares the daemon's agents
+    if args.server:
+        server = start_command_server(daemon.downloads_path, args.port, mount_policy,
+                                      executor=daemon.command_executor(),
+                                      allowed_origins=args.allow_origin)
+    signal.signal(signal.SIGTERM, lambda signum, frame: daemon.request_stop())
     
     if args.once:
         # Run once and exit
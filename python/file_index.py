@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+File Index - Ad-hoc file queries answered from a scan tree
+
+Features:
+- Flat file table built once per scan, no disk I/O at query time
+- Path-prefix ranges: files are laid out in tree order, so every
+  directory's subtree is one contiguous row range
+- Secondary indexes sorted by size and by mtime (bisect range lookups)
+- Extension index
+- Planner that starts from the most selective predicate and stops early
+  when the requested sort order matches the index it walks
+"""
+
+import os
+import time
+import heapq
+import fnmatch
+from bisect import bisect_left, bisect_right
+
+DAY = 24 * 3600
+
+SORT_KEYS = ('size', 'mtime', 'atime', 'path')
+
+
+class FileIndex:
+    """Read-only query structure over one scan tree"""
+
+    def __init__(self, tree):
+        self.dirs = []         # directory path per dir id
+        self.dir_ranges = {}   # directory path -> (first_row, end_row)
+        self.rows = []         # (dir_id, name, size, mtime, atime)
+
+        self._layout(tree)
+
+        rows = self.rows
+        self.by_size = sorted(range(len(rows)), key=lambda r: rows[r][2])
+        self.size_keys = [rows[r][2] for r in self.by_size]
+        self.by_mtime = sorted(range(len(rows)), key=lambda r: rows[r][3])
+        self.mtime_keys = [rows[r][3] for r in self.by_mtime]
+
+        self.by_ext = {}
+        for row_id, row in enumerate(rows):
+            self.by_ext.setdefault(os.path.splitext(row[1])[1].lower(), []).append(row_id)
+
+    def _layout(self, tree):
+        """Pre-order layout so each subtree's files are one contiguous row range"""
+
+        stack = [(tree, False)]
+        starts = {}
+        while stack:
+            node, finished = stack.pop()
+            if finished:
+                self.dir_ranges[node['path']] = (starts[node['path']], len(self.rows))
+                continue
+
+            dir_id = len(self.dirs)
+            self.dirs.append(node['path'])
+            starts[node['path']] = len(self.rows)
+            for name, size, mtime, atime in node['files']:
+                self.rows.append((dir_id, name, size, mtime, atime))
+
+            stack.append((node, True))
+            for child in reversed(node['children']):
+                stack.append((child, False))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def path(self, row_id):
+        row = self.rows[row_id]
+        return os.path.join(self.dirs[row[0]], row[1])
+
+    @staticmethod
+    def _key_range(keys, low, high):
+        start = 0 if low is None else bisect_left(keys, low)
+        end = len(keys) if high is None else bisect_right(keys, high)
+        return start, end
+
+    def query(self, path_prefix=None, extensions=None, min_size=None, max_size=None,
+              min_mtime=None, max_mtime=None, min_atime=None, max_atime=None,
+              older_than_days=None, newer_than_days=None, not_accessed_days=None,
+              name_pattern=None, sort='size', descending=True, limit=100, now=None):
+        """
+        Files matching every given predicate
+
+        Args:
+            path_prefix: Directory whose subtree to search
+            extensions: e.g. ['.pdf', '.zip'] (case-insensitive)
+            min_size / max_size: Bytes, inclusive
+            min_mtime / max_mtime / min_atime / max_atime: Epoch seconds, inclusive
+            older_than_days / newer_than_days: Shorthand for mtime bounds
+            not_accessed_days: Shorthand for max_atime
+            name_pattern: Glob on the basename, case-insensitive (e.g. '*kim2016*')
+            sort: One of size, mtime, atime, path
+            limit: Maximum results (None for all)
+
+        Returns {'total_matches', 'total_exact', 'has_more', 'results', 'plan'}.
+        When candidates come from the sort index and a limit is given, the
+        scan stops one match past the limit: total_matches is then a lower
+        bound (total_exact False) and has_more tells whether results were cut.
+        """
+
+        if sort not in SORT_KEYS:
+            raise ValueError(f'Unknown sort key: {sort}')
+
+        now = now or time.time()
+        if older_than_days is not None:
+            bound = now - older_than_days * DAY
+            max_mtime = bound if max_mtime is None else min(max_mtime, bound)
+        if newer_than_days is not None:
+            bound = now - newer_than_days * DAY
+            min_mtime = bound if min_mtime is None else max(min_mtime, bound)
+        if not_accessed_days is not None:
+            bound = now - not_accessed_days * DAY
+            max_atime = bound if max_atime is None else min(max_atime, bound)
+
+        # Candidate sources: (estimated rows, name, iterable of row ids, in sort order?)
+        sources = []
+
+        if path_prefix is not None:
+            path_prefix = os.path.normpath(os.path.expanduser(str(path_prefix)))
+            first, end = self.dir_ranges.get(path_prefix, (0, 0))
+            sources.append((end - first, 'path_prefix', range(first, end), False))
+
+        if min_size is not None or max_size is not None:
+            start, end = self._key_range(self.size_keys, min_size, max_size)
+            sources.append((end - start, 'size_index', (self.by_size, start, end), sort == 'size'))
+
+        if min_mtime is not None or max_mtime is not None:
+            start, end = self._key_range(self.mtime_keys, min_mtime, max_mtime)
+            sources.append((end - start, 'mtime_index', (self.by_mtime, start, end), sort == 'mtime'))
+
+        if extensions:
+            ext_rows = [self.by_ext.get(ext.lower() if ext.startswith('.') else '.' + ext.lower(), [])
+                        for ext in extensions]
+            sources.append((sum(len(r) for r in ext_rows), 'extension_index',
+                            heapq.merge(*ext_rows), False))
+
+        if sources:
+            estimate, plan, candidates, ordered_by_sort = min(sources, key=lambda s: s[0])
+        else:
+            # No selective predicate: walk the sort index itself
+            if sort in ('size', 'mtime'):
+                ordered = self.by_size if sort == 'size' else self.by_mtime
+                estimate, plan, candidates, ordered_by_sort = (
+                    len(ordered), f'{sort}_index', (ordered, 0, len(ordered)), True)
+            else:
+                estimate, plan, candidates, ordered_by_sort = (
+                    len(self.rows), 'full_scan', range(len(self.rows)), False)
+
+        if isinstance(candidates, tuple):
+            ordered, start, end = candidates
+            if ordered_by_sort and descending:
+                candidates = (ordered[i] for i in range(end - 1, start - 1, -1))
+            else:
+                candidates = (ordered[i] for i in range(start, end))
+
+        prefix_range = self.dir_ranges.get(path_prefix, (0, 0)) if path_prefix is not None else None
+        ext_set = None
+        if extensions:
+            ext_set = {ext.lower() if ext.startswith('.') else '.' + ext.lower() for ext in extensions}
+        pattern = name_pattern.lower() if name_pattern else None
+
+        def matches(row_id):
+            _, name, size, mtime, atime = self.rows[row_id]
+            if prefix_range is not None and not (prefix_range[0] <= row_id < prefix_range[1]):
+                return False
+            if min_size is not None and size < min_size:
+                return False
+            if max_size is not None and size > max_size:
+                return False
+            if min_mtime is not None and mtime < min_mtime:
+                return False
+            if max_mtime is not None and mtime > max_mtime:
+                return False
+            if min_atime is not None and atime < min_atime:
+                return False
+            if max_atime is not None and atime > max_atime:
+                return False
+            if ext_set is not None and os.path.splitext(name)[1].lower() not in ext_set:
+                return False
+            if pattern is not None and not fnmatch.fnmatchcase(name.lower(), pattern):
+                return False
+            return True
+
+        if ordered_by_sort:
+            # Candidates already arrive in the requested order: stop at the
+            # first match past the limit, which only tells that there is more
+            selected, has_more = [], False
+            for row_id in candidates:
+                if matches(row_id):
+                    if limit is not None and len(selected) >= limit:
+                        has_more = True
+                        break
+                    selected.append(row_id)
+            total = len(selected) + has_more
+            total_exact = not has_more
+        else:
+            matched = [row_id for row_id in candidates if matches(row_id)]
+            total = len(matched)
+            key = self._sort_key(sort)
+            if limit is None:
+                selected = sorted(matched, key=key, reverse=descending)
+            elif descending:
+                selected = heapq.nlargest(limit, matched, key=key)
+            else:
+                selected = heapq.nsmallest(limit, matched, key=key)
+            has_more, total_exact = total > len(selected), True
+
+        return {
+            'total_matches': total,
+            'total_exact': total_exact,
+            'has_more': has_more,
+            'results': [self._result(row_id) for row_id in selected],
+            'plan': {'source': plan, 'candidates': estimate}
+        }
+
+    def _sort_key(self, sort):
+        if sort == 'path':
+            return self.path
+        column = {'size': 2, 'mtime': 3, 'atime': 4}[sort]
+        return lambda row_id: self.rows[row_id][column]
+
+    def _result(self, row_id):
+        _, name, size, mtime, atime = self.rows[row_id]
+        return {'path': self.path(row_id), 'name': name, 'size': size, 'mtime': mtime, 'atime': atime}
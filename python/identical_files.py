@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Identical Files - Byte-identical duplicate sets
+
+Features:
+- Candidates narrowed by size, then by a hash of the first block, then by
+  a full sha256, so most files are never read past their first block
+- Names that already share an inode count once
+- Optional HashCache (persisted, keyed by path, size and mtime) so files
+  that haven't changed are not read again on the next run
+- Sets report the bytes a link-based dedupe would reclaim
+"""
+
+import os
+import json
+import hashlib
+import threading
+from pathlib import Path
+
+from plan_executor import COPY_CHUNK
+from snapshot_store import atomic_write_json
+
+HEAD_BYTES = 64 * 1024
+
+
+def _digest(path, limit=None):
+    digest = hashlib.sha256()
+    remaining = limit
+    with open(path, 'rb') as f:
+        while remaining is None or remaining > 0:
+            chunk = f.read(COPY_CHUNK if remaining is None else min(COPY_CHUNK, remaining))
+            if not chunk:
+                break
+            digest.update(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+    return digest.hexdigest()
+
+
+class HashCache:
+    """
+    Thread-safe digest cache, shareable between roots
+
+    Entries are {path: [size, mtime_ns, head_digest, full_digest]}; any
+    change in size or mtime invalidates both digests.
+    """
+
+    def __init__(self, cache_file=None):
+        self.cache_file = Path(cache_file).expanduser() if cache_file else None
+        self.entries = {}
+        self.stats = {'hits': 0, 'misses': 0}
+        self._lock = threading.Lock()
+        if self.cache_file and self.cache_file.exists():
+            try:
+                with open(self.cache_file, 'r') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                self.entries = {}
+
+    def digest(self, path, limit=None):
+        st = os.stat(path)
+        slot = 2 if limit else 3
+        with self._lock:
+            entry = self.entries.get(path)
+            if entry and entry[0] == st.st_size and entry[1] == st.st_mtime_ns and entry[slot]:
+                self.stats['hits'] += 1
+                return entry[slot]
+
+        value = _digest(path, limit)
+        with self._lock:
+            self.stats['misses'] += 1
+            entry = self.entries.get(path)
+            if not entry or entry[0] != st.st_size or entry[1] != st.st_mtime_ns:
+                entry = self.entries[path] = [st.st_size, st.st_mtime_ns, None, None]
+            entry[slot] = value
+        return value
+
+    def save(self):
+        if self.cache_file:
+            with self._lock:
+                entries = dict(self.entries)
+            atomic_write_json(self.cache_file, entries)
+
+
+def _refine(groups, key):
+    """Split each group by key(path) into [(key, group)]; unreadable files drop out"""
+
+    refined = []
+    for _, group in groups:
+        buckets = {}
+        for entry in group:
+            try:
+                buckets.setdefault(key(entry[0]), []).append(entry)
+            except OSError:
+                continue
+        refined.extend((value, bucket) for value, bucket in buckets.items() if len(bucket) > 1)
+    return refined
+
+
+def find_identical(entries, min_size=4096, hash_cache=None):
+    """
+    Sets of byte-identical files among (path, size, mtime) entries
+
+    Returns sets sorted by reclaimable bytes, each
+    {'sha256', 'size', 'keeper', 'duplicates', 'reclaimable'}; the keeper
+    is the oldest copy (the original), duplicates are (path, size, mtime).
+    """
+
+    by_size = {}
+    for path, size, mtime in entries:
+        if size >= min_size:
+            by_size.setdefault(size, []).append((path, size, mtime))
+
+    # One name per inode: hardlinked names are already deduplicated
+    groups = []
+    for group in by_size.values():
+        if len(group) < 2:
+            continue
+        inodes = {}
+        for entry in group:
+            try:
+                st = os.stat(entry[0])
+            except OSError:
+                continue
+            inodes.setdefault((st.st_dev, st.st_ino), entry)
+        if len(inodes) > 1:
+            groups.append((None, list(inodes.values())))
+
+    digest = hash_cache.digest if hash_cache is not None else _digest
+    groups = _refine(groups, lambda path: digest(path, HEAD_BYTES))
+    groups = _refine(groups, digest)
+
+    sets = []
+    for sha256, group in groups:
+        group.sort(key=lambda entry: (entry[2], entry[0]))
+        keeper, duplicates = group[0], group[1:]
+        sets.append({
+            'sha256': sha256,
+            'size': keeper[1],
+            'keeper': keeper[0],
+            'duplicates': duplicates,
+            'reclaimable': keeper[1] * len(duplicates)
+        })
+
+    sets.sort(key=lambda s: s['reclaimable'], reverse=True)
+    return sets
@@ -14,20 +14,50 @@ Features:
 import os
 import json
 import hashlib
+import threading
 from pathlib import Path
 from datetime import datetime, timedelta
 from collections import defaultdict
 import time
 
+from scanner import TreeScanner, MountPolicy, SizeHints, iter_nodes
+from scan_index import ScanIndex, diff_trees
+from topk import TopK, HeavyHitters
+from timeseries import TimeSeriesStore, prune_reports
+from snapshot_store import SnapshotStore, atomic_write_json
+from file_index import FileIndex
+from near_duplicates import find_clusters, entries_from_tree
+from compressibility import CompressibilityEstimator
+import rollups
+
+# Serializes read-modify-write of archive logs across agents in one process
+_archive_log_lock = threading.Lock()
+
 class FileAnalysisAgent:
-    def __init__(self, downloads_path, log_path="~/.file_agent"):
+    def __init__(self, downloads_path, log_path="~/.file_agent", mount_policy=None, scan_index=None):
         self.downloads_path = Path(downloads_path).expanduser()
+        self.mount_policy = mount_policy or MountPolicy()
         self.log_path = Path(log_path).expanduser()
-        self.log_path.mkdir(exist_ok=True)
+        self.log_path.mkdir(parents=True, exist_ok=True)
         
         self.archive_log_file = self.log_path / "archive_log.json"
         self.recommendations_file = self.log_path / "recommendations.json"
         self.analysis_cache = self.log_path / "analysis_cache.json"
+        self.scan_checkpoint = self.log_path / "scan_checkpoint.json"
+        # Agents for several roots may share one index (it keys trees by root)
+        self.scan_index = scan_index or ScanIndex(self.log_path / "scan_index.json")
+        self.timeseries = TimeSeriesStore(self.log_path / "timeseries.json")
+        self.keep_reports = 20
+        
+        # Published, immutable analysis versions for lock-free readers
+        self.analysis_store = SnapshotStore(self.log_path, 'analysis')
+        # Partial results published while a scan is still running
+        self.progress_store = SnapshotStore(self.log_path, 'scan_progress', keep=1)
+        
+        # Query index over the latest scan tree, rebuilt when the tree changes
+        self._file_index = None
+        self._file_index_tree = None
+        self._file_index_lock = threading.Lock()
         
     def format_size(self, bytes_size):
         """Convert bytes to human readable"""
@@ -37,8 +67,13 @@ class FileAnalysisAgent:
             bytes_size /= 1024.0
         return f"{bytes_size:.2f} PB"
     
-    def analyze_folder_intelligence(self):
-        """Comprehensive intelligent analysis"""
+    def analyze_folder_intelligence(self, cancel_token=None):
+        """
+        Comprehensive intelligent analysis
+        
+        The scan checkpoints completed subtrees, so if `cancel_token` fires
+        (or the process is interrupted) the next call resumes where it stopped.
+        """
         
         print("🤖 AI Agent: Starting intelligent analysis...")
         
@@ -47,82 +82,209 @@ class FileAnalysisAgent:
             'folders': {},
             'recommendations': [],
             'space_insights': [],
-            'patterns': []
+            'patterns': [],
+            'partial_paths': [],
+            'heavy_hitters': {},
+            'storage_breakdown': {},
+            'changes_since_last_scan': None,
+            'near_duplicates': []
         }
         
-        # Scan all directories
-        for root, dirs, files in os.walk(self.downloads_path):
-            dirs[:] = [d for d in dirs if not d.startswith('.')]
-            
-            if not files:
+        previous_sizes = self.scan_index.previous_sizes()
+        heavy_hitters = HeavyHitters(previous_sizes=previous_sizes)
+        
+        def publish_progress(scanner):
+            self.progress_store.publish({
+                'timestamp': datetime.now().isoformat(),
+                'status': 'scanning',
+                'stats': dict(scanner.stats),
+                'heavy_hitters': heavy_hitters.report(self.format_size),
+                'partial_paths': sorted(set(scanner.partial_paths))
+            })
+        
+        # Largest subtrees (by last scan or known heavy names) first, so the
+        # big items reach the heavy-hitter report early
+        scanner = TreeScanner(self.downloads_path, cancel_token=cancel_token,
+                              checkpoint_file=self.scan_checkpoint, policy=self.mount_policy,
+                              observers=[heavy_hitters], hints=SizeHints(previous_sizes),
+                              progress=publish_progress)
+        tree = scanner.scan()
+        analysis['partial_paths'] = sorted(set(scanner.partial_paths))
+        analysis['heavy_hitters'] = heavy_hitters.report(self.format_size)
+        self.progress_store.publish({
+            'timestamp': datetime.now().isoformat(),
+            'status': 'complete',
+            'stats': dict(scanner.stats),
+            'heavy_hitters': analysis['heavy_hitters'],
+            'partial_paths': analysis['partial_paths']
+        })
+        analysis['storage_breakdown'] = rollups.summary(tree['rollup'])
+        now = time.time()
+        
+        previous_tree = self.scan_index.get_tree(self.downloads_path)
+        if previous_tree:
+            analysis['changes_since_last_scan'] = self.format_diff(diff_trees(previous_tree, tree, limit=10))
+        
+        self.scan_index.update_tree(self.downloads_path, tree, now)
+        self.record_trends(tree, analysis['storage_breakdown'], now)
+        
+        # Per-folder statistics from each directory's own files
+        nodes = {}
+        for node in iter_nodes(tree):
+            if not node['files']:
                 continue
+            nodes[node['path']] = node
             
-            folder_name = os.path.basename(root)
             folder_stats = {
-                'path': root,
-                'file_count': len(files),
+                'path': node['path'],
+                'file_count': len(node['files']),
                 'total_size': 0,
                 'file_types': defaultdict(int),
                 'oldest_file': None,
                 'newest_file': None,
-                'avg_age_days': 0
+                'avg_age_days': 0,
+                'rollup': rollups.new_rollup(now)
             }
             
             file_ages = []
             
-            for filename in files:
-                if filename.startswith('.'):
-                    continue
+            for filename, size, mtime, atime in node['files']:
+                age_days = (now - mtime) / (24 * 3600)
+                rollups.add_file(folder_stats['rollup'], filename, size, mtime, atime)
+                
+                folder_stats['total_size'] += size
+                ext = Path(filename).suffix.lower()
+                folder_stats['file_types'][ext or 'no_ext'] += 1
                 
-                filepath = os.path.join(root, filename)
-                try:
-                    stat = os.stat(filepath)
-                    size = stat.st_size
-                    mtime = stat.st_mtime
-                    age_days = (time.time() - mtime) / (24 * 3600)
-                    
-                    folder_stats['total_size'] += size
-                    ext = Path(filename).suffix.lower()
-                    folder_stats['file_types'][ext or 'no_ext'] += 1
-                    
-                    file_ages.append(age_days)
-                    
-                    if folder_stats['oldest_file'] is None or age_days > folder_stats['oldest_file']:
-                        folder_stats['oldest_file'] = age_days
-                    if folder_stats['newest_file'] is None or age_days < folder_stats['newest_file']:
-                        folder_stats['newest_file'] = age_days
-                        
-                except Exception as e:
-                    continue
+                file_ages.append(age_days)
+                
+                if folder_stats['oldest_file'] is None or age_days > folder_stats['oldest_file']:
+                    folder_stats['oldest_file'] = age_days
+                if folder_stats['newest_file'] is None or age_days < folder_stats['newest_file']:
+                    folder_stats['newest_file'] = age_days
             
             if file_ages:
                 folder_stats['avg_age_days'] = sum(file_ages) / len(file_ages)
             
-            analysis['folders'][folder_name] = folder_stats
+            analysis['folders'][node['name']] = folder_stats
         
         # Generate intelligent recommendations
-        analysis['recommendations'] = self.generate_intelligent_recommendations(analysis['folders'])
+        # Savings come from sampled compression ratios, cached in the scan index
+        estimator = CompressibilityEstimator(self.scan_index.compressibility())
+        analysis['recommendations'] = self.generate_intelligent_recommendations(analysis['folders'], nodes,
+                                                                                estimator)
+        self.scan_index.record_compressibility(estimator.cache)
+        self.scan_index.save()
         analysis['space_insights'] = self.generate_space_insights(analysis['folders'])
-        analysis['patterns'] = self.detect_patterns(analysis['folders'])
+        clusters = self.find_near_duplicates(tree)
+        analysis['near_duplicates'] = clusters[:20]
+        analysis['patterns'] = self.detect_patterns(analysis['folders'], clusters)
         
-        # Save analysis
-        with open(self.analysis_cache, 'w') as f:
-            json.dump(analysis, f, indent=2)
+        # Save and publish analysis; readers see the old or new version, never a mix
+        atomic_write_json(self.analysis_cache, analysis, indent=2)
+        self.analysis_store.publish(analysis)
         
         print(f"✅ Analysis complete. Generated {len(analysis['recommendations'])} recommendations.")
         
         return analysis
     
-    def generate_intelligent_recommendations(self, folders):
-        """Generate AI-powered recommendations based on analysis"""
+    def record_trends(self, tree, breakdown, timestamp=None):
+        """Record total, top-level folder and file-class sizes in the time-series store"""
+        
+        values = {'total': tree['size'], 'files': tree['file_count']}
+        for child in tree['children']:
+            values[f"folder:{child['name']}"] = child['size']
+        for cls, totals in breakdown.get('by_class', {}).items():
+            values[f'class:{cls}'] = totals['bytes']
+        
+        self.timeseries.record(values, timestamp)
+        self.timeseries.save()
+    
+    def get_trends(self, names=None, days=30, forecast_days=30):
+        """Growth per day and a linear forecast for each series"""
+        
+        trends = {}
+        for name in names or self.timeseries.names():
+            trend = self.timeseries.trend(name, days)
+            if trend is None:
+                continue
+            forecast = trend['latest'] + trend['slope_per_day'] * forecast_days
+            trends[name] = {
+                'latest': trend['latest'],
+                'growth_per_day': trend['slope_per_day'],
+                'growth_per_day_formatted': ('+' if trend['slope_per_day'] >= 0 else '-') +
+                                            self.format_size(abs(trend['slope_per_day'])),
+                'forecast': forecast,
+                'forecast_days': forecast_days,
+                'points': trend['points']
+            }
+        return trends
+    
+    def get_file_index(self):
+        """FileIndex over the latest indexed scan, or None before the first analysis"""
+        
+        tree = self.scan_index.get_tree(self.downloads_path)
+        if tree is None:
+            return None
+        
+        with self._file_index_lock:
+            # update_tree swaps in a new tree object, so identity means "same scan"
+            if self._file_index_tree is not tree:
+                self._file_index = FileIndex(tree)
+                self._file_index_tree = tree
+            return self._file_index
+    
+    def find_near_duplicates(self, tree=None):
+        """Near-duplicate name clusters for a scan tree (default: the latest indexed one)"""
+        
+        tree = tree or self.scan_index.get_tree(self.downloads_path)
+        if tree is None:
+            return []
+        
+        clusters = find_clusters(entries_from_tree(tree))
+        for cluster in clusters:
+            cluster['total_size_formatted'] = self.format_size(cluster['total_size'])
+            cluster['reclaimable_formatted'] = self.format_size(cluster['reclaimable'])
+            cluster['newest']['modified'] = datetime.fromtimestamp(cluster['newest']['mtime']).isoformat()
+        return clusters
+    
+    def format_diff(self, diff):
+        """Add human readable sizes to a scan_index diff result"""
+        
+        diff['total_delta_formatted'] = ('+' if diff['total_delta'] >= 0 else '-') + \
+            self.format_size(abs(diff['total_delta']))
+        for entry in diff['directories'] + diff['files']:
+            entry['delta_formatted'] = ('+' if entry['delta'] >= 0 else '-') + self.format_size(abs(entry['delta']))
+        return diff
+    
+    def format_savings(self, estimate):
+        """'12.00 MB (10.00 MB - 14.00 MB)' for a CompressibilityEstimator estimate"""
+        
+        return (f"{self.format_size(estimate['savings'])} "
+                f"({self.format_size(estimate['savings_low'])} - {self.format_size(estimate['savings_high'])})")
+    
+    def generate_intelligent_recommendations(self, folders, nodes=None, estimator=None):
+        """
+        Generate AI-powered recommendations based on analysis
         
+        `nodes` maps folder paths to scan-tree nodes; with them, archive
+        savings are estimated from the folders' actual files.
+        """
+        
+        nodes = nodes or {}
+        estimator = estimator or CompressibilityEstimator()
+        now = time.time()
         recommendations = []
         
         for folder_name, stats in folders.items():
             size_mb = stats['total_size'] / (1024 * 1024)
+            node = nodes.get(stats.get('path'))
+            files = [(os.path.join(node['path'], row[0]), row[1], row[2]) for row in node['files']] if node else []
             
             # Large project folders
             if size_mb > 200 and any(ext in stats['file_types'] for ext in ['.py', '.js', '.ts']):
+                estimate = estimator.estimate([(path, size) for path, size, _ in files], stats['path'],
+                                              total_bytes=stats['total_size'], now=now)
                 recommendations.append({
                     'priority': 'high',
                     'type': 'project-optimization',
@@ -139,19 +301,29 @@ class FileAnalysisAgent:
                         'git push -u origin main',
                         'Move old versions to Archives/'
                     ],
-                    'space_savings': self.format_size(stats['total_size'] * 0.7)  # Estimate 70% savings
+                    'space_savings': self.format_savings(estimate),
+                    'compression_ratio': round(estimate['ratio'], 3)
                 })
             
-            # Old archives
-            if size_mb > 100 and '.zip' in stats['file_types'] and stats['avg_age_days'] > 180:
+            # Old archives: archive bytes untouched for 6+ months, straight from the rollup
+            old_archive_count, old_archive_bytes = rollups.query(stats['rollup'], ext_class='archives',
+                                                                 min_age_days=180)
+            if old_archive_bytes > 100 * 1024 * 1024:
+                # Local copies over a year old are deleted once uploaded; the
+                # upload itself is the compressed size of the 6+ month set
+                old_archives = [(path, size, mtime) for path, size, mtime in files
+                                if rollups.extension_class(path) == 'archives' and now - mtime >= 180 * 24 * 3600]
+                upload = estimator.estimate([(path, size) for path, size, _ in old_archives], stats['path'],
+                                            total_bytes=old_archive_bytes, now=now)
+                freed = sum(size for _, size, mtime in old_archives if now - mtime >= 365 * 24 * 3600)
                 recommendations.append({
                     'priority': 'medium',
                     'type': 'cloud-migration',
                     'folder': folder_name,
                     'size': self.format_size(stats['total_size']),
                     'title': f'Move {folder_name} Archives to Cloud',
-                    'description': f'{stats["file_count"]} archive files ({size_mb:.1f} MB) averaging '
-                                   f'{stats["avg_age_days"]:.0f} days old.',
+                    'description': f'{old_archive_count} archive files '
+                                   f'({self.format_size(old_archive_bytes)}) not modified in 6+ months.',
                     'reason': 'Rarely accessed archives consuming significant local space',
                     'recommendation': 'Upload to MEGA/Google Drive, keep only recent archives locally',
                     'actions': [
@@ -160,7 +332,10 @@ class FileAnalysisAgent:
                         'Delete local copies >1 year old',
                         'Keep manifest of archived files'
                     ],
-                    'space_savings': self.format_size(stats['total_size'] * 0.8)
+                    'space_savings': self.format_size(freed),
+                    'upload_size': (f"{self.format_size(upload['archive_size'])} "
+                                    f"({self.format_size(upload['archive_low'])} - "
+                                    f"{self.format_size(upload['archive_high'])})")
                 })
             
             # Research paper organization
@@ -214,10 +389,12 @@ class FileAnalysisAgent:
         
         total_size = sum(stats['total_size'] for stats in folders.values())
         
-        # Sort folders by size
-        sorted_folders = sorted(folders.items(), key=lambda x: x[1]['total_size'], reverse=True)
+        # Five largest folders
+        largest = TopK(5)
+        for folder_name, stats in folders.items():
+            largest.push(stats['total_size'], (folder_name, stats))
         
-        for i, (folder_name, stats) in enumerate(sorted_folders[:5]):
+        for i, (folder_name, stats) in enumerate(largest.items()):
             percentage = (stats['total_size'] / total_size * 100) if total_size > 0 else 0
             
             insight = {
@@ -246,29 +423,23 @@ class FileAnalysisAgent:
         
         return insights
     
-    def detect_patterns(self, folders):
+    def detect_patterns(self, folders, clusters=None):
         """Detect usage patterns and workflow insights"""
         
         patterns = []
         
-        # Detect duplicate file patterns
-        file_names = defaultdict(list)
-        for folder_name, stats in folders.items():
-            folder_path = stats['path']
-            for root, dirs, files in os.walk(folder_path):
-                for filename in files:
-                    base_name = Path(filename).stem.lower()
-                    file_names[base_name].append(filename)
+        # Detect duplicate file patterns (near-duplicate name clusters from the scan)
+        clusters = clusters if clusters is not None else self.find_near_duplicates()
         
-        duplicates = {name: files for name, files in file_names.items() if len(files) > 1}
-        
-        if len(duplicates) > 10:
+        if len(clusters) > 10:
+            reclaimable = sum(c['reclaimable'] for c in clusters)
             patterns.append({
                 'type': 'duplicate-names',
                 'severity': 'medium',
-                'count': len(duplicates),
-                'description': f'Found {len(duplicates)} sets of files with similar names',
-                'examples': list(duplicates.keys())[:5],
+                'count': len(clusters),
+                'description': f'Found {len(clusters)} sets of files with similar names '
+                               f'({self.format_size(reclaimable)} in older copies)',
+                'examples': [c['newest']['name'] for c in clusters[:5]],
                 'impact': 'Potential version confusion, wasted space',
                 'action': 'Run duplicate consolidation tool'
             })
@@ -320,22 +491,22 @@ class FileAnalysisAgent:
             'user': os.getenv('USER', 'unknown')
         }
         
-        # Load existing log
-        if self.archive_log_file.exists():
-            with open(self.archive_log_file, 'r') as f:
-                archive_log = json.load(f)
-        else:
-            archive_log = []
-        
-        # Add new entry
-        archive_log.insert(0, log_entry)
-        
-        # Keep last 1000 entries
-        archive_log = archive_log[:1000]
-        
-        # Save log
-        with open(self.archive_log_file, 'w') as f:
-            json.dump(archive_log, f, indent=2)
+        with _archive_log_lock:
+            # Load existing log
+            if self.archive_log_file.exists():
+                with open(self.archive_log_file, 'r') as f:
+                    archive_log = json.load(f)
+            else:
+                archive_log = []
+            
+            # Add new entry
+            archive_log.insert(0, log_entry)
+            
+            # Keep last 1000 entries
+            archive_log = archive_log[:1000]
+            
+            # Save log
+            atomic_write_json(self.archive_log_file, archive_log, indent=2)
         
         print(f"📝 Logged: {action} - {len(log_entry['files'])} file(s)")
         
@@ -352,10 +523,18 @@ class FileAnalysisAgent:
         
         return log[:limit]
     
-    def generate_report(self):
+    def generate_report(self, cancel_token=None):
         """Generate comprehensive analysis report"""
         
-        analysis = self.analyze_folder_intelligence()
+        analysis = self.analyze_folder_intelligence(cancel_token)
+        
+        top_folders = TopK(10)
+        for name, stats in analysis['folders'].items():
+            top_folders.push(stats['total_size'], {
+                'name': name,
+                'size': self.format_size(stats['total_size']),
+                'files': stats['file_count']
+            })
         
         report = {
             'generated_at': datetime.now().isoformat(),
@@ -365,20 +544,15 @@ class FileAnalysisAgent:
                 'total_files': sum(f['file_count'] for f in analysis['folders'].values()),
                 'recommendations_count': len(analysis['recommendations']),
                 'high_priority': len([r for r in analysis['recommendations'] if r['priority'] == 'high']),
-                'patterns_detected': len(analysis['patterns'])
+                'patterns_detected': len(analysis['patterns']),
+                'partial_paths': analysis['partial_paths']
             },
-            'top_folders_by_size': sorted(
-                [
-                    {
-                        'name': name,
-                        'size': self.format_size(stats['total_size']),
-                        'files': stats['file_count']
-                    }
-                    for name, stats in analysis['folders'].items()
-                ],
-                key=lambda x: analysis['folders'][x['name']]['total_size'],
-                reverse=True
-            )[:10],
+            'top_folders_by_size': top_folders.items(),
+            'largest_files': analysis['heavy_hitters']['largest_files'],
+            'heavy_hitters': analysis['heavy_hitters'],
+            'storage_breakdown': analysis['storage_breakdown'],
+            'changes_since_last_scan': analysis['changes_since_last_scan'],
+            'trends': self.get_trends(['total']),
             'recommendations': analysis['recommendations'],
             'space_insights': analysis['space_insights'],
             'patterns': analysis['patterns']
@@ -417,6 +591,15 @@ class FileAnalysisAgent:
             print(f"   Context: {insight['context']}")
             print(f"   💡 {insight['suggestion']}")
         
+        if report['largest_files']:
+            print("\n" + "="*70)
+            print("📦 LARGEST FILES")
+            print("="*70)
+            
+            for entry in report['largest_files'][:5]:
+                print(f"\n📄 {entry['path']}")
+                print(f"   Size: {entry['size_formatted']} ({entry['age_days']:.0f} days old)")
+        
         if report['patterns']:
             print("\n" + "="*70)
             print("🔍 DETECTED PATTERNS")
@@ -430,11 +613,13 @@ class FileAnalysisAgent:
         
         # Save report
         report_file = self.log_path / f"analysis_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        with open(report_file, 'w') as f:
-            json.dump(report, f, indent=2)
+        atomic_write_json(report_file, report, indent=2)
         
         print(f"\n✅ Full report saved to: {report_file}")
         
+        # Trends live in the time-series store; old full reports are not needed
+        prune_reports(self.log_path, 'analysis_report_*.json', self.keep_reports)
+        
         return report
 
 def main():
@@ -15,12 +15,39 @@ Features:
 
 import os
 import json
+import argparse
 import subprocess
 from pathlib import Path
 from datetime import datetime, timedelta
 from collections import defaultdict
 import time
 import pwd
+import threading
+import stat as stat_module
+from concurrent.futures import ThreadPoolExecutor
+
+from scanner import CancellationToken, ScanCancelled, MountPolicy, ListingTimeout, SizeHints, walk, iter_nodes
+from exclusions import ExclusionRules
+from scan_index import ScanIndex
+from topk import TopK, HeavyHitters
+from timeseries import TimeSeriesStore, prune_reports
+from snapshot_store import atomic_write_json
+from estimator import QuickEstimator
+from cache_scanner import CacheScanner
+from compressibility import CompressibilityEstimator
+from phase_graph import PhaseGraph
+import rollups
+
+
+class _RandomOrder:
+    """walk() hints giving every pending directory a random priority"""
+
+    def __init__(self, rng):
+        self.rng = rng
+
+    def expected(self, path):
+        return self.rng.random()
+
 
 class MacOSStorageIntelligence:
     def __init__(self, user_context=None):
@@ -68,6 +95,56 @@ class MacOSStorageIntelligence:
         
         self.analysis_results = {}
         
+        # Stay off network shares, FUSE cloud drives and external disks
+        # unless the user context allowlists them; entries matching the
+        # user's exclusion rules are never listed by any scan
+        self.mount_policy = MountPolicy(
+            allowed_devices=self.user_context.get('allowed_devices', []),
+            timeout=self.user_context.get('io_timeout', 10.0),
+            exclusions=ExclusionRules.load(self.user_context.get('exclude_file'),
+                                           self.user_context.get('exclude', []))
+        )
+        # Hidden folders are skipped by the directory analysis and the bloat
+        # walk (which also leaves system folders alone but still finds .venv);
+        # the user's rules come last so they can override these
+        self.directory_exclusions = self.mount_policy.exclusions.extend(['.*/'], first=True)
+        self.bloat_exclusions = self.mount_policy.exclusions.extend(
+            ['Library/', 'Applications/', '.*/', '!.venv/'], first=True)
+        
+        # Interrupted analyses resume from here
+        self.cancel_token = CancellationToken()
+        self.checkpoint_file = self.home / '.storage_intelligence' / 'analysis_checkpoint.json'
+        
+        # Largest files/directories, fed by analyze_directory as it walks
+        self.scan_index = ScanIndex(self.home / '.storage_intelligence' / 'scan_index.json')
+        self.heavy_hitters = HeavyHitters(previous_sizes=self.scan_index.previous_sizes())
+        self.directory_sizes = {}
+        
+        # Category totals over time (hourly/daily/weekly rollups)
+        self.timeseries = TimeSeriesStore(self.home / '.storage_intelligence' / 'timeseries.json')
+        self.keep_reports = 20
+        
+        # Per-entry cache records: unchanged caches aren't rescanned
+        self.cache_scanner = CacheScanner(self.home / '.storage_intelligence' / 'cache_index.json',
+                                          policy=self.mount_policy, cancel_token=self.cancel_token)
+        
+        # Visit the subtrees expected to be largest first and publish
+        # partial results while the analysis runs
+        self.size_hints = SizeHints(self.scan_index.previous_sizes())
+        
+        # Sampled compression ratios for archive savings, cached in the scan index
+        self.compressibility = CompressibilityEstimator(self.scan_index.compressibility())
+        
+        self.progress_file = self.home / '.storage_intelligence' / 'analysis_progress.json'
+        self.progress_interval = 2.0
+        self._progress_sections = {}
+        self._last_progress = time.monotonic()
+        self._progress_lock = threading.Lock()
+        
+        # Analysis phases run concurrently on this many threads (default:
+        # one per phase)
+        self.workers = self.user_context.get('analysis_workers')
+        
     def load_user_context(self):
         """Load or create user context profile"""
         context_file = self.home / '.storage_intelligence' / 'user_context.json'
@@ -125,79 +202,132 @@ class MacOSStorageIntelligence:
         except:
             return None
     
-    def analyze_directory(self, path, max_depth=3, current_depth=0):
-        """Recursively analyze directory with size and age info"""
+    def analyze_directory(self, path, max_depth=3, current_depth=0, device=None, slow=None):
+        """
+        Recursively analyze directory with size and age info
+        
+        Stays on the filesystem of the top-level path unless the mount policy
+        allows crossing; listings that time out mark the result partial.
+        """
         
         if current_depth > max_depth:
             return None
         
+        self.cancel_token.raise_if_cancelled()
+        
         path = Path(path)
-        if not path.exists() or path.is_symlink():
+        if slow is None:
+            slow = self.mount_policy.is_slow(path)
+        
+        try:
+            path_stat = self.mount_policy.stat(path, slow)
+        except ListingTimeout:
+            self.mount_policy.partial_paths.append(str(path))
+            return None
+        except OSError:
+            return None
+        
+        if stat_module.S_ISLNK(path_stat.st_mode):
             return None
         
+        is_dir = stat_module.S_ISDIR(path_stat.st_mode)
         result = {
             'path': str(path),
             'name': path.name,
-            'type': 'directory' if path.is_dir() else 'file',
+            'type': 'directory' if is_dir else 'file',
+            'mtime': None,
+            'device': path_stat.st_dev,
             'size': 0,
             'file_count': 0,
             'subdirs': [],
             'oldest_access': None,
             'newest_access': None,
-            'file_types': defaultdict(int)
+            'file_types': defaultdict(int),
+            'rollup': rollups.new_rollup(time.time())
         }
         
+        if not is_dir:
+            result['size'] = path_stat.st_size
+            result['file_count'] = 1
+            result['oldest_access'] = path_stat.st_atime
+            result['newest_access'] = path_stat.st_atime
+            result['file_types'][path.suffix.lower() or 'no_extension'] = 1
+            rollups.add_file(result['rollup'], path.name, path_stat.st_size,
+                             path_stat.st_mtime, path_stat.st_atime)
+            return result
+        
+        # Analyze directory
+        result['mtime'] = path_stat.st_mtime
+        if device is None:
+            device = path_stat.st_dev
+        
         try:
-            if path.is_file():
-                stat = path.stat()
-                result['size'] = stat.st_size
-                result['file_count'] = 1
-                result['oldest_access'] = stat.st_atime
-                result['newest_access'] = stat.st_atime
-                result['file_types'][path.suffix.lower() or 'no_extension'] = 1
-                return result
-            
-            # Analyze directory
-            for item in path.iterdir():
-                try:
-                    if item.is_file():
-                        stat = item.stat()
-                        result['size'] += stat.st_size
-                        result['file_count'] += 1
-                        result['file_types'][item.suffix.lower() or 'no_extension'] += 1
-                        
-                        if result['oldest_access'] is None or stat.st_atime < result['oldest_access']:
-                            result['oldest_access'] = stat.st_atime
-                        if result['newest_access'] is None or stat.st_atime > result['newest_access']:
-                            result['newest_access'] = stat.st_atime
-                    
-                    elif item.is_dir() and not item.name.startswith('.'):
-                        subdir = self.analyze_directory(item, max_depth, current_depth + 1)
-                        if subdir:
-                            result['subdirs'].append(subdir)
-                            result['size'] += subdir['size']
-                            result['file_count'] += subdir['file_count']
-                            
-                            if result['oldest_access'] is None or (subdir['oldest_access'] and subdir['oldest_access'] < result['oldest_access']):
-                                result['oldest_access'] = subdir['oldest_access']
-                            if result['newest_access'] is None or (subdir['newest_access'] and subdir['newest_access'] > result['newest_access']):
-                                result['newest_access'] = subdir['newest_access']
+            entries = self.mount_policy.list_directory(path, slow, root=str(self.home),
+                                                       exclusions=self.directory_exclusions)
+        except ListingTimeout:
+            print(f"   ⚠️  Listing timed out, marked partial: {path}")
+            result['partial'] = True
+            self.mount_policy.partial_paths.append(str(path))
+            return result
+        except (PermissionError, OSError):
+            return None
+        
+        for name, item_path, stat in self.size_hints.order(entries):
+            if stat_module.S_ISREG(stat.st_mode):
+                self.heavy_hitters.add_file(item_path, stat.st_size, stat.st_mtime, stat.st_atime)
+                result['size'] += stat.st_size
+                result['file_count'] += 1
+                result['file_types'][Path(name).suffix.lower() or 'no_extension'] += 1
+                rollups.add_file(result['rollup'], name, stat.st_size, stat.st_mtime, stat.st_atime)
                 
-                except (PermissionError, OSError):
+                if result['oldest_access'] is None or stat.st_atime < result['oldest_access']:
+                    result['oldest_access'] = stat.st_atime
+                if result['newest_access'] is None or stat.st_atime > result['newest_access']:
+                    result['newest_access'] = stat.st_atime
+            
+            elif stat_module.S_ISDIR(stat.st_mode):
+                allowed, child_slow = self.mount_policy.enter(device, item_path, stat)
+                if not allowed:
                     continue
+                
+                subdir = self.analyze_directory(item_path, max_depth, current_depth + 1,
+                                                stat.st_dev, slow if child_slow is None else child_slow)
+                if subdir:
+                    result['subdirs'].append(subdir)
+                    result['size'] += subdir['size']
+                    result['file_count'] += subdir['file_count']
+                    rollups.merge(result['rollup'], subdir['rollup'])
+                    if subdir.get('partial'):
+                        result['partial'] = True
+                    
+                    if result['oldest_access'] is None or (subdir['oldest_access'] and subdir['oldest_access'] < result['oldest_access']):
+                        result['oldest_access'] = subdir['oldest_access']
+                    if result['newest_access'] is None or (subdir['newest_access'] and subdir['newest_access'] > result['newest_access']):
+                        result['newest_access'] = subdir['newest_access']
         
-        except (PermissionError, OSError):
-            return None
+        self.heavy_hitters.add_directory(result['path'], result['size'], result['file_count'])
+        self.directory_sizes[result['path']] = result['size']
+        self.publish_progress()
         
         return result
     
     def find_caches(self):
-        """Find and analyze cache directories"""
+        """
+        Find and analyze cache directories
+        
+        Each entry of each cache location is measured to full depth by the
+        cache scanner, which reuses its last result when no directory in
+        the entry changed, and tracks how fast entries refill after clears.
+        """
         
         print("\n🔍 Scanning for caches...")
         
-        caches = []
+        caches = TopK(50)
+        cache_count = 0
         total_cache_size = 0
+        quick_refill_size = 0
+        seen = []
+        partial_locations = []
         
         for cache_path in self.cache_locations:
             if not cache_path.exists():
@@ -205,31 +335,55 @@ class MacOSStorageIntelligence:
             
             try:
                 for item in cache_path.iterdir():
-                    if item.is_dir():
-                        analysis = self.analyze_directory(item, max_depth=2)
-                        if analysis and analysis['size'] > 1024 * 1024:  # > 1MB
-                            cache_info = {
-                                'path': str(item),
-                                'name': item.name,
-                                'size': analysis['size'],
-                                'size_formatted': self.format_size(analysis['size']),
-                                'app': self.identify_app(item.name),
-                                'safe_to_delete': self.is_safe_cache(item),
-                                'last_access': analysis['newest_access']
-                            }
-                            caches.append(cache_info)
-                            total_cache_size += analysis['size']
+                    self.cancel_token.raise_if_cancelled()
+                    if not item.is_dir() or item.is_symlink():
+                        continue
+                    seen.append(item)
+                    record = self.cache_scanner.scan_entry(item)
+                    if record is None:
+                        continue
+                    
+                    self.heavy_hitters.add_directory(str(item), record['size'], record['file_count'])
+                    self.directory_sizes[str(item)] = record['size']
+                    
+                    if record['size'] > 1024 * 1024:  # > 1MB
+                        cache_info = {
+                            'path': str(item),
+                            'name': item.name,
+                            'size': record['size'],
+                            'size_formatted': self.format_size(record['size']),
+                            'file_count': record['file_count'],
+                            'app': self.identify_app(item.name),
+                            'safe_to_delete': self.is_safe_cache(item),
+                            'last_access': record['newest_access'],
+                            'growth_per_day': record['growth_per_day'],
+                            'regrowth_hours': record['regrowth_hours'],
+                            'refills_quickly': record['refills_quickly']
+                        }
+                        if record['refills_quickly']:
+                            # Deleting it buys space for hours at most
+                            cache_info['safe_to_delete'] = False
+                            quick_refill_size += record['size']
+                        caches.push(record['size'], cache_info)
+                        cache_count += 1
+                        total_cache_size += record['size']
             except (PermissionError, OSError):
+                # Entries not reached keep their history
+                partial_locations.append(cache_path)
                 continue
         
-        # Sort by size
-        caches.sort(key=lambda x: x['size'], reverse=True)
+        self.cache_scanner.forget_missing(seen, partial_locations)
+        self.cache_scanner.save()
+        print(f"   {self.cache_scanner.stats['entries_rescanned']} cache entries rescanned, "
+              f"{self.cache_scanner.stats['entries_reused']} unchanged")
         
         return {
-            'caches': caches[:50],  # Top 50
+            'caches': caches.items(),  # Top 50, largest first
             'total_size': total_cache_size,
             'total_size_formatted': self.format_size(total_cache_size),
-            'count': len(caches)
+            'count': cache_count,
+            'quick_refill_size': quick_refill_size,
+            'quick_refill_size_formatted': self.format_size(quick_refill_size)
         }
     
     def find_development_bloat(self):
@@ -246,11 +400,9 @@ class MacOSStorageIntelligence:
         }
         
         # Find node_modules
-        for root, dirs, files in os.walk(self.home):
-            # Skip system directories
-            if any(skip in root for skip in ['/Library/', '/.', '/Applications/']):
-                continue
-            
+        # System and hidden directories are pruned before they are listed
+        for root, dirs, files in walk(self.home, self.mount_policy, self.cancel_token, self.size_hints,
+                                      exclusions=self.bloat_exclusions):
             if 'node_modules' in dirs:
                 nm_path = Path(root) / 'node_modules'
                 analysis = self.analyze_directory(nm_path, max_depth=1)
@@ -312,6 +464,7 @@ class MacOSStorageIntelligence:
         
         for app_path in Path('/Applications').iterdir():
             if app_path.suffix == '.app':
+                self.cancel_token.raise_if_cancelled()
                 try:
                     # Get app size
                     result = subprocess.run(
@@ -433,24 +586,66 @@ class MacOSStorageIntelligence:
                 else:
                     plan['tier_4_safe_delete'].append(item)
         
+        # Archiving keeps the data locally, so it only saves what compression removes
+        for item in plan['tier_3_archive']:
+            item['archive_estimate'] = self.estimate_archive(item)
+        tier_3 = [item['archive_estimate'] for item in plan['tier_3_archive']]
+        
         # Calculate savings
         plan['savings_potential'] = {
             'tier_2_cloud': sum(item.get('size', 0) for item in plan['tier_2_cloud_backup']),
-            'tier_3_archive': sum(item.get('size', 0) for item in plan['tier_3_archive']),
+            'tier_3_archive': sum(estimate['savings'] for estimate in tier_3),
+            'tier_3_archive_low': sum(estimate['savings_low'] for estimate in tier_3),
+            'tier_3_archive_high': sum(estimate['savings_high'] for estimate in tier_3),
             'tier_4_delete': sum(item.get('size', 0) for item in plan['tier_4_safe_delete']),
-            'total_reclaimable': sum(
-                item.get('size', 0) 
-                for tier in [plan['tier_2_cloud_backup'], plan['tier_3_archive'], plan['tier_4_safe_delete']]
-                for item in tier
-            )
         }
+        plan['savings_potential']['total_reclaimable'] = (plan['savings_potential']['tier_2_cloud'] +
+                                                          plan['savings_potential']['tier_3_archive'] +
+                                                          plan['savings_potential']['tier_4_delete'])
         
         # Format sizes
-        for key in plan['savings_potential']:
+        for key in list(plan['savings_potential']):
             plan['savings_potential'][f'{key}_formatted'] = self.format_size(plan['savings_potential'][key])
         
         return plan
     
+    def estimate_archive(self, item, max_files=2000, files_per_directory=20):
+        """
+        Expected compressed size of an item, from sampled blocks of its files
+        
+        A directory held by the scan index contributes every file it lists
+        (no walk). Otherwise directories are visited in random order and up
+        to `files_per_directory` random files are taken from each, until
+        `max_files`: the sample spreads over the whole item instead of the
+        first folders a walk reaches. The estimator then picks files by size
+        within each extension, and the sampled ratio is scaled to the item's
+        full size.
+        """
+        
+        path = item.get('path')
+        size = item.get('size', 0)
+        files = []
+        node = self.scan_index.find_node(path) if path else None
+        if path and os.path.isfile(path):
+            files.append((path, size))
+        elif node is not None:
+            for current in iter_nodes(node):
+                files.extend((os.path.join(current['path'], row[0]), row[1]) for row in current['files'])
+        elif path and os.path.isdir(path):
+            rng = self.compressibility.rng
+            for root, dirs, filenames in walk(path, self.mount_policy, self.cancel_token,
+                                              hints=_RandomOrder(rng)):
+                for filename in rng.sample(filenames, min(len(filenames), files_per_directory)):
+                    filepath = os.path.join(root, filename)
+                    try:
+                        files.append((filepath, os.lstat(filepath).st_size))
+                    except OSError:
+                        continue
+                if len(files) >= max_files:
+                    break
+        
+        return self.compressibility.estimate(files, str(path), total_bytes=size)
+    
     def identify_app(self, name):
         """Identify application from cache name"""
         app_mappings = {
@@ -493,8 +688,117 @@ class MacOSStorageIntelligence:
         
         return False  # Default to cautious
     
-    def run_complete_analysis(self):
-        """Run complete system analysis"""
+    def record_trends(self, analysis):
+        """Record category and critical-path totals in the time-series store"""
+        
+        dev_bloat = analysis.get('dev_bloat', {})
+        values = {
+            'caches': analysis.get('caches', {}).get('total_size', 0),
+            'node_modules': sum(item['size'] for item in dev_bloat.get('node_modules', [])),
+            'python_venv': sum(item['size'] for item in dev_bloat.get('python_venv', [])),
+            'docker': sum(item['size'] for item in dev_bloat.get('docker_images', [])),
+            'applications': sum(app['size'] for app in analysis.get('applications', []))
+        }
+        for name in self.critical_paths:
+            if isinstance(analysis.get(name), dict):
+                values[f'path:{name}'] = analysis[name]['size']
+        
+        self.timeseries.record(values)
+        self.timeseries.save()
+    
+    def get_trends(self, days=30, forecast_days=30):
+        """Growth per day and linear forecast for every recorded category"""
+        
+        trends = {}
+        for name in self.timeseries.names():
+            trend = self.timeseries.trend(name, days)
+            if trend:
+                trends[name] = {
+                    'latest': trend['latest'],
+                    'growth_per_day': trend['slope_per_day'],
+                    'forecast': trend['latest'] + trend['slope_per_day'] * forecast_days,
+                    'forecast_days': forecast_days
+                }
+        return trends
+    
+    def load_checkpoint(self):
+        """Load results saved by an interrupted run_complete_analysis"""
+        
+        if self.checkpoint_file.exists():
+            try:
+                with open(self.checkpoint_file, 'r') as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                pass
+        
+        return {'paths': {}, 'phases': {}}
+    
+    def save_checkpoint(self, checkpoint):
+        """Atomically persist completed directory and phase results"""
+        
+        atomic_write_json(self.checkpoint_file, checkpoint, default=str)
+    
+    def is_unchanged(self, dir_analysis):
+        """True if no directory in a saved analyze_directory result has a new mtime"""
+        
+        stack = [dir_analysis]
+        while stack:
+            node = stack.pop()
+            try:
+                if (node.get('mtime') is None or 'rollup' not in node
+                        or Path(node['path']).stat().st_mtime != node['mtime']):
+                    return False
+            except OSError:
+                return False
+            stack.extend(node['subdirs'])
+        
+        return True
+    
+    def publish_progress(self, analysis=None, force=False, status='scanning'):
+        """
+        Write partial results so far to analysis_progress.json
+        
+        Throttled to one write per `progress_interval` unless forced.
+        """
+        
+        # Phases run concurrently and all report here
+        with self._progress_lock:
+            if analysis is not None:
+                self._progress_sections = dict(analysis)
+            now = time.monotonic()
+            if not force and now - self._last_progress < self.progress_interval:
+                return
+            self._last_progress = now
+            self._write_progress(self._progress_sections, status)
+    
+    def _write_progress(self, sections, status):
+        progress = {
+            'timestamp': datetime.now().isoformat(),
+            'status': status,
+            'completed': [key for key in sections if key in self.critical_paths or
+                          key in ('caches', 'dev_bloat', 'applications')],
+            'directory_totals': {key: {'size': sections[key]['size'],
+                                       'size_formatted': self.format_size(sections[key]['size'])}
+                                 for key in self.critical_paths if isinstance(sections.get(key), dict)},
+            'caches_total': sections.get('caches', {}).get('total_size'),
+            'dev_bloat_total': sections.get('dev_bloat', {}).get('total_size'),
+            'heavy_hitters': self.heavy_hitters.report(self.format_size)
+        }
+        atomic_write_json(self.progress_file, progress, indent=2, default=str)
+    
+    def run_complete_analysis(self, resume=True, executor=None):
+        """
+        Run complete system analysis
+        
+        Phases form a dependency graph run on `executor` (default: a thread
+        pool for this run): disk usage, each critical path, caches,
+        development bloat and applications all run at once; the storage
+        plan starts once applications are scored in, recommendations once
+        their inputs are in. Each phase is checkpointed and published as it
+        completes; if the run is cancelled via `self.cancel_token` or
+        interrupted, the next call with resume=True picks up from the
+        checkpoint.
+        """
         
         print("="*70)
         print("🤖 macOS STORAGE INTELLIGENCE - COMPLETE SYSTEM ANALYSIS")
@@ -504,45 +808,144 @@ class MacOSStorageIntelligence:
         print(f"Context: {self.user_context['profession']}")
         print("")
         
-        # Disk usage
-        print("💾 Overall Disk Usage:")
-        disk = self.get_disk_usage()
-        if disk:
-            print(f"   Total: {disk['total']}")
-            print(f"   Used: {disk['used']} ({disk['percent']})")
-            print(f"   Available: {disk['available']}")
-        
         analysis = {
             'timestamp': datetime.now().isoformat(),
-            'user': self.user,
-            'disk_usage': disk
+            'user': self.user
         }
         
-        # Analyze major directories
-        print("\n📁 Analyzing major directories...")
-        for name, path in self.critical_paths.items():
-            if path.exists():
-                print(f"   Analyzing {name}...")
-                dir_analysis = self.analyze_directory(path, max_depth=2)
-                if dir_analysis:
-                    analysis[name] = dir_analysis
+        checkpoint = self.load_checkpoint() if resume else {'paths': {}, 'phases': {}}
+        if checkpoint['paths'] or checkpoint['phases']:
+            print("\n♻️  Resuming interrupted analysis from checkpoint")
         
-        # Find caches
-        analysis['caches'] = self.find_caches()
+        graph = PhaseGraph()
+        graph.add('disk_usage', lambda inputs: self.get_disk_usage())
         
-        # Find development bloat
-        analysis['dev_bloat'] = self.find_development_bloat()
+        print("\n📁 Analyzing major directories...")
+        for name, path in self.critical_paths.items():
+            if not path.exists():
+                continue
+            previous = checkpoint['paths'].get(name)
+            if previous and self.is_unchanged(previous):
+                print(f"   Reusing {name} (unchanged since checkpoint)")
+                graph.provide(f'path:{name}', previous)
+                continue
+            print(f"   Analyzing {name}...")
+            graph.add(f'path:{name}', lambda inputs, path=path: self.analyze_directory(path, max_depth=2))
         
-        # Analyze applications
-        analysis['applications'] = self.analyze_applications()
+        phases = [
+            ('caches', self.find_caches),              # Find caches
+            ('dev_bloat', self.find_development_bloat),  # Find development bloat
+            ('applications', self.analyze_applications)  # Analyze applications
+        ]
+        for key, phase in phases:
+            if key in checkpoint['phases']:
+                graph.provide(key, checkpoint['phases'][key])
+            else:
+                graph.add(key, lambda inputs, phase=phase: phase())
+        
+        # Scored items come from the list-valued categories (applications)
+        graph.add('storage_plan', self.generate_storage_plan, requires=['applications'])
+        graph.add('recommendations', self.generate_recommendations,
+                  requires=['caches', 'dev_bloat', 'applications', 'storage_plan'])
+        
+        checkpoint_phases = {key for key, _ in phases}
+        
+        def completed(name, result, seconds):
+            print(f"   ✓ {name} ({seconds:.1f}s)")
+            if name == 'disk_usage' and result:
+                print(f"💾 Overall Disk Usage: {result['used']} of {result['total']} used "
+                      f"({result['percent']}), {result['available']} available")
+            if result is None:
+                return
+            if name.startswith('path:'):
+                # Stored under the bare name; the 'applications' phase
+                # result wins over the /Applications listing, as before
+                name = name[len('path:'):]
+                if not isinstance(analysis.get(name), list):
+                    analysis[name] = result
+                checkpoint['paths'][name] = result
+            elif name in checkpoint_phases:
+                analysis[name] = result
+                checkpoint['phases'][name] = result
+            else:
+                return
+            self.save_checkpoint(checkpoint)
+            self.publish_progress(analysis, force=True)
+        
+        own_executor = executor is None
+        if own_executor:
+            executor = ThreadPoolExecutor(max_workers=self.workers or len(graph.phases) or 1,
+                                          thread_name_prefix='analysis')
+        try:
+            results = graph.run(executor, on_complete=completed)
+        except KeyboardInterrupt:
+            # Running phases stop at their next cancellation check
+            self.cancel_token.cancel()
+            raise
+        finally:
+            if own_executor:
+                executor.shutdown(wait=True)
+        
+        # Same layout as a sequential run, whatever order phases finished in
+        keys = (['disk_usage'] + [f'path:{name}' for name in self.critical_paths] + [key for key, _ in phases]
+                + ['storage_plan', 'recommendations'])
+        analysis = {'timestamp': analysis['timestamp'], 'user': self.user, 'disk_usage': None}
+        analysis.update((key.replace('path:', '', 1), results[key]) for key in keys
+                        if results.get(key) is not None)
+        analysis['phase_timings'] = {name: round(seconds, 2) for name, seconds in graph.timings.items()}
+        
+        # Largest files/directories seen anywhere, and growth since last run
+        analysis['heavy_hitters'] = self.heavy_hitters.report(self.format_size)
+        self.scan_index.record_sizes(self.directory_sizes)
+        self.scan_index.record_compressibility(self.compressibility.cache, max_age=self.compressibility.max_age)
+        self.scan_index.save()
+        self.record_trends(analysis)
+        analysis['trends'] = self.get_trends()
+        
+        # Mounts left out and subtrees that timed out
+        analysis['skipped_mounts'] = sorted(set(self.mount_policy.skipped_mounts))
+        analysis['partial_paths'] = sorted(set(self.mount_policy.partial_paths))
+        
+        self.publish_progress(analysis, force=True, status='complete')
+        
+        if self.checkpoint_file.exists():
+            self.checkpoint_file.unlink()
         
-        # Generate storage plan
-        analysis['storage_plan'] = self.generate_storage_plan(analysis)
+        return analysis
+    
+    def quick_estimate(self, path=None, budget_seconds=5.0, refine_seconds=0.0, on_update=None):
+        """
+        Storage breakdown in seconds: sampled estimates with confidence intervals
         
-        # Generate recommendations
-        analysis['recommendations'] = self.generate_recommendations(analysis)
+        Top levels of `path` (default: home) are listed exactly and each
+        subtree is estimated by random directory sampling for
+        `budget_seconds`. With `refine_seconds`, sampling continues and
+        estimates tighten, becoming exact for subtrees fully listed.
+        """
         
-        return analysis
+        estimator = QuickEstimator(path or self.home, policy=self.mount_policy,
+                                   cancel_token=self.cancel_token)
+        report = estimator.estimate(budget_seconds)
+        if on_update:
+            on_update(report)
+        if refine_seconds and not report['exact']:
+            report = estimator.refine(refine_seconds, on_update=on_update, update_interval=2.0)
+        
+        report['timestamp'] = datetime.now().isoformat()
+        atomic_write_json(self.home / '.storage_intelligence' / 'quick_estimate.json', report, indent=2)
+        return report
+    
+    def format_estimate(self, entry):
+        """'12.3 GB (11.9 GB - 12.8 GB)' or the exact size"""
+        
+        if entry['size'] is None:
+            return 'not sampled yet'
+        if entry.get('exact'):
+            return f"{self.format_size(entry['size'])} (exact)"
+        if entry['size_high'] is None:
+            return f"≥ {self.format_size(entry['size_low'])}"
+        return (f"{self.format_size(entry['size'])} "
+                f"({self.format_size(entry['size_low'])} - {self.format_size(entry['size_high'])})")
     
     def generate_recommendations(self, analysis):
         """Generate intelligent recommendations"""
@@ -556,7 +959,10 @@ class MacOSStorageIntelligence:
                 'category': 'cache_cleanup',
                 'title': f'Clean {analysis["caches"]["total_size_formatted"]} of Caches',
                 'description': f'Found {analysis["caches"]["count"]} cache directories consuming '
-                              f'{analysis["caches"]["total_size_formatted"]}. Most can be safely deleted.',
+                              f'{analysis["caches"]["total_size_formatted"]}. Most can be safely deleted'
+                              + (f' ({analysis["caches"]["quick_refill_size_formatted"]} refills within '
+                                 f'hours and is not worth clearing).'
+                                 if analysis['caches'].get('quick_refill_size') else '.'),
                 'actions': [
                     'Review cache list in dashboard',
                     'Delete browser caches',
@@ -630,26 +1036,63 @@ class MacOSStorageIntelligence:
     def save_analysis(self, analysis, output_path=None):
         """Save analysis to file"""
         
-        if output_path is None:
+        default_location = output_path is None
+        if default_location:
             output_path = self.home / '.storage_intelligence' / f'analysis_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
         
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        with open(output_path, 'w') as f:
-            json.dump(analysis, f, indent=2, default=str)
+        atomic_write_json(output_path, analysis, indent=2, default=str)
         
         print(f"\n✅ Analysis saved to: {output_path}")
         
+        # History is kept in the time-series store; prune old full dumps
+        if default_location:
+            prune_reports(output_path.parent, 'analysis_[0-9]*.json', self.keep_reports)
+        
         return output_path
 
-def main():
+def print_estimate(storage_intel, report, limit=10):
+    """Print a quick-estimate breakdown"""
+    
+    total = dict(report['total'], exact=report['exact'])
+    state = 'exact' if report['exact'] else f"{int(report['confidence'] * 100)}% interval"
+    print(f"\n⚡ {report['root']}: {storage_intel.format_estimate(total)}  "
+          f"[{state}, {report['directories_listed']} dirs listed, {report['elapsed_seconds']}s]")
+    for entry in report['subtrees'][:limit]:
+        print(f"   • {Path(entry['path']).name:<30} {storage_intel.format_estimate(entry)}")
+
+def main(argv=None):
     """Main execution"""
     
+    parser = argparse.ArgumentParser(description='macOS Storage Intelligence')
+    parser.add_argument('--quick', action='store_true',
+                        help='Estimate the storage breakdown by sampling instead of a full analysis')
+    parser.add_argument('--budget', type=float, default=5.0,
+                        help='Seconds to spend on the first quick estimate (default: 5)')
+    parser.add_argument('--refine', type=float, default=0.0,
+                        help='Further seconds to keep refining quick estimates toward exact numbers')
+    parser.add_argument('--path', help='Root for --quick (default: home directory)')
+    args = parser.parse_args(argv)
+    
     # Initialize system
     storage_intel = MacOSStorageIntelligence()
     
+    if args.quick:
+        try:
+            report = storage_intel.quick_estimate(
+                args.path, args.budget, args.refine,
+                on_update=lambda r: print_estimate(storage_intel, r))
+        except (ScanCancelled, KeyboardInterrupt):
+            print("\n⏸️  Estimate interrupted.")
+            return None
+        print_estimate(storage_intel, report, limit=20)
+        return report
+    
     # Run analysis
-    analysis = storage_intel.run_complete_analysis()
+    try:
+        analysis = storage_intel.run_complete_analysis()
+    except (ScanCancelled, KeyboardInterrupt):
+        print("\n⏸️  Analysis interrupted. Progress saved; run again to resume.")
+        return None
     
     # Print summary
     print("\n" + "="*70)
@@ -665,6 +1108,11 @@ def main():
         print(f"   • node_modules: {len(analysis['dev_bloat']['node_modules'])} projects")
         print(f"   • Python venvs: {len(analysis['dev_bloat']['python_venv'])} environments")
     
+    if analysis.get('heavy_hitters', {}).get('largest_files'):
+        print(f"\n📦 Largest Files:")
+        for entry in analysis['heavy_hitters']['largest_files'][:5]:
+            print(f"   • {entry['size_formatted']}  {entry['path']}")
+    
     if 'applications' in analysis:
         total_app_size = sum(app['size'] for app in analysis['applications'])
         print(f"\n📱 Applications: {storage_intel.format_size(total_app_size)} "
@@ -677,11 +1125,23 @@ def main():
         print(f"   • Cloud Backup: {len(plan['tier_2_cloud_backup'])} items "
               f"({plan['savings_potential']['tier_2_cloud_formatted']})")
         print(f"   • Archive: {len(plan['tier_3_archive'])} items "
-              f"({plan['savings_potential']['tier_3_archive_formatted']})")
+              f"({plan['savings_potential']['tier_3_archive_formatted']} after compression, "
+              f"{plan['savings_potential']['tier_3_archive_low_formatted']} - "
+              f"{plan['savings_potential']['tier_3_archive_high_formatted']})")
         print(f"   • Safe Delete: {len(plan['tier_4_safe_delete'])} items "
               f"({plan['savings_potential']['tier_4_delete_formatted']})")
         print(f"\n💰 Total Reclaimable: {plan['savings_potential']['total_reclaimable_formatted']}")
     
+    growing = sorted(((name, trend) for name, trend in analysis.get('trends', {}).items()
+                      if trend['growth_per_day'] > 0),
+                     key=lambda item: item[1]['growth_per_day'], reverse=True)
+    if growing:
+        print(f"\n📈 Growing Fastest (last 30 days):")
+        for name, trend in growing[:5]:
+            print(f"   • {name.replace('path:', '', 1)}: "
+                  f"+{storage_intel.format_size(trend['growth_per_day'])}/day, "
+                  f"{storage_intel.format_size(trend['forecast'])} in {trend['forecast_days']} days")
+    
     print("\n" + "="*70)
     print("🎯 TOP RECOMMENDATIONS")
     print("="*70)
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Name Index - Trigram search over scanned file names
+
+Features:
+- Posting lists of lowercase basename trigrams
+- Substring search: intersect the query's posting lists (rarest first),
+  then confirm each candidate
+- Fuzzy search: rank names by trigram overlap with the query (Dice score)
+- Incremental sync between two scan trees, descending only into
+  subtrees whose aggregate hash changed
+- Per-directory updates for callers that refresh a single folder
+"""
+
+import os
+import threading
+from collections import Counter
+
+
+def trigrams(text, pad=False):
+    """Set of lowercase character trigrams; `pad` marks word start and end"""
+
+    text = text.lower()
+    if pad:
+        text = f'  {text} '
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class NameIndex:
+    """
+    In-memory trigram index over one scanned root
+
+    Entries are (directory, name) pairs with integer ids. Names are
+    indexed by padded trigrams, which include every interior trigram, so
+    substring queries look up the query's unpadded trigrams while fuzzy
+    queries use padded ones (a match at the start of a name counts more).
+    """
+
+    def __init__(self, tree=None):
+        self._lock = threading.Lock()
+        self.entries = {}      # id -> (directory, name)
+        self.by_directory = {} # directory -> {name: id}
+        self.postings = {}     # trigram -> set of ids
+        self._next_id = 0
+
+        if tree is not None:
+            self.sync(None, tree)
+
+    def __len__(self):
+        return len(self.entries)
+
+    # Maintenance
+
+    def _add(self, directory, name):
+        entry_id = self._next_id
+        self._next_id += 1
+        self.entries[entry_id] = (directory, name)
+        self.by_directory.setdefault(directory, {})[name] = entry_id
+        for gram in trigrams(name, pad=True):
+            self.postings.setdefault(gram, set()).add(entry_id)
+
+    def _remove(self, directory, name):
+        names = self.by_directory.get(directory)
+        entry_id = names.pop(name, None) if names else None
+        if entry_id is None:
+            return
+        if not names:
+            del self.by_directory[directory]
+        del self.entries[entry_id]
+        for gram in trigrams(name, pad=True):
+            posting = self.postings.get(gram)
+            if posting is not None:
+                posting.discard(entry_id)
+                if not posting:
+                    del self.postings[gram]
+
+    def _set_directory(self, directory, names):
+        current = self.by_directory.get(directory, {})
+        names = set(names)
+        for name in [n for n in current if n not in names]:
+            self._remove(directory, name)
+        for name in names:
+            if name not in current:
+                self._add(directory, name)
+
+    def _drop_subtree(self, node):
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            for name in list(self.by_directory.get(current['path'], {})):
+                self._remove(current['path'], name)
+            stack.extend(current['children'])
+
+    def update_directory(self, directory, names):
+        """Replace the indexed file names of one directory"""
+
+        with self._lock:
+            self._set_directory(str(directory), names)
+
+    def sync(self, old_tree, new_tree):
+        """
+        Bring the index from old_tree's state to new_tree's
+
+        Subtrees whose aggregate hash is unchanged are skipped, so an
+        incremental rescan costs time proportional to what changed.
+        Returns the number of directories whose names were re-read.
+        """
+
+        visited = 0
+        with self._lock:
+            stack = [(old_tree, new_tree)]
+            while stack:
+                old_node, new_node = stack.pop()
+                if old_node is None:
+                    # New subtree: index everything
+                    inner = [new_node]
+                    while inner:
+                        node = inner.pop()
+                        self._set_directory(node['path'], (row[0] for row in node['files']))
+                        visited += 1
+                        inner.extend(node['children'])
+                    continue
+
+                if old_node.get('hash') and old_node.get('hash') == new_node.get('hash'):
+                    continue
+
+                self._set_directory(new_node['path'], (row[0] for row in new_node['files']))
+                visited += 1
+
+                old_children = {child['path']: child for child in old_node['children']}
+                for child in new_node['children']:
+                    stack.append((old_children.pop(child['path'], None), child))
+                for removed in old_children.values():
+                    self._drop_subtree(removed)
+
+        return visited
+
+    # Queries
+
+    def search(self, query, limit=20, fuzzy=False, path_prefix=None, min_similarity=0.3):
+        """
+        File names containing `query` (or resembling it, when fuzzy)
+
+        Substring results rank exact names first, then prefix matches,
+        then matches at a word boundary, then shorter names. Fuzzy results
+        rank by Dice similarity of padded trigram sets.
+
+        Returns [{'path', 'name', 'score'}].
+        """
+
+        query = query.strip().lower()
+        if not query:
+            return []
+        prefix = None
+        if path_prefix is not None:
+            prefix = str(path_prefix).rstrip('/')
+
+        with self._lock:
+            if fuzzy:
+                scored = self._fuzzy(query, min_similarity)
+            else:
+                scored = self._substring(query)
+
+            results = []
+            for score, entry_id in scored:
+                directory, name = self.entries[entry_id]
+                if prefix is not None and not (directory == prefix or directory.startswith(prefix + '/')):
+                    continue
+                results.append((score, name.lower(), entry_id))
+
+            results.sort(key=lambda r: (-r[0], len(r[1]), r[1]))
+            return [self._result(entry_id, score) for score, _, entry_id in results[:limit]]
+
+    def _substring(self, query):
+        grams = trigrams(query)
+        if grams:
+            postings = sorted((self.postings.get(gram, set()) for gram in grams), key=len)
+            candidates = set(postings[0])
+            for posting in postings[1:]:
+                candidates &= posting
+                if not candidates:
+                    break
+        else:
+            # Shorter than a trigram: no index help, check every name
+            candidates = self.entries.keys()
+
+        scored = []
+        for entry_id in candidates:
+            name = self.entries[entry_id][1].lower()
+            position = name.find(query)
+            if position < 0:
+                continue
+            if name == query or os.path.splitext(name)[0] == query:
+                score = 3.0
+            elif position == 0:
+                score = 2.0
+            elif not name[position - 1].isalnum():
+                score = 1.5
+            else:
+                score = 1.0
+            scored.append((score, entry_id))
+        return scored
+
+    def _fuzzy(self, query, min_similarity):
+        grams = trigrams(query, pad=True)
+        overlap = Counter()
+        for gram in grams:
+            overlap.update(self.postings.get(gram, ()))
+
+        scored = []
+        for entry_id, shared in overlap.items():
+            name_grams = len(trigrams(self.entries[entry_id][1], pad=True))
+            similarity = 2.0 * shared / (len(grams) + name_grams)
+            if similarity >= min_similarity:
+                scored.append((round(similarity, 3), entry_id))
+        return scored
+
+    def _result(self, entry_id, score):
+        directory, name = self.entries[entry_id]
+        return {'path': os.path.join(directory, name), 'name': name, 'score': score}
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Near Duplicates - Cluster files whose names are variants of each other
+
+Features:
+- Name normalization: copy suffixes, version tags and dates are stripped,
+  so "Kim2016 (1).pdf" and "kim_2016_final_v2.pdf" share one key
+- MinHash signatures over character shingles of the normalized name
+- LSH banding: only names sharing a band are compared, so clustering is
+  near-linear instead of all pairs
+- Clusters report total size, reclaimable bytes and the newest member
+"""
+
+import os
+import re
+import zlib
+import random
+
+from scanner import iter_nodes
+from rollups import extension_class
+
+# "(1)", "copy", "copy 2", "- Copy (3)"
+COPY_RE = re.compile(r'(\s*\(\d+\)|[\s_-]*copy(\s*\d+)?)$')
+# v1, v2.3, _final, -old, rev2, draft, backup
+VERSION_RE = re.compile(r'(?:^|[\s_.-])(v\d+(?:\.\d+)*|rev\d+|final|old|backup|bak|draft|latest|updated)'
+                        r'(?=$|[\s_.-])')
+# 2024-01-31, 2024_01_31, 20240131, 31-01-2024
+DATE_RE = re.compile(r'(?<!\d)(\d{4}[-_.]?\d{2}[-_.]?\d{2}|\d{2}[-_.]\d{2}[-_.]\d{4})(?!\d)')
+SEPARATOR_RE = re.compile(r'[\s_.\-()\[\]]+')
+DIGITS_RE = re.compile(r'\d+')
+
+SHINGLE = 3
+NUM_PERM = 16
+BANDS = 8
+
+
+def normalize_name(filename):
+    """Comparison key for a file name: lowercase stem without copy/version/date noise"""
+
+    stem = os.path.splitext(filename)[0].lower().strip()
+    bare = COPY_RE.sub('', stem)
+    previous = None
+    while previous != stem:
+        previous = stem
+        stem = COPY_RE.sub('', stem).strip()
+        stem = VERSION_RE.sub(' ', stem)
+        stem = DATE_RE.sub(' ', stem)
+    # A name that is nothing but a tag ("old.pdf", "2024-01-31.csv") is its own key
+    return SEPARATOR_RE.sub('', stem) or SEPARATOR_RE.sub('', bare)
+
+
+def is_versioned(filename):
+    """True when the name carries a copy suffix, version tag or date"""
+
+    stem = os.path.splitext(filename)[0].lower().strip()
+    return bool(COPY_RE.search(stem) or VERSION_RE.search(stem) or DATE_RE.search(stem))
+
+
+def shingles(key):
+    if len(key) <= SHINGLE:
+        return {key}
+    return {key[i:i + SHINGLE] for i in range(len(key) - SHINGLE + 1)}
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+class MinHasher:
+    """
+    MinHash over shingle sets
+
+    Each permutation is the shingle's CRC32 XORed with a random 32-bit
+    mask, which keeps the inner loop in C (map + min) and is plenty for
+    short file names.
+    """
+
+    def __init__(self, num_perm=NUM_PERM, seed=1):
+        rng = random.Random(seed)
+        self.masks = [rng.getrandbits(32) for _ in range(num_perm)]
+
+    def signature(self, shingle_set):
+        hashes = [zlib.crc32(s.encode('utf-8')) for s in shingle_set]
+        return [min(map(mask.__xor__, hashes)) for mask in self.masks]
+
+
+class _DisjointSet:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, x):
+        parent = self.parent
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[rb] = ra
+
+
+def entries_from_tree(tree, skip_hidden=True):
+    """(path, name, size, mtime) for every file in a scan tree"""
+
+    for node in iter_nodes(tree):
+        for name, size, mtime, _ in node['files']:
+            if skip_hidden and name.startswith('.'):
+                continue
+            yield os.path.join(node['path'], name), name, size, mtime
+
+
+def find_clusters(entries, threshold=0.6, min_size=2, bands=BANDS, hasher=None):
+    """
+    Group files whose normalized names are equal or similar
+
+    Files with equal normalized keys join directly. Distinct keys are
+    MinHashed and banded per extension class; keys that share a band are
+    joined when their true shingle Jaccard similarity is at least
+    `threshold` and they contain the same numbers (kim2016 and kim2017
+    are different papers). Each band bucket is compared against its first key only,
+    which keeps huge buckets linear (other bands catch what that misses).
+
+    Returns clusters sorted by reclaimable bytes, each
+    {'key', 'files', 'count', 'total_size', 'reclaimable', 'newest'}.
+    """
+
+    hasher = hasher or MinHasher()
+    rows = len(hasher.masks) // bands
+
+    # Exact normalized keys, per extension class
+    groups = {}
+    for path, name, size, mtime in entries:
+        key = normalize_name(name)
+        if not key:
+            continue
+        groups.setdefault((extension_class(name), key), []).append((path, name, size, mtime))
+
+    keys = list(groups)
+    key_shingles = {group_key: shingles(group_key[1]) for group_key in keys}
+    key_digits = {group_key: DIGITS_RE.findall(group_key[1]) for group_key in keys}
+    disjoint = _DisjointSet()
+
+    buckets = {}
+    for group_key in keys:
+        disjoint.find(group_key)
+        signature = hasher.signature(key_shingles[group_key])
+        for band in range(bands):
+            band_key = (group_key[0], band, tuple(signature[band * rows:(band + 1) * rows]))
+            representative = buckets.setdefault(band_key, group_key)
+            if representative is group_key:
+                continue
+            if disjoint.find(representative) == disjoint.find(group_key):
+                continue
+            if key_digits[representative] != key_digits[group_key]:
+                continue
+            if jaccard(key_shingles[representative], key_shingles[group_key]) >= threshold:
+                disjoint.union(representative, group_key)
+
+    merged = {}
+    for group_key, files in groups.items():
+        root = disjoint.find(group_key)
+        cluster = merged.setdefault(root, {'keys': set(), 'files': []})
+        cluster['keys'].add(group_key[1])
+        cluster['files'].extend(files)
+
+    clusters = []
+    for root, cluster in merged.items():
+        files = cluster['files']
+        if len(files) < min_size:
+            continue
+        files.sort(key=lambda f: f[3], reverse=True)
+        total = sum(f[2] for f in files)
+        newest = files[0]
+        clusters.append({
+            'key': root[1],
+            'keys': sorted(cluster['keys']),
+            'extension_class': root[0],
+            'files': [{'path': p, 'name': n, 'size': s, 'mtime': m} for p, n, s, m in files],
+            'count': len(files),
+            'total_size': total,
+            'reclaimable': total - newest[2],
+            'newest': {'path': newest[0], 'name': newest[1], 'size': newest[2], 'mtime': newest[3]},
+            'versioned': any(is_versioned(f[1]) for f in files)
+        })
+
+    clusters.sort(key=lambda c: (c['reclaimable'], c['count']), reverse=True)
+    return clusters
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Phase Graph - Dependent analysis phases run concurrently
+
+Features:
+- Phases declare the phases whose results they need; a phase is submitted
+  to the executor as soon as its inputs are ready, so independent scans
+  overlap and end-to-end time approaches the longest dependency chain
+- Results handed over as {dependency: result}, never through shared
+  mutable state
+- Results already known (e.g. restored from a checkpoint) are provided up
+  front and their dependents start immediately
+- Completion callbacks run on the calling thread, one at a time, in the
+  order phases finish, so callers can checkpoint and publish without locks
+- The first failure stops new phases from starting and is re-raised once
+  the running ones have finished; phases that still succeed meanwhile are
+  reported as usual, so their work is checkpointed and not redone
+"""
+
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+
+
+class PhaseGraph:
+    """Named phases with dependencies"""
+
+    def __init__(self):
+        self.phases = {}     # name -> (func, requires)
+        self.provided = {}   # name -> result known before the run
+        self.timings = {}    # name -> seconds
+
+    def add(self, name, func, requires=()):
+        """Register func(inputs) -> result; `inputs` holds the results of `requires`"""
+
+        if name in self.phases or name in self.provided:
+            raise ValueError(f'Duplicate phase: {name}')
+        self.phases[name] = (func, tuple(requires))
+
+    def provide(self, name, result):
+        """Record a result that needs no phase to compute it"""
+
+        if name in self.phases or name in self.provided:
+            raise ValueError(f'Duplicate phase: {name}')
+        self.provided[name] = result
+
+    def _check(self):
+        known = set(self.phases) | set(self.provided)
+        for name, (_, requires) in self.phases.items():
+            missing = [r for r in requires if r not in known]
+            if missing:
+                raise ValueError(f'Phase {name} requires unknown phases: {missing}')
+
+        # Kahn's algorithm: whatever cannot be ordered is on a cycle
+        remaining = {name: set(requires) - set(self.provided) for name, (_, requires) in self.phases.items()}
+        ready = [name for name, requires in remaining.items() if not requires]
+        while ready:
+            done = ready.pop()
+            del remaining[done]
+            for name, requires in remaining.items():
+                if done in requires:
+                    requires.discard(done)
+                    if not requires:
+                        ready.append(name)
+        if remaining:
+            raise ValueError(f'Phase dependencies form a cycle: {sorted(remaining)}')
+
+    def run(self, executor, on_complete=None):
+        """
+        Run every phase on `executor`; returns {name: result}
+
+        on_complete(name, result, seconds) is called as each phase finishes
+        (not for provided results).
+        """
+
+        self._check()
+        results = dict(self.provided)
+        pending = dict(self.phases)
+        running = {}
+        failure = None
+
+        def submit_ready():
+            for name, (func, requires) in list(pending.items()):
+                if all(r in results for r in requires):
+                    del pending[name]
+                    inputs = {r: results[r] for r in requires}
+                    running[executor.submit(self._timed, func, inputs)] = name
+
+        submit_ready()
+        try:
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        result, seconds = future.result()
+                    except BaseException as e:
+                        failure = failure or e
+                        continue
+                    results[name] = result
+                    self.timings[name] = seconds
+                    if on_complete:
+                        on_complete(name, result, seconds)
+                if failure is None:
+                    submit_ready()
+        except BaseException:
+            for future in running:
+                future.cancel()
+            raise
+
+        if failure is not None:
+            raise failure
+        return results
+
+    @staticmethod
+    def _timed(func, inputs):
+        started = time.monotonic()
+        result = func(inputs)
+        return result, time.monotonic() - started
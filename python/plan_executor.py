@@ -0,0 +1,658 @@
+#!/usr/bin/env python3
+"""
+Plan Executor - Batched, parallel, crash-safe file moves and deletes
+
+Features:
+- Plans are lists of {'op': 'move', 'src', 'dst'}, {'op': 'delete', 'src'}
+  and {'op': 'link', 'src', 'dst'} (replace src with a reflink or hardlink
+  of the identical file dst)
+- Validation against the scan index: each op may carry the size and mtime
+  the index recorded, and is rejected if the file changed since
+- os.rename within a device; streamed, hash-verified copies across devices
+- Deletes go to a per-plan trash first, so a plan can be rolled back
+  until it is committed
+- Write-ahead journal (JSON lines) per plan: intents are made durable
+  before a batch runs, completions after it, so an interrupted plan can be
+  rolled forward or back on the next start
+- Links are made only after a byte-for-byte comparison (the plan comes
+  from hash matches), through a uniquely named temporary recorded in the
+  journal, and undone by writing the content back as an independent file
+- Bounded concurrency and one fsync per batch for the journal and for each
+  touched directory, instead of one per file
+"""
+
+import os
+import re
+import sys
+import json
+import errno
+import fcntl
+import time
+import uuid
+import shutil
+import hashlib
+import threading
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+COPY_CHUNK = 1024 * 1024
+PARTIAL_SUFFIX = '.partial'
+LINK_METHODS = ('auto', 'reflink', 'hardlink')
+# As generated by execute(): timestamp and a random suffix
+PLAN_ID_PATTERN = re.compile(r'^\d{8}_\d{6}_[0-9a-f]{6}$')
+
+# Linux ioctl that shares a file's extents with another (_IOW(0x94, 9, int))
+FICLONE = 0x40049409
+
+
+class PlanError(Exception):
+    """A plan operation could not be carried out"""
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(COPY_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _same_content(a, b):
+    """Byte-for-byte comparison (link ops come from hash matches already)"""
+
+    if os.path.getsize(a) != os.path.getsize(b):
+        return False
+    with open(a, 'rb') as fa, open(b, 'rb') as fb:
+        while True:
+            chunk_a, chunk_b = fa.read(COPY_CHUNK), fb.read(COPY_CHUNK)
+            if chunk_a != chunk_b:
+                return False
+            if not chunk_a:
+                return True
+
+
+def _link_temporary(src):
+    """Hidden, unique name next to src for building its replacement link"""
+
+    return os.path.join(os.path.dirname(src), f'.{os.path.basename(src)}.{uuid.uuid4().hex}.dedup')
+
+
+def _reflink(src, dst):
+    """Create dst sharing src's data blocks (copy-on-write); OSError where unsupported"""
+
+    if sys.platform == 'darwin':
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.clonefile(os.fsencode(src), os.fsencode(dst), 0) != 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), src)
+        return
+
+    with open(src, 'rb') as source:
+        fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        try:
+            fcntl.ioctl(fd, FICLONE, source.fileno())
+        except OSError:
+            os.close(fd)
+            os.unlink(dst)
+            raise
+        os.close(fd)
+
+
+def _fsync_directory(path):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class _Journal:
+    """Append-only JSON-lines journal for one plan"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._file = open(self.path, 'a')
+
+    def append(self, **record):
+        record['at'] = time.time()
+        with self._lock:
+            self._file.write(json.dumps(record) + '\n')
+
+    def sync(self):
+        with self._lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        with self._lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+
+    @staticmethod
+    def read(path):
+        records = []
+        try:
+            with open(path, 'r') as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        break  # torn final line from a crash
+        except OSError:
+            pass
+        return records
+
+
+class PlanExecutor:
+    """
+    Executes move/delete/link plans with a journal per plan
+
+    Ops within a batch run concurrently and must not depend on each other
+    (validation rejects duplicate sources and destinations). Deleted files
+    sit in `<journal_dir>/trash/<plan_id>/` until the plan is committed.
+    """
+
+    def __init__(self, journal_dir, workers=8, batch_size=256, allowed_roots=None):
+        self.journal_dir = Path(journal_dir).expanduser()
+        self.journal_dir.mkdir(parents=True, exist_ok=True)
+        self.trash_dir = self.journal_dir / 'trash'
+        self.workers = workers
+        self.batch_size = batch_size
+        self.allowed_roots = [str(Path(root).expanduser()) for root in (allowed_roots or [])]
+
+    def _journal_file(self, plan_id):
+        return self.journal_dir / f'plan_{plan_id}.jsonl'
+
+    def _plan_trash(self, plan_id):
+        """
+        Trash directory of an existing plan
+
+        plan_id may come from a client: anything but a generated id with a
+        journal is refused, so it can never name a path outside the trash.
+        """
+
+        if not isinstance(plan_id, str) or not PLAN_ID_PATTERN.match(plan_id):
+            raise PlanError(f'Invalid plan id: {plan_id!r}')
+        if not self._journal_file(plan_id).is_file():
+            raise PlanError(f'Unknown plan: {plan_id}')
+        trash_root = self.trash_dir.resolve()
+        trash = (self.trash_dir / plan_id).resolve()
+        if trash.parent != trash_root:
+            raise PlanError(f'Invalid plan id: {plan_id!r}')
+        return trash
+
+    def _allowed(self, path):
+        if not self.allowed_roots:
+            return True
+        path = os.path.abspath(path)
+        return any(path == root or path.startswith(root.rstrip('/') + '/') for root in self.allowed_roots)
+
+    # Validation
+
+    def validate(self, plan):
+        """
+        Split a plan into ops that can run now and rejected ones
+
+        Returns {'valid': [...], 'rejected': [{'op', 'reason'}]}.
+        """
+
+        valid, rejected = [], []
+        sources, destinations = set(), set()
+
+        for op in plan:
+            reason = None
+            kind = op.get('op')
+            src = os.path.abspath(os.path.expanduser(str(op.get('src', ''))))
+            dst = os.path.abspath(os.path.expanduser(str(op['dst']))) if op.get('dst') else None
+
+            if kind not in ('move', 'delete', 'link'):
+                reason = f'unknown op {kind!r}'
+            elif kind == 'link':
+                reason = self._link_problem(op, src, dst, sources, destinations)
+                if not reason:
+                    st = os.lstat(src)
+                    sources.add(src)
+                    destinations.add(dst)
+                    # Unique, so it never names a user's file; journaled with the intent
+                    valid.append({'op': kind, 'src': src, 'dst': dst, 'method': op.get('method', 'auto'),
+                                  'temporary': _link_temporary(src),
+                                  'stat': {'mode': st.st_mode, 'atime_ns': st.st_atime_ns,
+                                           'mtime_ns': st.st_mtime_ns}})
+                    continue
+            elif kind == 'move' and not dst:
+                reason = 'move without destination'
+            elif not self._allowed(src) or (dst and not self._allowed(dst)):
+                reason = 'outside allowed roots'
+            elif src in sources:
+                reason = 'source appears twice in plan'
+            elif dst and (dst in destinations or dst in sources):
+                reason = 'destination conflicts with another op'
+            elif dst and (dst == src or dst.startswith(src.rstrip('/') + '/')):
+                reason = 'destination inside source'
+            elif dst and os.path.lexists(dst):
+                reason = 'destination exists'
+            else:
+                try:
+                    st = os.lstat(src)
+                except OSError:
+                    reason = 'source missing'
+                else:
+                    if not (os.path.isfile(src) and not os.path.islink(src)):
+                        reason = 'source is not a regular file'
+                    elif op.get('size') is not None and st.st_size != op['size']:
+                        reason = 'size changed since scan'
+                    elif op.get('mtime') is not None and abs(st.st_mtime - op['mtime']) > 1e-3:
+                        reason = 'modified since scan'
+
+            if reason:
+                rejected.append({'op': op, 'reason': reason})
+                continue
+
+            sources.add(src)
+            if dst:
+                destinations.add(dst)
+            valid.append({'op': kind, 'src': src, 'dst': dst})
+
+        return {'valid': valid, 'rejected': rejected}
+
+    def _link_problem(self, op, src, dst, sources, destinations):
+        """Rejection reason for a link op, None if it can run"""
+
+        if not dst:
+            return 'link without target'
+        if op.get('method', 'auto') not in LINK_METHODS:
+            return f"unknown link method {op.get('method')!r}"
+        if not self._allowed(src) or not self._allowed(dst):
+            return 'outside allowed roots'
+        if src in sources or src in destinations or dst in sources:
+            return 'conflicts with another op'
+        try:
+            src_stat, dst_stat = os.lstat(src), os.lstat(dst)
+        except OSError:
+            return 'source or target missing'
+        if not (os.path.isfile(src) and os.path.isfile(dst)) or os.path.islink(src) or os.path.islink(dst):
+            return 'source or target is not a regular file'
+        if src_stat.st_dev != dst_stat.st_dev:
+            return 'source and target on different devices'
+        if src_stat.st_ino == dst_stat.st_ino:
+            return 'already linked'
+        if src_stat.st_size != dst_stat.st_size:
+            return 'sizes differ'
+        if op.get('size') is not None and src_stat.st_size != op['size']:
+            return 'size changed since scan'
+        if op.get('mtime') is not None and abs(src_stat.st_mtime - op['mtime']) > 1e-3:
+            return 'modified since scan'
+        return None
+
+    # Execution
+
+    def _trash_path(self, plan_id, src):
+        return str(self.trash_dir / plan_id / src.lstrip('/'))
+
+    def _move(self, src, dst):
+        """Rename within a device, verified streamed copy across devices"""
+
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        try:
+            os.rename(src, dst)
+            return 'rename'
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+
+        partial = dst + PARTIAL_SUFFIX
+        digest = hashlib.sha256()
+        with open(src, 'rb') as source, open(partial, 'wb') as target:
+            for chunk in iter(lambda: source.read(COPY_CHUNK), b''):
+                digest.update(chunk)
+                target.write(chunk)
+            target.flush()
+            os.fsync(target.fileno())
+
+        if _file_digest(partial) != digest.hexdigest():
+            os.unlink(partial)
+            raise PlanError(f'Copy verification failed: {src}')
+
+        shutil.copystat(src, partial)
+        os.rename(partial, dst)
+        os.unlink(src)
+        return 'copy'
+
+    def _link(self, src, target, temporary, method='auto'):
+        """
+        Replace src with a reflink (or hardlink) of the identical file target
+
+        Returns (method used, bytes reclaimed). A reflink is a separate
+        inode and keeps src's mode and timestamps; a hardlink shares the
+        target's inode, whose timestamps are left untouched.
+        """
+
+        before = os.lstat(src)
+        if not _same_content(src, target):
+            raise PlanError(f'Contents differ: {src}')
+
+        used = 'hardlink'
+        if method in ('auto', 'reflink'):
+            try:
+                _reflink(target, temporary)
+                used = 'reflink'
+            except OSError:
+                if method == 'reflink':
+                    raise
+        if used == 'hardlink':
+            os.link(target, temporary)
+        else:
+            shutil.copystat(src, temporary)
+
+        after = os.lstat(src)
+        if (after.st_ino, after.st_size, after.st_mtime_ns) != (before.st_ino, before.st_size, before.st_mtime_ns):
+            os.unlink(temporary)
+            raise PlanError(f'Modified during verification: {src}')
+
+        os.replace(temporary, src)
+        # Blocks are only freed if no other name still held the old inode
+        return used, before.st_blocks * 512 if before.st_nlink == 1 else 0
+
+    def _unlink_copy(self, src, target, stat):
+        """Undo a link: write target's content back to src as an independent file"""
+
+        partial = src + PARTIAL_SUFFIX
+        shutil.copyfile(target, partial)
+        os.chmod(partial, stat['mode'] & 0o7777)
+        os.utime(partial, ns=(stat['atime_ns'], stat['mtime_ns']))
+        os.replace(partial, src)
+
+    def _run_op(self, plan_id, seq, op):
+        if op['op'] == 'link':
+            method, reclaimed = self._link(op['src'], op['dst'], op['temporary'], op['method'])
+            return seq, method, op['dst'], reclaimed
+        target = op['dst'] if op['op'] == 'move' else self._trash_path(plan_id, op['src'])
+        method = self._move(op['src'], target)
+        return seq, method, target, 0
+
+    def execute(self, plan, plan_id=None, commit=True, progress=None):
+        """
+        Validate and run a plan
+
+        With commit=True, trashed deletes are purged once every op is done;
+        otherwise the plan stays open for rollback(plan_id) or commit(plan_id).
+        Returns a summary including the plan_id and rejected ops.
+        """
+
+        plan_id = plan_id or datetime.now().strftime('%Y%m%d_%H%M%S_') + uuid.uuid4().hex[:6]
+        if not PLAN_ID_PATTERN.match(plan_id):
+            raise PlanError(f'Invalid plan id: {plan_id!r}')
+        checked = self.validate(plan)
+        ops = checked['valid']
+
+        journal = _Journal(self._journal_file(plan_id))
+        journal.append(event='plan', plan_id=plan_id, ops=len(ops), rejected=len(checked['rejected']),
+                       commit=commit)
+        journal.sync()
+
+        summary = {'plan_id': plan_id, 'done': 0, 'failed': [], 'renamed': 0, 'copied': 0,
+                   'linked': 0, 'bytes': 0, 'bytes_reclaimed': 0, 'rejected': checked['rejected']}
+        started = time.time()
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                for batch_start in range(0, len(ops), self.batch_size):
+                    batch = list(enumerate(ops[batch_start:batch_start + self.batch_size], batch_start))
+
+                    # Write-ahead: every intent is durable before anything moves
+                    for seq, op in batch:
+                        journal.append(event='intent', seq=seq, **op)
+                    journal.sync()
+
+                    sizes = {}
+                    for seq, op in batch:
+                        try:
+                            sizes[seq] = os.lstat(op['src']).st_size
+                        except OSError:
+                            sizes[seq] = 0
+
+                    futures = {seq: pool.submit(self._run_op, plan_id, seq, op) for seq, op in batch}
+                    touched = set()
+                    for seq, op in batch:
+                        try:
+                            _, method, target, reclaimed = futures[seq].result()
+                        except (OSError, PlanError) as e:
+                            journal.append(event='failed', seq=seq, error=str(e))
+                            summary['failed'].append({'op': op, 'error': str(e)})
+                            continue
+                        touched.add(os.path.dirname(op['src']))
+                        touched.add(os.path.dirname(target))
+                        journal.append(event='done', seq=seq, method=method, target=target)
+                        summary['done'] += 1
+                        if op['op'] == 'link':
+                            summary['linked'] += 1
+                            summary['bytes_reclaimed'] += reclaimed
+                        else:
+                            summary['renamed' if method == 'rename' else 'copied'] += 1
+                            summary['bytes'] += sizes[seq]
+
+                    # One fsync per touched directory and one for the journal per batch
+                    for directory in touched:
+                        _fsync_directory(directory)
+                    journal.sync()
+
+                    if progress:
+                        progress(dict(summary, total=len(ops)))
+
+            journal.append(event='finished')
+        finally:
+            journal.close()
+
+        if commit and not summary['failed']:
+            self.commit(plan_id)
+            summary['committed'] = True
+
+        summary['elapsed_seconds'] = round(time.time() - started, 2)
+        return summary
+
+    # Commit, rollback and recovery
+
+    def _state(self, plan_id):
+        """Per-seq op state reconstructed from the journal"""
+
+        records = _Journal.read(self._journal_file(plan_id))
+        ops, flags = {}, {'commit': True, 'finished': False, 'committed': False}
+        for record in records:
+            event = record.get('event')
+            if event == 'plan':
+                flags['commit'] = record.get('commit', True)
+            elif event == 'finished':
+                flags['finished'] = True
+            elif event == 'intent':
+                ops[record['seq']] = {'op': record['op'], 'src': record['src'], 'dst': record['dst'],
+                                      'method': record.get('method'), 'stat': record.get('stat'),
+                                      'temporary': record.get('temporary'),
+                                      'state': 'intent'}
+            elif event in ('done', 'failed', 'undone') and record.get('seq') in ops:
+                ops[record['seq']]['state'] = event
+                if event == 'done':
+                    ops[record['seq']]['target'] = record['target']
+            elif event == 'committed':
+                flags['committed'] = True
+        return ops, flags
+
+    def commit(self, plan_id):
+        """Purge the plan's trashed deletes; the plan can no longer be rolled back"""
+
+        trash = self._plan_trash(plan_id)
+        shutil.rmtree(trash, ignore_errors=True)
+        journal = _Journal(self._journal_file(plan_id))
+        journal.append(event='committed')
+        journal.close()
+
+    def rollback(self, plan_id):
+        """Undo a plan's completed ops, newest first; returns the count undone"""
+
+        trash = self._plan_trash(plan_id)
+        ops, flags = self._state(plan_id)
+        if flags['committed']:
+            raise PlanError(f'Plan {plan_id} is committed and cannot be rolled back')
+
+        self._settle(plan_id, ops, forward=False)
+        journal = _Journal(self._journal_file(plan_id))
+        undone = 0
+        try:
+            for seq in sorted(ops, reverse=True):
+                op = ops[seq]
+                if op['state'] != 'done':
+                    continue
+                if op['op'] == 'link':
+                    if not (os.path.exists(op['src']) and os.path.exists(op['target'])):
+                        journal.append(event='failed', seq=seq, error='cannot undo: paths changed')
+                        continue
+                    self._unlink_copy(op['src'], op['target'], op['stat'])
+                    journal.append(event='undone', seq=seq)
+                    undone += 1
+                    continue
+                if os.path.lexists(op['src']) or not os.path.exists(op['target']):
+                    journal.append(event='failed', seq=seq, error='cannot undo: paths changed')
+                    continue
+                self._move(op['target'], op['src'])
+                journal.append(event='undone', seq=seq)
+                undone += 1
+        finally:
+            journal.close()
+
+        shutil.rmtree(trash, ignore_errors=True)
+        journal = _Journal(self._journal_file(plan_id))
+        journal.append(event='committed', rolled_back=True)
+        journal.close()
+        return undone
+
+    def _settle(self, plan_id, ops, forward=True):
+        """
+        Resolve ops whose intent was journaled but whose outcome wasn't
+
+        Rolling forward finishes them; rolling back leaves the source in
+        place. Either way no file is lost: a half-finished cross-device copy
+        is only discarded while its source still exists.
+        """
+
+        journal = _Journal(self._journal_file(plan_id))
+        try:
+            for seq, op in sorted(ops.items()):
+                if op['state'] != 'intent':
+                    continue
+                if op['op'] == 'link':
+                    self._settle_link(seq, op, journal, forward)
+                    continue
+                target = op['dst'] if op['op'] == 'move' else self._trash_path(plan_id, op['src'])
+                partial = target + PARTIAL_SUFFIX
+                src_exists, target_exists = os.path.lexists(op['src']), os.path.lexists(target)
+
+                if os.path.lexists(partial) and src_exists:
+                    os.unlink(partial)
+
+                if target_exists and not src_exists:
+                    op.update(state='done', target=target)
+                    journal.append(event='done', seq=seq, method='recovered', target=target)
+                elif target_exists and src_exists:
+                    # Copy finished but source not yet removed
+                    if _file_digest(target) == _file_digest(op['src']):
+                        os.unlink(op['src'])
+                        op.update(state='done', target=target)
+                        journal.append(event='done', seq=seq, method='recovered', target=target)
+                    else:
+                        os.unlink(target)
+                        op['state'] = 'failed'
+                        journal.append(event='failed', seq=seq, error='incomplete copy discarded')
+                elif src_exists and forward:
+                    try:
+                        method = self._move(op['src'], target)
+                    except (OSError, PlanError) as e:
+                        op['state'] = 'failed'
+                        journal.append(event='failed', seq=seq, error=str(e))
+                    else:
+                        op.update(state='done', target=target)
+                        journal.append(event='done', seq=seq, method=method, target=target)
+                else:
+                    op['state'] = 'failed'
+                    journal.append(event='failed', seq=seq, error='not started before interruption')
+        finally:
+            journal.close()
+
+    def _settle_link(self, seq, op, journal, forward):
+        """
+        Resolve an interrupted link; src always holds the right content
+
+        os.replace is atomic, so src is either the original file or the
+        finished link. A left-over temporary link (its unique name is in
+        the intent) is simply removed.
+        """
+
+        temporary = op.get('temporary')
+        if temporary and os.path.lexists(temporary):
+            os.unlink(temporary)
+
+        try:
+            linked = os.path.samefile(op['src'], op['dst'])
+        except OSError:
+            linked = False
+
+        if linked:
+            op.update(state='done', target=op['dst'])
+            journal.append(event='done', seq=seq, method='recovered', target=op['dst'])
+        elif forward and os.path.exists(op['src']) and os.path.exists(op['dst']):
+            try:
+                # The journaled name was just cleared, so it can be reused
+                temporary = op.get('temporary') or _link_temporary(op['src'])
+                method, _ = self._link(op['src'], op['dst'], temporary, op['method'] or 'auto')
+            except (OSError, PlanError) as e:
+                op['state'] = 'failed'
+                journal.append(event='failed', seq=seq, error=str(e))
+            else:
+                op.update(state='done', target=op['dst'])
+                journal.append(event='done', seq=seq, method=method, target=op['dst'])
+        else:
+            op['state'] = 'failed'
+            journal.append(event='failed', seq=seq, error='not started before interruption')
+
+    def open_plans(self):
+        """{plan_id: 'interrupted' | 'awaiting commit'} for plans not yet committed"""
+
+        plans = {}
+        for journal_file in sorted(self.journal_dir.glob('plan_*.jsonl')):
+            plan_id = journal_file.stem[len('plan_'):]
+            _, flags = self._state(plan_id)
+            if not flags['committed']:
+                plans[plan_id] = 'awaiting commit' if flags['finished'] else 'interrupted'
+        return plans
+
+    def recover(self, forward=True):
+        """
+        Finish (forward=True) or undo every interrupted plan
+
+        Plans that finished and are deliberately awaiting commit are left
+        alone. Returns {plan_id: outcome}.
+        """
+
+        outcomes = {}
+        for plan_id, status in self.open_plans().items():
+            if status != 'interrupted':
+                continue
+            if forward:
+                ops, flags = self._state(plan_id)
+                self._settle(plan_id, ops, forward=True)
+                journal = _Journal(self._journal_file(plan_id))
+                journal.append(event='finished', recovered=True)
+                journal.close()
+                if flags['commit'] and not any(op['state'] == 'failed' for op in ops.values()):
+                    self.commit(plan_id)
+                outcomes[plan_id] = 'rolled forward'
+            else:
+                outcomes[plan_id] = f'rolled back ({self.rollback(plan_id)} ops undone)'
+        return outcomes
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Rollups - Compact per-directory histograms merged up the scan tree
+
+Each directory node carries a rollup:
+- 'cube':  extension class x mtime age bucket x log2 size bucket -> [count, bytes]
+- 'atime': extension class x atime age bucket -> [count, bytes]
+
+Children merge into parents during traversal, so questions such as
+"how many GB of PDFs older than a year under Documents" are answered from
+one node's rollup without walking the disk again. Ages are relative to the
+rollup's scan time and resolved to bucket boundaries.
+"""
+
+import os
+
+DAY = 24 * 3600
+
+# Age buckets: (upper bound in days, label); the last bucket is open-ended
+AGE_BUCKETS = [
+    (7, '<1w'),
+    (30, '1w-1m'),
+    (90, '1-3m'),
+    (180, '3-6m'),
+    (365, '6-12m'),
+    (730, '1-2y'),
+    (None, '2y+'),
+]
+
+EXTENSION_CLASSES = {
+    'pdf': ['.pdf'],
+    'documents': ['.doc', '.docx', '.txt', '.rtf', '.odt', '.md', '.pages', '.tex', '.bib', '.ris'],
+    'spreadsheets': ['.xls', '.xlsx', '.xlsm', '.csv', '.tsv', '.ods', '.numbers'],
+    'presentations': ['.ppt', '.pptx', '.key', '.odp'],
+    'images': ['.jpg', '.jpeg', '.png', '.gif', '.heic', '.tif', '.tiff', '.bmp', '.svg', '.webp',
+               '.raw', '.dcm'],
+    'video': ['.mp4', '.mov', '.avi', '.mkv', '.m4v', '.webm'],
+    'audio': ['.mp3', '.wav', '.m4a', '.aac', '.flac', '.ogg'],
+    'archives': ['.zip', '.tar', '.gz', '.tgz', '.bz2', '.xz', '.7z', '.rar', '.zst'],
+    'disk_images': ['.dmg', '.iso', '.img', '.pkg', '.vmdk', '.qcow2'],
+    'code': ['.py', '.js', '.ts', '.jsx', '.tsx', '.html', '.css', '.r', '.rmd', '.ipynb', '.sh',
+             '.java', '.c', '.cpp', '.h', '.go', '.rs', '.swift', '.json', '.yaml', '.yml'],
+    'data': ['.sav', '.dta', '.rds', '.rdata', '.parquet', '.h5', '.hdf5', '.npy', '.npz', '.db',
+             '.sqlite', '.pkl', '.nii', '.mat'],
+}
+
+_CLASS_BY_EXTENSION = {ext: cls for cls, exts in EXTENSION_CLASSES.items() for ext in exts}
+
+
+def extension_class(filename):
+    return _CLASS_BY_EXTENSION.get(os.path.splitext(filename)[1].lower(), 'other')
+
+
+def age_bucket(age_seconds):
+    """Index into AGE_BUCKETS for an age in seconds"""
+
+    age_days = age_seconds / DAY
+    for index, (upper, _) in enumerate(AGE_BUCKETS):
+        if upper is not None and age_days < upper:
+            return index
+    return len(AGE_BUCKETS) - 1
+
+
+def size_bucket(size):
+    """log2 bucket: files in bucket b are [2**(b-1), 2**b) bytes (b=0 is empty files)"""
+    return int(size).bit_length()
+
+
+def new_rollup(as_of):
+    return {'as_of': as_of, 'cube': {}, 'atime': {}}
+
+
+def _bump(histogram, key, count, size):
+    cell = histogram.get(key)
+    if cell is None:
+        histogram[key] = [count, size]
+    else:
+        cell[0] += count
+        cell[1] += size
+
+
+def add_file(rollup, filename, size, mtime, atime):
+    now = rollup['as_of']
+    cls = extension_class(filename)
+    _bump(rollup['cube'], f'{cls}|{age_bucket(now - mtime)}|{size_bucket(size)}', 1, size)
+    _bump(rollup['atime'], f'{cls}|{age_bucket(now - atime)}', 1, size)
+
+
+def merge(into, other):
+    """Add other's histograms into `into`"""
+
+    for name in ('cube', 'atime'):
+        target = into[name]
+        for key, (count, size) in other[name].items():
+            _bump(target, key, count, size)
+    return into
+
+
+def _bucket_lower_days(index):
+    return AGE_BUCKETS[index - 1][0] if index > 0 else 0
+
+
+def query(rollup, ext_class=None, min_age_days=None, max_age_days=None, min_size=None,
+          max_size=None, by='mtime'):
+    """
+    (count, bytes) of files matching the filters
+
+    Age filters use bucket boundaries: a bucket is included when it lies
+    entirely inside [min_age_days, max_age_days]. Size filters likewise use
+    log2 bucket boundaries. `by='atime'` filters on last access instead of
+    modification (size filters are not available for atime).
+    """
+
+    histogram = rollup['cube'] if by == 'mtime' else rollup['atime']
+    count = total = 0
+
+    for key, (cell_count, cell_bytes) in histogram.items():
+        parts = key.split('|')
+        if ext_class and parts[0] != ext_class:
+            continue
+
+        age_index = int(parts[1])
+        lower = _bucket_lower_days(age_index)
+        upper = AGE_BUCKETS[age_index][0]
+        if min_age_days is not None and lower < min_age_days:
+            continue
+        if max_age_days is not None and (upper is None or upper > max_age_days):
+            continue
+
+        if by == 'mtime' and (min_size is not None or max_size is not None):
+            bucket = int(parts[2])
+            bucket_low = 2 ** (bucket - 1) if bucket > 0 else 0
+            bucket_high = 2 ** bucket
+            if min_size is not None and bucket_low < min_size:
+                continue
+            if max_size is not None and bucket_high > max_size:
+                continue
+
+        count += cell_count
+        total += cell_bytes
+
+    return count, total
+
+
+def summary(rollup):
+    """Marginal histograms for reports and dashboard charts"""
+
+    by_class, by_age, by_access, by_size = {}, {}, {}, {}
+
+    for key, (count, size) in rollup['cube'].items():
+        cls, age, bucket = key.split('|')
+        _bump(by_class, cls, count, size)
+        _bump(by_age, AGE_BUCKETS[int(age)][1], count, size)
+        _bump(by_size, f'<{2 ** int(bucket)}B' if int(bucket) else '0B', count, size)
+
+    for key, (count, size) in rollup['atime'].items():
+        _bump(by_access, AGE_BUCKETS[int(key.split('|')[1])][1], count, size)
+
+    def table(histogram):
+        return {key: {'count': count, 'bytes': size} for key, (count, size) in histogram.items()}
+
+    return {
+        'by_class': table(by_class),
+        'by_modified_age': table(by_age),
+        'by_access_age': table(by_access),
+        'by_size': table(by_size),
+    }
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Scan Index - Persistent record of completed scans
+
+Features:
+- Last completed scan tree for each scanned root
+- Per-directory size history used for growth tracking
+- Atomic saves (write to temp file, then rename)
+- Retained snapshots per root and a diff engine between them
+- Trigram name index per root, kept in sync as trees are replaced
+- Cached compressibility ratios per (folder, extension)
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+from datetime import datetime
+
+from scanner import iter_nodes
+from topk import TopK
+from name_index import NameIndex
+from snapshot_store import atomic_write_json
+
+
+def diff_trees(old, new, limit=20):
+    """
+    Largest byte deltas between two scan trees of the same root
+
+    Subtrees with equal aggregate hashes are skipped without descending,
+    so the work done is proportional to what changed, not to tree size.
+
+    Returns {'total_delta', 'directories', 'files', 'stats'} where
+    directories and files are the `limit` largest changes by |delta|.
+    """
+
+    directories = TopK(limit)
+    files = TopK(limit)
+    stats = {'directories_compared': 0, 'subtrees_pruned': 0}
+
+    def file_change(path, old_size, new_size):
+        delta = new_size - old_size
+        if delta:
+            status = 'added' if old_size == 0 and new_size else 'removed' if new_size == 0 else 'changed'
+            files.push(abs(delta), {'path': path, 'delta': delta, 'old_size': old_size,
+                                    'new_size': new_size, 'status': status})
+
+    def whole_subtree(node, sign):
+        """Every file of an added (+1) or removed (-1) subtree"""
+        for current in iter_nodes(node):
+            directories.push(current['size'], {
+                'path': current['path'], 'delta': sign * current['size'],
+                'old_size': current['size'] if sign < 0 else 0,
+                'new_size': current['size'] if sign > 0 else 0,
+                'status': 'added' if sign > 0 else 'removed'
+            })
+            for name, size, _, _ in current['files']:
+                path = os.path.join(current['path'], name)
+                file_change(path, size if sign < 0 else 0, size if sign > 0 else 0)
+
+    def compare(old_node, new_node):
+        if old_node.get('hash') and old_node.get('hash') == new_node.get('hash'):
+            stats['subtrees_pruned'] += 1
+            return
+
+        stats['directories_compared'] += 1
+        delta = new_node['size'] - old_node['size']
+        if delta:
+            directories.push(abs(delta), {
+                'path': new_node['path'], 'delta': delta, 'old_size': old_node['size'],
+                'new_size': new_node['size'], 'status': 'changed'
+            })
+
+        old_files = {row[0]: row[1] for row in old_node['files']}
+        new_files = {row[0]: row[1] for row in new_node['files']}
+        for name in old_files.keys() | new_files.keys():
+            file_change(os.path.join(new_node['path'], name),
+                        old_files.get(name, 0), new_files.get(name, 0))
+
+        old_children = {child['name']: child for child in old_node['children']}
+        new_children = {child['name']: child for child in new_node['children']}
+        for name, child in new_children.items():
+            if name in old_children:
+                compare(old_children[name], child)
+            else:
+                whole_subtree(child, +1)
+        for name, child in old_children.items():
+            if name not in new_children:
+                whole_subtree(child, -1)
+
+    compare(old, new)
+
+    return {
+        'total_delta': new['size'] - old['size'],
+        'directories': directories.items(),
+        'files': files.items(),
+        'stats': stats
+    }
+
+
+class ScanIndex:
+    """
+    Persistent index of scan trees, stored as JSON
+
+    Every completed tree is also written to snapshots/ as an immutable
+    snapshot file; the newest `keep_snapshots` per root are retained.
+    """
+
+    def __init__(self, index_file, keep_snapshots=10):
+        self.index_file = Path(index_file).expanduser()
+        self.snapshot_dir = self.index_file.parent / 'snapshots'
+        self.keep_snapshots = keep_snapshots
+        self.data = {'roots': {}, 'directory_sizes': {}, 'compressibility': {}}
+        self.name_indexes = {}  # root -> NameIndex, built on first search
+        self.listeners = []     # listener(root, previous tree, new tree) after each update
+        # Writers are serialized so agents for several roots can share one index
+        self._write_lock = threading.RLock()
+        self.load()
+
+    def load(self):
+        if self.index_file.exists():
+            try:
+                with open(self.index_file, 'r') as f:
+                    self.data = json.load(f)
+            except (OSError, ValueError):
+                pass
+
+        self.data.setdefault('roots', {})
+        self.data.setdefault('directory_sizes', {})
+        self.data.setdefault('compressibility', {})
+        return self
+
+    def save(self):
+        with self._write_lock:
+            atomic_write_json(self.index_file, self.data)
+
+    def get_tree(self, root):
+        entry = self.data['roots'].get(str(root))
+        return entry['tree'] if entry else None
+
+    def name_index(self, root):
+        """Trigram index of the file names in root's latest tree (None before a scan)"""
+
+        index = self.name_indexes.get(str(root))
+        if index is None:
+            tree = self.get_tree(root)
+            if tree is None:
+                return None
+            index = self.name_indexes[str(root)] = NameIndex(tree)
+        return index
+
+    def update_tree(self, root, tree, scanned_at=None):
+        """
+        Store a completed scan tree, record its directory sizes and snapshot it
+
+        The index is copy-on-write: a new `data` dict is built and swapped in
+        with one assignment, so readers holding the old one never see a
+        half-updated index.
+        """
+
+        with self._write_lock:
+            scanned_at = scanned_at or time.time()
+
+            # Forget directories under this root that no longer exist
+            prefix = str(root).rstrip('/') + '/'
+            sizes = {path: entry for path, entry in self.data['directory_sizes'].items()
+                     if not (path == str(root) or path.startswith(prefix))}
+            for node in iter_nodes(tree):
+                sizes[node['path']] = [node['size'], scanned_at]
+
+            roots = dict(self.data['roots'])
+            roots[str(root)] = {
+                'scanned_at': datetime.fromtimestamp(scanned_at).isoformat(),
+                'tree': tree
+            }
+
+            previous = self.get_tree(root)
+            self.data = dict(self.data, roots=roots, directory_sizes=sizes)
+
+            # Only directories under changed subtree hashes are re-indexed
+            name_index = self.name_indexes.get(str(root))
+            if name_index is not None:
+                name_index.sync(previous, tree)
+
+            # A failing listener must not cost the index its update
+            for listener in self.listeners:
+                try:
+                    listener(str(root), previous, tree)
+                except Exception as e:
+                    print(f"⚠️  Scan index listener failed: {e}")
+
+            self.snapshot(root, tree, scanned_at)
+
+    def find_node(self, path):
+        """Scan node for a directory inside any indexed tree, else None"""
+
+        path = str(path).rstrip('/') or '/'
+        for root, entry in self.data['roots'].items():
+            prefix = root.rstrip('/')
+            if path != prefix and not path.startswith(prefix + '/'):
+                continue
+            node = entry['tree']
+            for part in filter(None, path[len(prefix):].split('/')):
+                node = next((child for child in node['children'] if child['name'] == part), None)
+                if node is None:
+                    break
+            if node is not None:
+                return node
+        return None
+
+    def add_listener(self, listener):
+        """Call listener(root, previous, tree) whenever a tree is replaced"""
+
+        self.listeners.append(listener)
+
+    def holding_updates(self):
+        """
+        Context manager blocking update_tree; a listener can read `data`
+        and register interest inside it without missing a replacement
+        """
+
+        return self._write_lock
+
+    def snapshot(self, root, tree, scanned_at=None):
+        """Write an immutable snapshot of a tree and apply retention"""
+
+        scanned_at = scanned_at or time.time()
+        stamp = datetime.fromtimestamp(scanned_at).strftime('%Y%m%d_%H%M%S_%f')
+        snapshot_file = self.snapshot_dir / f'snapshot_{self._root_key(root)}_{stamp}.json'
+
+        atomic_write_json(snapshot_file, {'root': str(root), 'scanned_at': scanned_at, 'tree': tree})
+
+        for old_file in self.list_snapshots(root)[:-self.keep_snapshots]:
+            old_file.unlink()
+
+        return snapshot_file
+
+    @staticmethod
+    def _root_key(root):
+        return hashlib.sha1(str(root).encode('utf-8')).hexdigest()[:10]
+
+    def list_snapshots(self, root):
+        """Snapshot files for a root, oldest first"""
+
+        if not self.snapshot_dir.exists():
+            return []
+        return sorted(self.snapshot_dir.glob(f'snapshot_{self._root_key(root)}_*.json'))
+
+    @staticmethod
+    def load_snapshot(snapshot_file):
+        with open(snapshot_file, 'r') as f:
+            return json.load(f)
+
+    def find_snapshot(self, root, before=None):
+        """Newest snapshot taken at or before `before` (a timestamp), else the oldest"""
+
+        snapshots = self.list_snapshots(root)
+        if not snapshots:
+            return None
+        if before is None:
+            return snapshots[-1]
+
+        chosen = snapshots[0]
+        for snapshot_file in snapshots:
+            stamp = snapshot_file.stem.split('_', 2)[2]
+            if datetime.strptime(stamp, '%Y%m%d_%H%M%S_%f').timestamp() <= before:
+                chosen = snapshot_file
+        return chosen
+
+    def diff(self, root, old_snapshot=None, new_snapshot=None, limit=20):
+        """
+        Compare two snapshots of a root (default: the previous and latest)
+
+        Returns None when fewer than two snapshots exist.
+        """
+
+        snapshots = self.list_snapshots(root)
+        if new_snapshot is None:
+            if not snapshots:
+                return None
+            new_snapshot = snapshots[-1]
+        if old_snapshot is None:
+            earlier = [s for s in snapshots if s != Path(new_snapshot)]
+            if not earlier:
+                return None
+            old_snapshot = earlier[-1]
+
+        old = self.load_snapshot(old_snapshot)
+        new = self.load_snapshot(new_snapshot)
+        result = diff_trees(old['tree'], new['tree'], limit)
+        result.update({
+            'root': str(root),
+            'from': datetime.fromtimestamp(old['scanned_at']).isoformat(),
+            'to': datetime.fromtimestamp(new['scanned_at']).isoformat()
+        })
+        return result
+
+    def record_sizes(self, sizes, timestamp=None):
+        """Remember {directory_path: size} as of timestamp"""
+
+        with self._write_lock:
+            timestamp = timestamp or time.time()
+            merged = dict(self.data['directory_sizes'])
+            for path, size in sizes.items():
+                merged[path] = [size, timestamp]
+            self.data = dict(self.data, directory_sizes=merged)
+
+    def compressibility(self):
+        """{group_key: ratio entry} cached by earlier CompressibilityEstimator runs"""
+        return dict(self.data['compressibility'])
+
+    def record_compressibility(self, cache, max_age=None, now=None):
+        """Merge sampled ratio entries; entries older than max_age seconds are dropped"""
+
+        with self._write_lock:
+            merged = dict(self.data['compressibility'])
+            merged.update(cache)
+            if max_age is not None:
+                now = now or time.time()
+                merged = {key: entry for key, entry in merged.items() if now - entry.get('at', 0) < max_age}
+            self.data = dict(self.data, compressibility=merged)
+
+    def previous_sizes(self):
+        """{directory_path: (size, timestamp)} from earlier scans"""
+        return {path: tuple(entry) for path, entry in self.data['directory_sizes'].items()}
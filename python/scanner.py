@@ -0,0 +1,612 @@
+#!/usr/bin/env python3
+"""
+Tree Scanner - Cancellable, checkpointed directory traversal
+
+Features:
+- Single os.scandir pass producing per-directory subtree aggregates
+- Cooperative cancellation (daemon stop, SIGTERM, Ctrl+C)
+- Periodic checkpoints of completed subtrees
+- Resume: finished subtrees whose directory mtimes are unchanged are reused
+- Mount-boundary awareness: stays on one filesystem unless allowlisted
+- Watchdog timeouts for directory listings on network/FUSE mounts
+- Observers (e.g. top-K trackers) fed file by file during traversal
+- Per-directory rollups (extension class x age x size histograms)
+- Aggregate subtree hashes so unchanged subtrees compare in O(1)
+- Largest-first ordering from previous sizes and known heavy directories,
+  with progress callbacks so partial results can be published mid-scan
+- Optional I/O budget (directory listings per second) shared by every
+  scan that uses the same policy
+- Exclusion rules (gitignore-style, see exclusions.py) applied to each
+  entry before it is stat'ed, so excluded subtrees are never entered
+"""
+
+import os
+import re
+import json
+import heapq
+import hashlib
+import stat as stat_module
+import subprocess
+import threading
+import time
+from pathlib import Path
+from datetime import datetime
+
+import rollups
+from exclusions import ExclusionRules
+from snapshot_store import atomic_write_json
+
+
+class ScanCancelled(Exception):
+    """Raised inside a scan when its cancellation token fires"""
+
+
+class CancellationToken:
+    """Thread-safe flag checked cooperatively by long-running scans"""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise ScanCancelled('Scan cancelled')
+
+
+class ListingTimeout(OSError):
+    """A directory listing on a slow mount did not finish in time"""
+
+
+# Filesystems whose listings can hang (network shares, FUSE cloud drives)
+SLOW_FSTYPES = {
+    'nfs', 'nfs4', 'smbfs', 'cifs', 'smb3', 'afpfs', 'webdav', 'davfs',
+    'ftp', 'sshfs', '9p', 'ceph', 'glusterfs'
+}
+
+
+def read_mount_table():
+    """Return {mount_point: fstype} from /proc/mounts (Linux) or `mount` (macOS)"""
+
+    mounts = {}
+
+    try:
+        with open('/proc/mounts', 'r') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 3:
+                    # /proc/mounts escapes spaces as \040
+                    mount_point = parts[1].replace('\\040', ' ')
+                    mounts[mount_point] = parts[2]
+        return mounts
+    except OSError:
+        pass
+
+    try:
+        result = subprocess.run(['mount'], capture_output=True, text=True, timeout=10)
+        for line in result.stdout.splitlines():
+            match = re.match(r'^(.*?) on (.*) \(([^,)]+)', line)
+            if match:
+                mounts[match.group(2)] = match.group(3).strip()
+    except (OSError, subprocess.SubprocessError):
+        pass
+
+    return mounts
+
+
+class IOBudget:
+    """
+    Token bucket of directory listings per second
+
+    One budget shared by concurrent scans caps their combined load on the
+    disk, however many roots are being scanned.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(rate, 1))
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, cost=1.0):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= cost:
+                    self.tokens -= cost
+                    return
+                wait = (cost - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class MountPolicy:
+    """
+    Decide which filesystems a traversal may enter and how to list them
+
+    By default a scan stays on the filesystem of its root. Mount points in
+    `allowed_devices` (given as st_dev numbers or mount point paths) are
+    crossed. Listings on network/FUSE filesystems run under a watchdog so a
+    dead mount costs at most `timeout` seconds per directory. With a
+    `budget` (IOBudget), every listing first takes a token from it.
+    `exclusions` (ExclusionRules, default: the user's rules file) drop
+    matching entries from listings.
+    """
+
+    def __init__(self, one_filesystem=True, allowed_devices=None, timeout=10.0, mounts=None, budget=None,
+                 exclusions=None):
+        self.one_filesystem = one_filesystem
+        self.budget = budget
+        self.exclusions = exclusions if exclusions is not None else ExclusionRules.load()
+        self.timeout = timeout
+        self.mounts = read_mount_table() if mounts is None else mounts
+
+        allowed_devices = allowed_devices or []
+        self.allowed_devs = {d for d in allowed_devices if isinstance(d, int)}
+        self.allowed_paths = {str(Path(d).expanduser()) for d in allowed_devices if not isinstance(d, int)}
+
+        self.skipped_mounts = []
+        self.partial_paths = []
+
+    def fstype(self, path):
+        """Filesystem type of the mount containing path"""
+
+        path = str(path)
+        best = ''
+        for mount_point in self.mounts:
+            if (path == mount_point or path.startswith(mount_point.rstrip('/') + '/')) \
+                    and len(mount_point) > len(best):
+                best = mount_point
+        return self.mounts.get(best, '')
+
+    def is_slow(self, path):
+        fstype = self.fstype(path)
+        return fstype in SLOW_FSTYPES or fstype.startswith('fuse') or fstype.endswith('fuse')
+
+    def may_cross(self, path, dev=None):
+        """Whether a traversal may descend into another filesystem at path"""
+
+        if not self.one_filesystem:
+            return True
+        return str(path) in self.allowed_paths or (dev is not None and dev in self.allowed_devs)
+
+    def is_mount_point(self, path):
+        return str(path) in self.mounts
+
+    def stat(self, path, slow=False):
+        """os.lstat, under the watchdog when the filesystem is slow"""
+
+        if not slow:
+            return os.lstat(path)
+        return self._with_timeout(os.lstat, path)
+
+    def list_directory(self, path, slow=False, skip_hidden=False, root=None, exclusions=None):
+        """
+        List a directory as [(name, path, lstat_result)]
+
+        Mount points that may not be crossed are dropped before they are
+        stat'ed, since stat on a dead mount point blocks. Entries matched by
+        `exclusions` (default: the policy's rules; anchored patterns are
+        relative to `root`) are dropped the same way. Raises ListingTimeout
+        if a slow listing exceeds the timeout.
+        """
+
+        rules = self.exclusions if exclusions is None else exclusions
+
+        def list_entries():
+            entries = []
+            with os.scandir(path) as it:
+                for entry in it:
+                    if skip_hidden and entry.name.startswith('.'):
+                        continue
+                    try:
+                        if rules and rules.excluded(entry.path, entry.name, entry.is_dir(follow_symlinks=False),
+                                                    root, lambda: entry.stat(follow_symlinks=False)):
+                            continue
+                        if entry.path in self.mounts:
+                            if (self.one_filesystem and not self.allowed_devs
+                                    and not self.may_cross(entry.path)):
+                                self.skipped_mounts.append(entry.path)
+                                continue
+                            st = self.stat(entry.path, self.is_slow(entry.path))
+                        else:
+                            st = entry.stat(follow_symlinks=False)
+                    except ListingTimeout:
+                        self.partial_paths.append(entry.path)
+                        continue
+                    except OSError:
+                        continue
+                    entries.append((entry.name, entry.path, st))
+            return entries
+
+        if self.budget is not None:
+            self.budget.acquire()
+        if not slow:
+            return list_entries()
+        return self._with_timeout(list_entries)
+
+    def _with_timeout(self, func, *args):
+        """Run func in a daemon thread; abandon it if it exceeds the timeout"""
+
+        outcome = {}
+
+        def worker():
+            try:
+                outcome['result'] = func(*args)
+            except BaseException as e:
+                outcome['error'] = e
+
+        thread = threading.Thread(target=worker, daemon=True)
+        thread.start()
+        thread.join(self.timeout)
+
+        if thread.is_alive():
+            raise ListingTimeout(f'Timed out after {self.timeout}s: {args[0] if args else func}')
+        if 'error' in outcome:
+            raise outcome['error']
+        return outcome['result']
+
+    def enter(self, parent_dev, path, st):
+        """
+        Check whether a traversal may descend into a child directory
+
+        Returns (allowed, slow) for the child.
+        """
+
+        if st.st_dev != parent_dev or self.is_mount_point(path):
+            if not self.may_cross(path, st.st_dev):
+                self.skipped_mounts.append(str(path))
+                return False, False
+            return True, self.is_slow(path)
+        return True, None
+
+
+MB = 1024 * 1024
+GB = 1024 * MB
+
+# Directory names that usually hold a lot of data, with a rough size guess
+HEAVY_DIRECTORY_HINTS = {
+    'com.docker.docker': 20 * GB,
+    'CoreSimulator': 10 * GB,
+    'Photos Library.photoslibrary': 10 * GB,
+    'DerivedData': 5 * GB,
+    'Containers': 5 * GB,
+    'Group Containers': 2 * GB,
+    'Caches': 2 * GB,
+    'Application Support': 2 * GB,
+    'Movies': 2 * GB,
+    'Developer': 2 * GB,
+    '.cache': 1 * GB,
+    '.docker': 1 * GB,
+    'node_modules': 500 * MB,
+    'Cellar': 500 * MB,
+    '.conda': 500 * MB,
+    'venv': 300 * MB,
+    '.venv': 300 * MB,
+    'site-packages': 300 * MB,
+    '.git': 100 * MB,
+}
+
+
+class SizeHints:
+    """
+    Expected subtree sizes for ordering traversal largest-first
+
+    Sizes recorded by earlier scans win; otherwise directories with a known
+    heavy name get a rough guess and everything else 0, so unknown siblings
+    keep their listing order.
+    """
+
+    def __init__(self, previous_sizes=None, heuristics=None):
+        self.previous = previous_sizes or {}
+        self.heuristics = HEAVY_DIRECTORY_HINTS if heuristics is None else heuristics
+
+    def expected(self, path):
+        previous = self.previous.get(str(path))
+        if previous is not None:
+            return previous[0] if isinstance(previous, (tuple, list)) else previous
+        return self.heuristics.get(os.path.basename(str(path)), 0)
+
+    def order(self, entries):
+        """Sort (name, path, ...) entries by expected size, largest first"""
+        return sorted(entries, key=lambda entry: self.expected(entry[1]), reverse=True)
+
+
+def walk(top, policy=None, cancel_token=None, hints=None, exclusions=None):
+    """
+    os.walk replacement that honours a MountPolicy
+
+    Yields (root, dirs, files) top-down; callers may prune `dirs` in place.
+    Directories that time out are recorded in policy.partial_paths. With
+    `hints` (SizeHints), the pending directories form one priority queue,
+    so the subtrees expected to be largest are visited first. Entries
+    matched by `exclusions` (default: the policy's) are never yielded or
+    entered; anchored patterns are relative to `top`.
+    """
+
+    policy = policy or MountPolicy()
+    top = str(Path(top).expanduser())
+
+    try:
+        top_stat = os.stat(top)
+    except OSError:
+        return
+
+    # Heap of (-expected size, sequence, directory); without hints every
+    # priority is 0 and the sequence makes it a plain depth-first stack
+    sequence = 0
+    stack = [(0, sequence, (top, top_stat.st_dev, policy.is_slow(top)))]
+    while stack:
+        if cancel_token:
+            cancel_token.raise_if_cancelled()
+
+        _, _, (root, dev, slow) = heapq.heappop(stack)
+        try:
+            entries = policy.list_directory(root, slow, root=top, exclusions=exclusions)
+        except ListingTimeout:
+            policy.partial_paths.append(root)
+            continue
+        except OSError:
+            continue
+
+        dirs, files, subdirs = [], [], {}
+        for name, path, st in entries:
+            if stat_module.S_ISDIR(st.st_mode):
+                allowed, child_slow = policy.enter(dev, path, st)
+                if allowed:
+                    dirs.append(name)
+                    subdirs[name] = (path, st.st_dev, slow if child_slow is None else child_slow)
+            elif not stat_module.S_ISLNK(st.st_mode):
+                files.append(name)
+
+        yield root, dirs, files
+
+        for name in reversed(dirs):
+            if name in subdirs:
+                sequence -= 1
+                priority = -hints.expected(subdirs[name][0]) if hints else 0
+                heapq.heappush(stack, (priority, sequence, subdirs[name]))
+
+
+def subtree_hash(node):
+    """
+    Aggregate hash of a directory: its files' (name, size, mtime) plus each
+    child's (name, hash). Equal hashes mean identical subtrees, so diffs can
+    skip them without descending. Access times are excluded.
+    """
+
+    digest = hashlib.sha1()
+    for name, size, mtime, _ in sorted(node['files']):
+        digest.update(f'f\0{name}\0{size}\0{mtime}\n'.encode('utf-8', 'surrogateescape'))
+    for child in sorted(node['children'], key=lambda c: c['name']):
+        digest.update(f'd\0{child["name"]}\0{child["hash"]}\n'.encode('utf-8', 'surrogateescape'))
+    return digest.hexdigest()
+
+
+def iter_nodes(node):
+    """Yield a scan node and all of its descendants"""
+
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        yield current
+        stack.extend(current['children'])
+
+
+class ScanCheckpoint:
+    """On-disk record of completed subtrees for one scan root and rule set"""
+
+    def __init__(self, checkpoint_file, root, rules=''):
+        self.checkpoint_file = Path(checkpoint_file).expanduser()
+        self.root = str(root)
+        self.rules = rules
+
+    def load(self):
+        """Return the completed subtree nodes saved for this root"""
+
+        if not self.checkpoint_file.exists():
+            return []
+
+        try:
+            with open(self.checkpoint_file, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return []
+
+        # Subtrees recorded under other exclusion rules hold other entries
+        if data.get('root') != self.root or data.get('rules', '') != self.rules:
+            return []
+
+        return data.get('completed', [])
+
+    def save(self, completed):
+        data = {
+            'root': self.root,
+            'rules': self.rules,
+            'saved_at': datetime.now().isoformat(),
+            'completed': completed
+        }
+
+        atomic_write_json(self.checkpoint_file, data)
+
+    def clear(self):
+        try:
+            self.checkpoint_file.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class TreeScanner:
+    """
+    Walk a directory tree once, building a node per directory
+
+    Each node holds the directory's own files as [name, size, mtime, atime]
+    rows plus recursive size/file_count totals, a recursive rollup (see
+    rollups.py) and its child nodes.
+
+    Observers receive add_file(path, size, mtime, atime) for every file and
+    add_directory(path, size, file_count) for every finished directory.
+
+    With `hints` (SizeHints), each directory's subdirectories are scanned
+    largest-expected first, so the big subtrees finish (and reach the
+    observers) early. `progress(scanner)` is called at most every
+    `progress_interval` seconds while scanning, for publishing partial
+    results.
+    """
+
+    def __init__(self, root, cancel_token=None, checkpoint_file=None,
+                 checkpoint_interval=30.0, skip_hidden=True, policy=None, observers=None,
+                 hints=None, progress=None, progress_interval=2.0):
+        self.root = Path(root).expanduser()
+        self.cancel_token = cancel_token or CancellationToken()
+        self.policy = policy or MountPolicy()
+        self.observers = observers or []
+        self.checkpoint = (ScanCheckpoint(checkpoint_file, self.root, self.policy.exclusions.signature)
+                           if checkpoint_file else None)
+        self.checkpoint_interval = checkpoint_interval
+        self.skip_hidden = skip_hidden
+        self.hints = hints
+        self.progress = progress
+        self.progress_interval = progress_interval
+
+        self.stats = {'directories_scanned': 0, 'directories_reused': 0, 'files': 0}
+        self.partial_paths = []
+        self.now = time.time()
+        self._completed = {}   # path -> top-most finished subtree nodes
+        self._resumable = {}   # path -> node from a previous interrupted run
+        self._last_checkpoint = time.monotonic()
+        self._last_progress = time.monotonic()
+
+    def scan(self):
+        """Scan the tree, resuming from a checkpoint if one exists"""
+
+        if self.checkpoint:
+            for node in self.checkpoint.load():
+                for descendant in iter_nodes(node):
+                    self._resumable[descendant['path']] = descendant
+            if self._resumable:
+                print(f"♻️  Resuming scan of {self.root} from checkpoint "
+                      f"({len(self._resumable)} directories recorded)")
+
+        try:
+            root_stat = os.stat(self.root)
+            tree = self._scan_dir(str(self.root), self.root.name, root_stat.st_mtime,
+                                  root_stat.st_dev, self.policy.is_slow(self.root))
+        except (ScanCancelled, KeyboardInterrupt):
+            self.save_checkpoint()
+            raise
+
+        if self.checkpoint:
+            self.checkpoint.clear()
+
+        return tree
+
+    def save_checkpoint(self):
+        if self.checkpoint and self._completed:
+            self.checkpoint.save(list(self._completed.values()))
+        self._last_checkpoint = time.monotonic()
+
+    def _unchanged(self, node):
+        """True if no directory in a recorded subtree was modified since"""
+
+        for current in iter_nodes(node):
+            try:
+                if os.stat(current['path']).st_mtime != current['mtime']:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def _complete(self, node):
+        for child in node['children']:
+            self._completed.pop(child['path'], None)
+        self._completed[node['path']] = node
+
+        if self.checkpoint and time.monotonic() - self._last_checkpoint > self.checkpoint_interval:
+            self.save_checkpoint()
+
+        if self.progress and time.monotonic() - self._last_progress > self.progress_interval:
+            self._last_progress = time.monotonic()
+            self.progress(self)
+
+    @property
+    def skipped_mounts(self):
+        return self.policy.skipped_mounts
+
+    def _scan_dir(self, path, name, mtime, dev, slow):
+        self.cancel_token.raise_if_cancelled()
+
+        previous = self._resumable.get(path)
+        if (previous is not None and previous['mtime'] == mtime and 'rollup' in previous
+                and 'hash' in previous and self._unchanged(previous)):
+            for reused in iter_nodes(previous):
+                self.stats['directories_reused'] += 1
+                self._observe(reused)
+            self._complete(previous)
+            return previous
+
+        node = {
+            'path': path,
+            'name': name,
+            'mtime': mtime,
+            'dev': dev,
+            'size': 0,
+            'file_count': 0,
+            'files': [],
+            'children': [],
+            'rollup': rollups.new_rollup(self.now)
+        }
+
+        try:
+            entries = self.policy.list_directory(path, slow, self.skip_hidden, root=str(self.root))
+        except ListingTimeout:
+            # Dead or very slow mount: record and move on rather than stall
+            print(f"⚠️  Listing timed out, skipping: {path}")
+            node['partial'] = True
+            self.partial_paths.append(path)
+            entries = []
+        except (PermissionError, OSError):
+            entries = []
+
+        if self.hints:
+            entries = self.hints.order(entries)
+
+        for entry_name, entry_path, stat in entries:
+            if stat_module.S_ISDIR(stat.st_mode):
+                allowed, child_slow = self.policy.enter(dev, entry_path, stat)
+                if not allowed:
+                    continue
+                child = self._scan_dir(entry_path, entry_name, stat.st_mtime, stat.st_dev,
+                                       slow if child_slow is None else child_slow)
+                node['children'].append(child)
+                node['size'] += child['size']
+                node['file_count'] += child['file_count']
+                rollups.merge(node['rollup'], child['rollup'])
+                if child.get('partial'):
+                    node['partial'] = True
+
+            elif stat_module.S_ISREG(stat.st_mode):
+                node['files'].append([entry_name, stat.st_size, stat.st_mtime, stat.st_atime])
+                rollups.add_file(node['rollup'], entry_name, stat.st_size, stat.st_mtime, stat.st_atime)
+                node['size'] += stat.st_size
+                node['file_count'] += 1
+                self.stats['files'] += 1
+
+        node['hash'] = subtree_hash(node)
+        self.stats['directories_scanned'] += 1
+        self._observe(node)
+        self._complete(node)
+        return node
+
+    def _observe(self, node):
+        for observer in self.observers:
+            for name, size, mtime, atime in node['files']:
+                observer.add_file(os.path.join(node['path'], name), size, mtime, atime)
+            observer.add_directory(node['path'], node['size'], node['file_count'])
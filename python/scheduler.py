@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+"""
+Job Scheduler - Named periodic jobs for the File Management Daemon
+
+Features:
+- Interval ("every 5m") and cron-style ("0 2 * * *") schedules
+- Off-peak windows for heavy jobs ("01:00-06:00")
+- Random jitter so a fleet of machines doesn't hit shared storage at once
+- Exponential backoff on failure
+- Missed-run handling when the daemon was not running
+- Persisted last-run state
+- Optional shared worker pool: due jobs run concurrently, bounded by the
+  pool size however many jobs are registered
+"""
+
+import json
+import random
+import re
+import threading
+from pathlib import Path
+from datetime import datetime, timedelta
+
+from snapshot_store import atomic_write_json
+
+
+class JobCancelled(Exception):
+    """Raised by a job that was interrupted; it stays due and is not counted as a failure"""
+
+
+class CronSchedule:
+    """Five-field cron expression: minute hour day-of-month month day-of-week"""
+
+    FIELD_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 6)]
+
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f'Cron expression needs 5 fields: {expression!r}')
+
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, self.weekdays = [
+            self._parse_field(field, low, high)
+            for field, (low, high) in zip(fields, self.FIELD_RANGES)
+        ]
+        # Cron semantics: if both day fields are restricted, either may match
+        self.day_restricted = fields[2] != '*'
+        self.weekday_restricted = fields[4] != '*'
+
+    def _parse_field(self, field, low, high):
+        values = set()
+
+        for part in field.split(','):
+            step = 1
+            if '/' in part:
+                part, step = part.split('/', 1)
+                step = int(step)
+
+            if part == '*':
+                start, end = low, high
+            elif '-' in part:
+                start, end = (int(v) for v in part.split('-', 1))
+            else:
+                start = end = int(part)
+
+            if start < low or end > high + (1 if high == 6 else 0) or start > end or step < 1:
+                raise ValueError(f'Invalid cron field: {field!r}')
+
+            values.update(range(start, end + 1, step))
+
+        # Allow 7 as an alias for Sunday
+        if high == 6 and 7 in values:
+            values.discard(7)
+            values.add(0)
+
+        return values
+
+    def _day_matches(self, dt):
+        cron_weekday = (dt.weekday() + 1) % 7  # Python: Monday=0, cron: Sunday=0
+        day_ok = dt.day in self.days
+        weekday_ok = cron_weekday in self.weekdays
+
+        if self.day_restricted and self.weekday_restricted:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def next_after(self, dt):
+        """First matching minute strictly after dt"""
+
+        candidate = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=366 * 5)
+
+        while candidate < limit:
+            if candidate.month not in self.months:
+                year = candidate.year + (candidate.month == 12)
+                month = candidate.month % 12 + 1
+                candidate = candidate.replace(year=year, month=month, day=1, hour=0, minute=0)
+                continue
+
+            if not self._day_matches(candidate):
+                candidate = (candidate + timedelta(days=1)).replace(hour=0, minute=0)
+                continue
+
+            if candidate.hour not in self.hours:
+                candidate = (candidate + timedelta(hours=1)).replace(minute=0)
+                continue
+
+            if candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+                continue
+
+            return candidate
+
+        raise ValueError(f'Cron expression never fires: {self.expression!r}')
+
+    def __str__(self):
+        return self.expression
+
+
+class IntervalSchedule:
+    """Fixed interval between runs"""
+
+    UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+    def __init__(self, seconds):
+        if seconds <= 0:
+            raise ValueError('Interval must be positive')
+        self.seconds = seconds
+
+    def next_after(self, dt):
+        return dt + timedelta(seconds=self.seconds)
+
+    def __str__(self):
+        return f'every {self.seconds}s'
+
+
+def parse_schedule(spec):
+    """
+    Build a schedule from a config value
+
+    Accepts seconds (int), "every 15m" / "every 2h", cron macros
+    (@hourly, @daily, @weekly, @monthly) or a five-field cron expression.
+    """
+
+    if isinstance(spec, (int, float)):
+        return IntervalSchedule(spec)
+
+    spec = spec.strip()
+    macros = {
+        '@hourly': '0 * * * *',
+        '@daily': '0 0 * * *',
+        '@nightly': '0 0 * * *',
+        '@weekly': '0 0 * * 0',
+        '@monthly': '0 0 1 * *',
+    }
+
+    if spec in macros:
+        return CronSchedule(macros[spec])
+
+    match = re.fullmatch(r'every\s+(\d+)\s*([smhdw])', spec)
+    if match:
+        return IntervalSchedule(int(match.group(1)) * IntervalSchedule.UNITS[match.group(2)])
+
+    return CronSchedule(spec)
+
+
+class OffPeakWindow:
+    """Daily time window such as "01:00-06:00" (may wrap past midnight)"""
+
+    def __init__(self, spec):
+        start, end = spec.split('-', 1)
+        self.spec = spec
+        self.start = self._parse_time(start)
+        self.end = self._parse_time(end)
+
+    @staticmethod
+    def _parse_time(value):
+        hours, minutes = value.strip().split(':')
+        return int(hours) * 60 + int(minutes)
+
+    def contains(self, dt):
+        minute = dt.hour * 60 + dt.minute
+        if self.start <= self.end:
+            return self.start <= minute < self.end
+        return minute >= self.start or minute < self.end
+
+    def next_start(self, dt):
+        """Next time the window opens at or after dt"""
+        start = dt.replace(hour=self.start // 60, minute=self.start % 60, second=0, microsecond=0)
+        if start < dt:
+            start += timedelta(days=1)
+        return start
+
+    def remaining(self, dt):
+        """Seconds left in the window that contains dt"""
+        minute = dt.hour * 60 + dt.minute + dt.second / 60
+        end = self.end if self.end > minute else self.end + 24 * 60
+        return (end - minute) * 60
+
+
+class ScheduledJob:
+    """A named job with its schedule, constraints and run state"""
+
+    def __init__(self, name, func, schedule, windows=None, jitter=0,
+                 catch_up='run_once', base_backoff=60, max_backoff=6 * 3600):
+        if catch_up not in ('run_once', 'skip'):
+            raise ValueError(f'Unknown catch_up policy: {catch_up}')
+
+        self.name = name
+        self.func = func
+        self.schedule = parse_schedule(schedule) if not hasattr(schedule, 'next_after') else schedule
+        self.windows = [w if isinstance(w, OffPeakWindow) else OffPeakWindow(w) for w in (windows or [])]
+        self.jitter = jitter
+        self.catch_up = catch_up
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        self.last_run = None
+        self.last_success = None
+        self.last_error = None
+        self.failures = 0
+        self.next_run = None
+        self.running = False
+
+    def to_state(self):
+        return {
+            'last_run': self.last_run.isoformat() if self.last_run else None,
+            'last_success': self.last_success.isoformat() if self.last_success else None,
+            'last_error': self.last_error,
+            'failures': self.failures,
+            'next_run': self.next_run.isoformat() if self.next_run else None,
+        }
+
+    def load_state(self, state):
+        def parse(value):
+            return datetime.fromisoformat(value) if value else None
+
+        self.last_run = parse(state.get('last_run'))
+        self.last_success = parse(state.get('last_success'))
+        self.last_error = state.get('last_error')
+        self.failures = state.get('failures', 0)
+        self.next_run = parse(state.get('next_run'))
+
+    def status(self):
+        status = self.to_state()
+        status.update({
+            'name': self.name,
+            'schedule': str(self.schedule),
+            'windows': [w.spec for w in self.windows],
+            'running': self.running,
+        })
+        return status
+
+
+class JobScheduler:
+    """
+    Runs named jobs on their schedules, persisting state between restarts
+
+    Without a pool, due jobs run one after another on the calling thread;
+    with one (a concurrent.futures executor) they are submitted to it.
+    """
+
+    def __init__(self, state_file=None, rng=None, pool=None):
+        self.state_file = Path(state_file).expanduser() if state_file else None
+        self.pool = pool
+        self.jobs = {}
+        self.rng = rng or random.Random()
+        self._lock = threading.Lock()
+        self._saved_state = self._load_state()
+
+    def _load_state(self):
+        if self.state_file and self.state_file.exists():
+            try:
+                with open(self.state_file, 'r') as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                return {}
+        return {}
+
+    def save_state(self):
+        """Persist last-run state for every job"""
+
+        if not self.state_file:
+            return
+
+        with self._lock:
+            state = {name: job.to_state() for name, job in self.jobs.items()}
+        atomic_write_json(self.state_file, state, indent=2)
+
+    def add_job(self, name, func, schedule, now=None, **options):
+        """
+        Register a job
+
+        Args:
+            name: Unique job name
+            func: Callable run with no arguments; raising marks the run failed
+            schedule: Seconds, "every 10m", cron macro or cron expression
+            **options: windows, jitter, catch_up, base_backoff, max_backoff
+        """
+
+        now = now or datetime.now()
+        job = ScheduledJob(name, func, schedule, **options)
+
+        if name in self._saved_state:
+            job.load_state(self._saved_state[name])
+
+        if job.next_run is None:
+            # First time we see this job: run now (inside its window)
+            job.next_run = self._constrain(job, now)
+        elif job.next_run < now:
+            # Daemon was down when the job was due
+            if job.catch_up == 'run_once':
+                job.next_run = self._constrain(job, now)
+            else:
+                job.next_run = self._plan_next(job, now)
+
+        self.jobs[name] = job
+        return job
+
+    def _constrain(self, job, when, jitter=True):
+        """Apply jitter and push `when` into the job's off-peak windows"""
+
+        if jitter and job.jitter:
+            when += timedelta(seconds=self.rng.uniform(0, job.jitter))
+
+        if not job.windows or any(w.contains(when) for w in job.windows):
+            return when
+
+        window = min(job.windows, key=lambda w: w.next_start(when))
+        start = window.next_start(when)
+        # Spread the start across the window as well, so a fleet doesn't all
+        # fire at the moment it opens
+        if jitter and job.jitter:
+            span = min(job.jitter, window.remaining(start))
+            start += timedelta(seconds=self.rng.uniform(0, span))
+        return start
+
+    def _plan_next(self, job, now):
+        return self._constrain(job, job.schedule.next_after(now))
+
+    def _backoff(self, job, now):
+        delay = min(job.base_backoff * (2 ** (job.failures - 1)), job.max_backoff)
+        # Retries respect windows but not jitter; they are already spread out
+        return self._constrain(job, now + timedelta(seconds=delay), jitter=False)
+
+    def due_jobs(self, now=None):
+        now = now or datetime.now()
+        return [job for job in self.jobs.values()
+                if not job.running and job.next_run and job.next_run <= now]
+
+    def run_job(self, job, now=None):
+        """Run one job and reschedule it"""
+
+        with self._lock:
+            if job.running:
+                return False
+            job.running = True
+
+        return self._execute(job, now)
+
+    def _execute(self, job, now=None):
+        """Run a job already marked running, then reschedule it"""
+
+        started = now or datetime.now()
+        job.last_run = started
+
+        try:
+            job.func()
+        except JobCancelled:
+            # Leave next_run untouched so the job resumes on the next start
+            print(f"⏸️  Job '{job.name}' cancelled; it will resume on the next run")
+            success = False
+        except Exception as e:
+            finished = datetime.now() if now is None else now
+            job.failures += 1
+            job.last_error = str(e)
+            job.next_run = self._backoff(job, finished)
+            print(f"❌ Job '{job.name}' failed ({job.failures}x): {e}. "
+                  f"Retrying at {job.next_run.strftime('%Y-%m-%d %H:%M:%S')}")
+            success = False
+        else:
+            finished = datetime.now() if now is None else now
+            job.failures = 0
+            job.last_error = None
+            job.last_success = finished
+            job.next_run = self._plan_next(job, finished)
+            success = True
+        finally:
+            job.running = False
+            self.save_state()
+
+        return success
+
+    def run_pending(self, now=None):
+        """Run every job that is due; returns the names of jobs that ran"""
+
+        ran = []
+        for job in sorted(self.due_jobs(now), key=lambda j: j.next_run):
+            if self.pool is None:
+                self.run_job(job, now)
+            else:
+                with self._lock:
+                    if job.running:
+                        continue
+                    job.running = True
+                self.pool.submit(self._execute, job, now)
+            ran.append(job.name)
+        return ran
+
+    def next_wakeup(self):
+        # Jobs running on the pool are rescheduled when they finish
+        pending = [job.next_run for job in self.jobs.values() if job.next_run and not job.running]
+        return min(pending) if pending else None
+
+    def run_forever(self, stop_event, max_sleep=60):
+        """Run jobs until stop_event is set"""
+
+        while not stop_event.is_set():
+            self.run_pending()
+
+            wakeup = self.next_wakeup()
+            delay = max_sleep
+            if wakeup:
+                delay = max(0, min(max_sleep, (wakeup - datetime.now()).total_seconds()))
+            stop_event.wait(delay)
+
+    def status(self):
+        return {name: job.status() for name, job in self.jobs.items()}
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Single Flight - Coalesced, version-keyed command results
+
+Features:
+- Identical calls (same key) made while one is running wait for that run
+  instead of starting their own
+- Results cached per key and data version: a repeat for the same version
+  is answered from memory, a new version recomputes
+- Bounded, least-recently-used cache
+- ETags derived from key and version, so a client revalidating an
+  unchanged result costs neither a computation nor a response body
+"""
+
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """
+    Run func once per (key, version), however many callers ask at once
+
+    do() returns (value, how) where how is 'hit' (cached), 'shared' (joined
+    a run in flight) or 'miss' (ran it). Only values for which
+    `cacheable(value)` holds are kept; exceptions are shared with the
+    callers that joined but never cached.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        # Per process, so ETags from before a restart never match
+        self.epoch = f'{os.getpid()}.{time.time()}'
+        self.stats = {'hits': 0, 'shared': 0, 'misses': 0}
+        self._cache = OrderedDict()   # key -> (version, value)
+        self._inflight = {}           # key -> (version, Future)
+        self._lock = threading.Lock()
+
+    def etag(self, key, version):
+        digest = hashlib.sha1(f'{self.epoch}\0{version}\0{key}'.encode('utf-8')).hexdigest()
+        return f'"{digest[:20]}"'
+
+    def do(self, key, version, func, cacheable=None):
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and cached[0] == version:
+                self._cache.move_to_end(key)
+                self.stats['hits'] += 1
+                return cached[1], 'hit'
+
+            running = self._inflight.get(key)
+            if running is not None and running[0] == version:
+                future = running[1]
+                self.stats['shared'] += 1
+                owner = False
+            else:
+                future = Future()
+                self._inflight[key] = (version, future)
+                self.stats['misses'] += 1
+                owner = True
+
+        if not owner:
+            return future.result(), 'shared'
+
+        try:
+            value = func()
+        except BaseException as e:
+            with self._lock:
+                if self._inflight.get(key, (None, None))[1] is future:
+                    del self._inflight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            if self._inflight.get(key, (None, None))[1] is future:
+                del self._inflight[key]
+            if cacheable is None or cacheable(value):
+                self._cache[key] = (version, value)
+                self._cache.move_to_end(key)
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+        future.set_result(value)
+        return value, 'miss'
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Snapshot Store - Copy-on-write publication of analysis results
+
+Features:
+- Atomic JSON writes (unique temp file + fsync + rename)
+- Immutable, numbered versions published by a pointer swap
+- Lock-free readers: a reader holds one version for as long as it needs it
+- Old versions reclaimed by reference count
+"""
+
+import os
+import json
+import threading
+import time
+from pathlib import Path
+from datetime import datetime
+
+
+def atomic_write_json(path, data, **dump_kwargs):
+    """
+    Write JSON so readers see either the old file or the new one, never a
+    partial write. The temp name is unique per process and thread, so
+    concurrent writers don't clobber each other's temp files.
+    """
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = path.with_name(f'.{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+
+    try:
+        with open(tmp_file, 'w') as f:
+            json.dump(data, f, **dump_kwargs)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, path)
+    except BaseException:
+        try:
+            tmp_file.unlink()
+        except OSError:
+            pass
+        raise
+
+
+class Snapshot:
+    """One published version; its data must be treated as read-only"""
+
+    def __init__(self, version, data, published_at, path=None):
+        self.version = version
+        self.data = data
+        self.published_at = published_at
+        self.path = path
+
+    def info(self):
+        return {
+            'version': self.version,
+            'published_at': datetime.fromtimestamp(self.published_at).isoformat()
+        }
+
+
+class SnapshotStore:
+    """
+    Versioned, copy-on-write store for one kind of result
+
+    A writer builds a complete result off to the side and calls publish().
+    The version file is written first, then the `<name>_current.json`
+    pointer is atomically replaced, then the in-memory pointer is swapped.
+    In-process readers call acquire()/release() (or use `with
+    store.reading() as snapshot`); other processes call read_current().
+    A superseded version is deleted once no reader holds it, except for the
+    `keep` newest, which stay for readers in other processes.
+    """
+
+    def __init__(self, directory, name='analysis', keep=2):
+        self.directory = Path(directory).expanduser()
+        self.versions_dir = self.directory / 'versions'
+        self.name = name
+        self.keep = keep
+        self.pointer_file = self.directory / f'{name}_current.json'
+
+        self._lock = threading.Lock()
+        self._current = None
+        self._refs = {}       # version -> active readers
+        self._retired = {}    # version -> Snapshot awaiting reclaim
+
+        self._current = self.read_current()
+
+    def _version_file(self, version):
+        return self.versions_dir / f'{self.name}_v{version:08d}.json'
+
+    def _next_version(self):
+        versions = [self._current.version] if self._current else [0]
+        if self.versions_dir.exists():
+            for version_file in self.versions_dir.glob(f'{self.name}_v*.json'):
+                try:
+                    versions.append(int(version_file.stem.rsplit('_v', 1)[1]))
+                except ValueError:
+                    continue
+        return max(versions) + 1
+
+    def publish(self, data):
+        """Publish data as a new immutable version and make it current"""
+
+        with self._lock:
+            version = self._next_version()
+            published_at = time.time()
+            version_file = self._version_file(version)
+
+            atomic_write_json(version_file, {
+                'version': version, 'published_at': published_at, 'data': data
+            }, default=str)
+            atomic_write_json(self.pointer_file, {
+                'version': version, 'published_at': published_at, 'file': version_file.name
+            })
+
+            previous = self._current
+            self._current = Snapshot(version, data, published_at, version_file)
+            if previous is not None:
+                self._retired[previous.version] = previous
+            self._reclaim()
+
+        return self._current
+
+    def current(self):
+        """Current snapshot without taking a reference (for one-shot reads)"""
+        return self._current
+
+    def acquire(self):
+        """Take a reference to the current snapshot; pair with release()"""
+
+        with self._lock:
+            snapshot = self._current
+            if snapshot is not None:
+                self._refs[snapshot.version] = self._refs.get(snapshot.version, 0) + 1
+            return snapshot
+
+    def release(self, snapshot):
+        if snapshot is None:
+            return
+
+        with self._lock:
+            remaining = self._refs.get(snapshot.version, 0) - 1
+            if remaining > 0:
+                self._refs[snapshot.version] = remaining
+            else:
+                self._refs.pop(snapshot.version, None)
+            self._reclaim()
+
+    def reading(self):
+        """Context manager yielding the current snapshot while holding a reference"""
+
+        store = self
+
+        class _Reading:
+            def __enter__(self):
+                self.snapshot = store.acquire()
+                return self.snapshot
+
+            def __exit__(self, *exc):
+                store.release(self.snapshot)
+                return False
+
+        return _Reading()
+
+    def _reclaim(self):
+        """Delete retired versions with no readers, keeping the newest few on disk"""
+
+        newest = self._current.version if self._current else 0
+        for version in sorted(self._retired):
+            if self._refs.get(version):
+                continue
+            snapshot = self._retired.pop(version)
+            if version <= newest - self.keep and snapshot.path is not None:
+                try:
+                    snapshot.path.unlink()
+                except OSError:
+                    pass
+
+        # Versions left behind by earlier processes
+        if self.versions_dir.exists():
+            for version_file in self.versions_dir.glob(f'{self.name}_v*.json'):
+                try:
+                    version = int(version_file.stem.rsplit('_v', 1)[1])
+                except ValueError:
+                    continue
+                if version <= newest - self.keep and not self._refs.get(version):
+                    try:
+                        version_file.unlink()
+                    except OSError:
+                        pass
+
+    def read_current(self, retries=3):
+        """
+        Load the current version from disk (for readers in other processes)
+
+        If the version named by the pointer is reclaimed between reading the
+        pointer and opening it, the pointer is simply read again.
+        """
+
+        for _ in range(retries):
+            try:
+                with open(self.pointer_file, 'r') as f:
+                    pointer = json.load(f)
+                with open(self.versions_dir / pointer['file'], 'r') as f:
+                    stored = json.load(f)
+            except FileNotFoundError:
+                if not self.pointer_file.exists():
+                    return None
+                continue
+            except (OSError, ValueError, KeyError):
+                return None
+
+            return Snapshot(stored['version'], stored['data'], stored['published_at'],
+                            self.versions_dir / pointer['file'])
+
+        return None
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Subscriptions - Changed aggregates pushed to clients watching subtrees
+
+Features:
+- Clients watch paths (any directory inside a scanned root) and/or
+  categories (extension classes such as 'video' or 'pdf', across roots)
+- When the ScanIndex replaces a tree, only the watched directories are
+  looked up, and those whose subtree hash is unchanged are skipped, so the
+  work done is proportional to the number of watches and to what changed
+- A client first receives the current aggregates (size, file count and
+  histograms), then only deltas: size/count changes and the histogram
+  cells that moved
+- Coalescing: updates arriving while a client is within its delivery
+  interval are merged, and deltas are always taken against what the client
+  last received, so a burst of rescans costs one message
+- Bounded memory per client: one aggregate per watch, never a backlog
+"""
+
+import os
+import itertools
+import threading
+import time
+
+import rollups
+
+# Longest accepted delivery interval, in seconds
+MAX_INTERVAL = 3600
+
+
+def find_node(tree, root, path):
+    """Node for `path` inside the tree scanned at `root`, else None"""
+
+    if tree is None:
+        return None
+    root = str(root).rstrip('/')
+    if path == root:
+        return tree
+    if not path.startswith(root + '/'):
+        return None
+    node = tree
+    for part in path[len(root) + 1:].split('/'):
+        node = next((child for child in node['children'] if child['name'] == part), None)
+        if node is None:
+            return None
+    return node
+
+
+def path_aggregate(node):
+    return {'size': node['size'], 'file_count': node['file_count'],
+            'histograms': rollups.summary(node['rollup'])}
+
+
+def category_aggregate(rollup, ext_class):
+    """Totals and age histogram of one extension class in a rollup"""
+
+    count = size = 0
+    by_age = {}
+    for key, (cell_count, cell_bytes) in rollup['cube'].items():
+        cls, age, _ = key.split('|')
+        if cls != ext_class:
+            continue
+        count += cell_count
+        size += cell_bytes
+        label = rollups.AGE_BUCKETS[int(age)][1]
+        cell = by_age.setdefault(label, {'count': 0, 'bytes': 0})
+        cell['count'] += cell_count
+        cell['bytes'] += cell_bytes
+    return {'size': size, 'file_count': count, 'histograms': {'by_modified_age': by_age}}
+
+
+def _sum_aggregates(parts):
+    total = {'size': 0, 'file_count': 0, 'histograms': {}}
+    for part in parts:
+        total['size'] += part['size']
+        total['file_count'] += part['file_count']
+        for name, histogram in part['histograms'].items():
+            target = total['histograms'].setdefault(name, {})
+            for key, cell in histogram.items():
+                merged = target.setdefault(key, {'count': 0, 'bytes': 0})
+                merged['count'] += cell['count']
+                merged['bytes'] += cell['bytes']
+    return total
+
+
+def aggregate_delta(old, new):
+    """What changed from `old` to `new` (either may be None); None if nothing did"""
+
+    if new is None:
+        return None if old is None else {'removed': True}
+    old = old or {'size': 0, 'file_count': 0, 'histograms': {}}
+
+    histograms = {}
+    for name, histogram in new['histograms'].items():
+        before = old['histograms'].get(name, {})
+        cells = {}
+        for key in set(histogram) | set(before):
+            now = histogram.get(key, {'count': 0, 'bytes': 0})
+            then = before.get(key, {'count': 0, 'bytes': 0})
+            if now != then:
+                cells[key] = {'count': now['count'] - then['count'], 'bytes': now['bytes'] - then['bytes']}
+        if cells:
+            histograms[name] = cells
+
+    if new['size'] == old['size'] and new['file_count'] == old['file_count'] and not histograms:
+        return None
+    return {
+        'size': new['size'],
+        'size_delta': new['size'] - old['size'],
+        'file_count': new['file_count'],
+        'count_delta': new['file_count'] - old['file_count'],
+        'histograms': histograms
+    }
+
+
+class Subscription:
+    """
+    One client's watches
+
+    next_message() blocks until something changed, waits out the rest of
+    the delivery interval so a burst collapses into one message, and
+    returns the deltas against what was last delivered.
+    """
+
+    def __init__(self, subscription_id, paths, categories, interval):
+        self.id = subscription_id
+        self.paths = [os.path.normpath(os.path.expanduser(path)) for path in paths]
+        self.categories = list(categories)
+        self.interval = interval
+        self.current = {}      # key -> aggregate (None: not found)
+        self.delivered = {}    # key -> aggregate the client has
+        self.dirty = set()
+        self.closed = False
+        self._category_parts = {}   # category -> {root: aggregate}
+        self._last_delivery = 0.0
+        self._cond = threading.Condition()
+
+    @staticmethod
+    def category_key(category):
+        return f'category:{category}'
+
+    def _set(self, key, aggregate):
+        if self.current.get(key) != aggregate or key not in self.current:
+            self.current[key] = aggregate
+            self.dirty.add(key)
+
+    def tree_replaced(self, root, old, new):
+        root = str(root).rstrip('/')
+        with self._cond:
+            changed = False
+            for path in self.paths:
+                new_node = find_node(new, root, path)
+                if new_node is None and not (path == root or path.startswith(root + '/')):
+                    continue
+                old_node = find_node(old, root, path)
+                if (old_node is not None and new_node is not None and path in self.current
+                        and old_node.get('hash') == new_node.get('hash')):
+                    continue
+                self._set(path, path_aggregate(new_node) if new_node is not None else None)
+                changed = True
+
+            if self.categories and not (old is not None and new is not None
+                                        and old.get('hash') == new.get('hash')):
+                for category in self.categories:
+                    parts = self._category_parts.setdefault(category, {})
+                    if new is None:
+                        parts.pop(root, None)
+                    else:
+                        parts[root] = category_aggregate(new['rollup'], category)
+                    self._set(self.category_key(category), _sum_aggregates(parts.values()))
+                    changed = True
+
+            if changed and self.dirty:
+                self._cond.notify_all()
+
+    def snapshot(self):
+        """Current aggregates; they count as delivered"""
+
+        with self._cond:
+            self.delivered = dict(self.current)
+            self.dirty.clear()
+            self._last_delivery = time.monotonic()
+            return dict(self.current)
+
+    def next_message(self, timeout=None):
+        """{key: delta} once something changed (None on timeout or close)"""
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not self.dirty and not self.closed:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            if self.closed:
+                return None
+
+            # Coalescing window: later updates overwrite `current` meanwhile
+            wait = self._last_delivery + self.interval - time.monotonic()
+            while wait > 0 and not self.closed:
+                self._cond.wait(wait)
+                wait = self._last_delivery + self.interval - time.monotonic()
+
+            changes = {}
+            for key in self.dirty:
+                delta = aggregate_delta(self.delivered.get(key), self.current.get(key))
+                if delta is not None:
+                    changes[key] = delta
+                self.delivered[key] = self.current.get(key)
+            self.dirty.clear()
+            self._last_delivery = time.monotonic()
+            return changes
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+class SubscriptionHub:
+    """
+    Subscriptions over one ScanIndex
+
+    Registers itself as a listener of the index; every tree the index
+    replaces is offered to each subscription.
+    """
+
+    def __init__(self, scan_index, default_interval=1.0):
+        self.scan_index = scan_index
+        self.default_interval = default_interval
+        self.subscriptions = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        scan_index.add_listener(self.tree_replaced)
+
+    def subscribe(self, paths=(), categories=(), interval=None):
+        """New subscription, primed with the index's current trees"""
+
+        interval = self.default_interval if interval is None else min(interval, MAX_INTERVAL)
+        subscription = Subscription(next(self._ids), paths, categories, interval)
+        # Registered and primed with no tree replaced in between, so the
+        # first delta follows straight on from the snapshot
+        with self.scan_index.holding_updates():
+            with self._lock:
+                self.subscriptions[subscription.id] = subscription
+            for root, entry in self.scan_index.data['roots'].items():
+                subscription.tree_replaced(root, None, entry['tree'])
+            for path in subscription.paths:
+                subscription.current.setdefault(path, None)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscription.close()
+        with self._lock:
+            self.subscriptions.pop(subscription.id, None)
+
+    def tree_replaced(self, root, old, new):
+        with self._lock:
+            subscriptions = list(self.subscriptions.values())
+        for subscription in subscriptions:
+            subscription.tree_replaced(root, old, new)
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The modules import each other as siblings, as when run from python/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
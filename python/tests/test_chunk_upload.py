@@ -0,0 +1,136 @@
+import os
+import random
+
+import pytest
+
+from chunk_upload import ChunkUploader, LocalDirectoryBackend, chunk_boundaries
+
+# Small chunks keep the files (and the tests) small
+SIZES = {'min_size': 4 * 1024, 'avg_size': 16 * 1024, 'max_size': 64 * 1024}
+
+
+def _data(size, seed=1):
+    return random.Random(seed).randbytes(size)
+
+
+def _digests(path):
+    import hashlib
+    with open(path, 'rb') as f:
+        return [hashlib.sha256(data).hexdigest()
+                for _, data in chunk_boundaries(f, SIZES['min_size'], SIZES['avg_size'], SIZES['max_size'])]
+
+
+class FailingBackend(LocalDirectoryBackend):
+    """Stores `allowed` chunks, then fails like a dropped connection"""
+
+    def __init__(self, root, allowed):
+        super().__init__(root)
+        self.allowed = allowed
+
+    def put(self, key, data):
+        if key.startswith('chunks/'):
+            if self.allowed <= 0:
+                raise OSError('connection reset')
+            self.allowed -= 1
+        super().put(key, data)
+
+
+def test_boundaries_survive_an_insert(tmp_path):
+    original = _data(1024 * 1024)
+    middle = len(original) // 2
+    (tmp_path / 'a').write_bytes(original)
+    (tmp_path / 'b').write_bytes(original[:middle] + b'x' * 110 + original[middle:])
+
+    before, after = _digests(tmp_path / 'a'), _digests(tmp_path / 'b')
+    assert len(before) > 20
+    # Only the chunk holding the insert (and at most its neighbour) changes
+    assert len(set(after) - set(before)) <= 2
+
+
+def test_chunks_reassemble_the_file(tmp_path):
+    data = _data(300 * 1024, seed=2)
+    (tmp_path / 'a').write_bytes(data)
+    with open(tmp_path / 'a', 'rb') as f:
+        chunks = list(chunk_boundaries(f, SIZES['min_size'], SIZES['avg_size'], SIZES['max_size']))
+    assert b''.join(chunk for _, chunk in chunks) == data
+    assert [offset for offset, _ in chunks] == [sum(len(c) for _, c in chunks[:i]) for i in range(len(chunks))]
+
+
+def test_restore_round_trip(tmp_path):
+    source = tmp_path / 'report.bin'
+    source.write_bytes(_data(500 * 1024, seed=3))
+    uploader = ChunkUploader(LocalDirectoryBackend(tmp_path / 'target'), tmp_path / 'state', **SIZES)
+
+    stats = uploader.upload([(source, 'report.bin')])
+    assert stats['files_uploaded'] == 1
+    assert stats['bytes_uploaded'] == source.stat().st_size
+
+    restored = uploader.restore('report.bin', tmp_path / 'restored' / 'report.bin')
+    assert open(restored, 'rb').read() == source.read_bytes()
+    assert int(os.stat(restored).st_mtime) == int(source.stat().st_mtime)
+
+
+def test_changed_file_sends_only_changed_chunks(tmp_path):
+    source = tmp_path / 'a'
+    original = _data(1024 * 1024, seed=4)
+    source.write_bytes(original)
+    backend = LocalDirectoryBackend(tmp_path / 'target')
+    ChunkUploader(backend, tmp_path / 'state', **SIZES).upload([(source, 'a')])
+
+    source.write_bytes(original[:1000] + b'edit' + original[1000:])
+    uploader = ChunkUploader(backend, tmp_path / 'state', **SIZES)
+    stats = uploader.upload([(source, 'a')])
+    assert stats['chunks_reused'] > 0
+    assert stats['bytes_uploaded'] < 2 * SIZES['max_size']
+    uploader.restore('a', tmp_path / 'restored')
+    assert (tmp_path / 'restored').read_bytes() == source.read_bytes()
+
+
+def test_interrupted_upload_resumes(tmp_path):
+    source = tmp_path / 'a'
+    source.write_bytes(_data(1024 * 1024, seed=5))
+
+    failing = ChunkUploader(FailingBackend(tmp_path / 'target', allowed=10), tmp_path / 'state',
+                            workers=1, **SIZES)
+    first = failing.upload([(source, 'a')])
+    assert 'error' in first['files'][0]
+    assert first['chunks_new'] == 10
+
+    uploader = ChunkUploader(LocalDirectoryBackend(tmp_path / 'target'), tmp_path / 'state', **SIZES)
+    second = uploader.upload([(source, 'a')])
+    assert second['files_resumed'] == 1
+    assert second['chunks_reused'] >= 10
+    assert first['bytes_uploaded'] + second['bytes_uploaded'] == source.stat().st_size
+
+    uploader.restore('a', tmp_path / 'restored')
+    assert (tmp_path / 'restored').read_bytes() == source.read_bytes()
+
+
+def test_each_target_gets_every_chunk(tmp_path):
+    source = tmp_path / 'a'
+    source.write_bytes(_data(200 * 1024, seed=6))
+    ChunkUploader(LocalDirectoryBackend(tmp_path / 'A'), tmp_path / 'state', **SIZES).upload([(source, 'a')])
+
+    uploader = ChunkUploader(LocalDirectoryBackend(tmp_path / 'B'), tmp_path / 'state', **SIZES)
+    stats = uploader.upload([(source, 'a')])
+    assert stats['files_skipped'] == 0
+    assert stats['bytes_uploaded'] == source.stat().st_size
+
+    uploader.restore('a', tmp_path / 'restored')
+    assert (tmp_path / 'restored').read_bytes() == source.read_bytes()
+
+
+def test_completed_file_is_skipped_only_while_its_manifest_exists(tmp_path):
+    source = tmp_path / 'a'
+    source.write_bytes(_data(100 * 1024, seed=7))
+    backend = LocalDirectoryBackend(tmp_path / 'target')
+    ChunkUploader(backend, tmp_path / 'state', **SIZES).upload([(source, 'a')])
+
+    again = ChunkUploader(backend, tmp_path / 'state', **SIZES).upload([(source, 'a')])
+    assert again['files_skipped'] == 1
+
+    os.unlink(tmp_path / 'target' / ChunkUploader.manifest_key('a'))
+    uploader = ChunkUploader(backend, tmp_path / 'state', **SIZES)
+    assert uploader.upload([(source, 'a')])['files_uploaded'] == 1
+    with pytest.raises(FileNotFoundError):
+        uploader.restore('missing', tmp_path / 'nothing')
@@ -0,0 +1,113 @@
+import os
+import random
+
+import pytest
+
+import plan_executor
+from identical_files import find_identical
+from plan_executor import PlanExecutor
+
+
+class Crash(BaseException):
+    """Stands in for the process dying"""
+
+
+def _write(path, data, mtime=None):
+    path.write_bytes(data)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return str(path)
+
+
+@pytest.fixture
+def files(tmp_path):
+    data = random.Random(1).randbytes(256 * 1024)
+    root = tmp_path / 'files'
+    root.mkdir()
+    keeper = _write(root / 'original.bin', data, mtime=1_600_000_000)
+    copy = _write(root / 'copy.bin', data, mtime=1_700_000_000)
+    return root, keeper, copy
+
+
+def _link_plan(keeper, copy, method='auto'):
+    st = os.stat(copy)
+    return [{'op': 'link', 'src': copy, 'dst': keeper, 'method': method,
+             'size': st.st_size, 'mtime': st.st_mtime}]
+
+
+def test_identical_files_become_links(tmp_path, files):
+    root, keeper, copy = files
+    entries = [(path, os.stat(path).st_size, os.stat(path).st_mtime) for path in (keeper, copy)]
+    sets = find_identical(entries, min_size=1)
+    assert len(sets) == 1 and sets[0]['keeper'] == keeper
+
+    blocks = os.stat(copy).st_blocks * 512
+    summary = PlanExecutor(tmp_path / 'journal').execute(_link_plan(keeper, copy))
+
+    assert summary['linked'] == 1 and not summary['failed']
+    assert summary['bytes_reclaimed'] == blocks > 0
+    assert open(copy, 'rb').read() == open(keeper, 'rb').read()
+    if os.stat(copy).st_ino == os.stat(keeper).st_ino:
+        assert os.stat(keeper).st_nlink == 2           # hardlink (tmpfs, ext4)
+    else:
+        assert int(os.stat(copy).st_mtime) == 1_700_000_000   # reflink (btrfs, APFS)
+
+
+def test_files_with_other_links_reclaim_nothing(tmp_path, files):
+    root, keeper, copy = files
+    os.link(copy, root / 'another-name.bin')
+    summary = PlanExecutor(tmp_path / 'journal').execute(_link_plan(keeper, copy, 'hardlink'))
+    assert summary['linked'] == 1
+    assert summary['bytes_reclaimed'] == 0
+
+
+def test_rollback_restores_an_independent_copy(tmp_path, files):
+    root, keeper, copy = files
+    mode = os.stat(copy).st_mode
+    executor = PlanExecutor(tmp_path / 'journal')
+    summary = executor.execute(_link_plan(keeper, copy, 'hardlink'), commit=False)
+    assert os.path.samefile(copy, keeper)
+
+    assert executor.rollback(summary['plan_id']) == 1
+    assert not os.path.samefile(copy, keeper)
+    assert open(copy, 'rb').read() == open(keeper, 'rb').read()
+    assert os.stat(copy).st_mode == mode
+    assert int(os.stat(copy).st_mtime) == 1_700_000_000
+    assert executor.open_plans() == {}
+
+
+def test_changed_content_is_not_linked(tmp_path, files):
+    root, keeper, copy = files
+    plan = _link_plan(keeper, copy)
+    with open(copy, 'r+b') as f:
+        f.write(b'changed')
+    os.utime(copy, (plan[0]['mtime'], plan[0]['mtime']))
+
+    summary = PlanExecutor(tmp_path / 'journal').execute(plan)
+    assert summary['linked'] == 0
+    assert 'differ' in summary['failed'][0]['error']
+
+
+def test_crash_between_link_and_replace(tmp_path, files, monkeypatch):
+    root, keeper, copy = files
+    # A user's own file with the old temporary suffix must survive
+    users_file = _write(root / 'copy.bin.dedup', b'keep me')
+
+    def crash(*args):
+        raise Crash()
+
+    monkeypatch.setattr(plan_executor.os, 'replace', crash)
+    with pytest.raises(Crash):
+        PlanExecutor(tmp_path / 'journal').execute(_link_plan(keeper, copy, 'hardlink'))
+    monkeypatch.undo()
+
+    leftovers = [name for name in os.listdir(root) if name.startswith('.copy.bin.')]
+    assert len(leftovers) == 1                      # the temporary link was made
+    assert not os.path.samefile(copy, keeper)       # src was never replaced
+
+    executor = PlanExecutor(tmp_path / 'journal')
+    assert list(executor.recover().values()) == ['rolled forward']
+    assert os.path.samefile(copy, keeper)
+    assert [name for name in os.listdir(root) if name.startswith('.copy.bin.')] == []
+    assert open(users_file, 'rb').read() == b'keep me'
+    assert executor.open_plans() == {}
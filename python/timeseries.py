@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Time-Series Store - Compact storage trend history
+
+Features:
+- Per-folder and per-category totals recorded at each analysis
+- Downsampling: raw points -> hourly -> daily -> weekly
+- Retention per tier, so the file stays small forever
+- Trend (bytes/day) and forecast queries over any series
+"""
+
+import json
+import time
+from pathlib import Path
+
+from snapshot_store import atomic_write_json
+
+HOUR = 3600
+DAY = 24 * HOUR
+WEEK = 7 * DAY
+
+# (tier, bucket width in seconds, how long points stay in this tier)
+DEFAULT_RETENTION = [
+    ('raw', None, 2 * DAY),
+    ('hourly', HOUR, 30 * DAY),
+    ('daily', DAY, 365 * DAY),
+    ('weekly', WEEK, 5 * 365 * DAY),
+]
+
+
+class TimeSeriesStore:
+    """
+    Multi-resolution series store kept in one JSON file
+
+    Every tier holds points as [timestamp, mean, min, max, count]. When a
+    point ages out of its tier it is folded into the next coarser tier;
+    points older than the last tier's retention are dropped.
+    """
+
+    def __init__(self, store_file, retention=None):
+        self.store_file = Path(store_file).expanduser()
+        self.retention = retention or DEFAULT_RETENTION
+        self.series = {}
+        self.load()
+
+    def load(self):
+        if self.store_file.exists():
+            try:
+                with open(self.store_file, 'r') as f:
+                    self.series = json.load(f).get('series', {})
+            except (OSError, ValueError):
+                self.series = {}
+        return self
+
+    def save(self):
+        atomic_write_json(self.store_file, {'series': self.series})
+
+    def record(self, values, timestamp=None):
+        """Append one point per series: values is {series_name: number}"""
+
+        timestamp = timestamp or time.time()
+        for name, value in values.items():
+            tiers = self.series.setdefault(name, {tier: [] for tier, _, _ in self.retention})
+            tiers[self.retention[0][0]].append([timestamp, value, value, value, 1])
+        self.compact(timestamp)
+
+    def compact(self, now=None):
+        """Fold aged-out points into coarser tiers and apply retention"""
+
+        now = now or time.time()
+
+        for tiers in self.series.values():
+            for index, (tier, _, keep) in enumerate(self.retention):
+                points = tiers.setdefault(tier, [])
+                cutoff = now - keep
+                expired = [p for p in points if p[0] < cutoff]
+                if not expired:
+                    continue
+
+                tiers[tier] = [p for p in points if p[0] >= cutoff]
+                if index + 1 < len(self.retention):
+                    next_tier, width, _ = self.retention[index + 1]
+                    tiers[next_tier] = self._fold(tiers.setdefault(next_tier, []), expired, width)
+
+        # Drop series with no points left
+        for name in [n for n, tiers in self.series.items() if not any(tiers.values())]:
+            del self.series[name]
+
+    @staticmethod
+    def _fold(target, points, width):
+        """Merge points into width-aligned buckets, combining with existing ones"""
+
+        buckets = {p[0]: p for p in target}
+        for ts, mean, low, high, count in points:
+            start = ts - ts % width
+            bucket = buckets.get(start)
+            if bucket is None:
+                buckets[start] = [start, mean, low, high, count]
+            else:
+                total = bucket[4] + count
+                bucket[1] = (bucket[1] * bucket[4] + mean * count) / total
+                bucket[2] = min(bucket[2], low)
+                bucket[3] = max(bucket[3], high)
+                bucket[4] = total
+        return sorted(buckets.values())
+
+    def names(self, prefix=''):
+        return sorted(name for name in self.series if name.startswith(prefix))
+
+    def query(self, name, start=None, end=None):
+        """[(timestamp, mean)] across all tiers, oldest first"""
+
+        tiers = self.series.get(name, {})
+        points = [(p[0], p[1]) for tier, _, _ in self.retention for p in tiers.get(tier, [])]
+        return sorted(p for p in points
+                      if (start is None or p[0] >= start) and (end is None or p[0] <= end))
+
+    def trend(self, name, days=30, now=None):
+        """
+        Least-squares growth over the last `days`
+
+        Returns {'slope_per_day', 'latest', 'points'} or None with fewer
+        than two points.
+        """
+
+        now = now or time.time()
+        points = self.query(name, start=now - days * DAY)
+        if len(points) < 2:
+            return None
+
+        n = len(points)
+        mean_t = sum(t for t, _ in points) / n
+        mean_v = sum(v for _, v in points) / n
+        variance = sum((t - mean_t) ** 2 for t, _ in points)
+        if variance == 0:
+            return None
+        slope = sum((t - mean_t) * (v - mean_v) for t, v in points) / variance
+
+        return {
+            'slope_per_day': slope * DAY,
+            'latest': points[-1][1],
+            'latest_at': points[-1][0],
+            'points': n
+        }
+
+    def forecast(self, name, days_ahead, history_days=30, now=None):
+        """Projected value `days_ahead` from the latest point (linear trend)"""
+
+        trend = self.trend(name, history_days, now)
+        if trend is None:
+            return None
+        return trend['latest'] + trend['slope_per_day'] * days_ahead
+
+
+def prune_reports(directory, pattern, keep=20):
+    """Delete all but the newest `keep` files matching pattern; returns deleted paths"""
+
+    reports = sorted(Path(directory).expanduser().glob(pattern))
+    deleted = reports[:-keep] if keep else reports
+    for report in deleted:
+        try:
+            report.unlink()
+        except OSError:
+            continue
+    return deleted
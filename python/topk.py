@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Top-K Heavy Hitters - Bounded-memory "largest N" tracking during scans
+
+Features:
+- Heap-based TopK: O(K) memory, O(log K) per update
+- Largest files and directories anywhere in a scan
+- Oldest large files
+- Fastest-growing directories by category (caches, node_modules, venvs...)
+- HeavyHitters safe to feed from concurrent scans
+"""
+
+import heapq
+import itertools
+import threading
+import time
+
+
+class TopK:
+    """Keep the k highest-scoring items seen so far"""
+
+    def __init__(self, k):
+        self.k = k
+        self._heap = []  # min-heap of (score, seq, key, item), stale entries included
+        self._seq = itertools.count()
+        self._keys = {}  # key -> (score, seq) of its live entry, for keys in the heap
+        self._stale = 0  # entries superseded by a higher score for their key
+
+    def _is_stale(self, entry):
+        return entry[2] is not None and self._keys.get(entry[2]) != entry[:2]
+
+    def _drop_stale(self):
+        """Keep a live entry on top; compact once stale entries outnumber k"""
+
+        if self._stale > self.k:
+            self._heap = [entry for entry in self._heap if not self._is_stale(entry)]
+            heapq.heapify(self._heap)
+            self._stale = 0
+        while self._heap and self._is_stale(self._heap[0]):
+            heapq.heappop(self._heap)
+            self._stale -= 1
+
+    def push(self, score, item, key=None):
+        """
+        Offer an item; returns True if it is currently in the top k
+
+        Items offered twice under the same key (e.g. a file reached by two
+        overlapping scans) are kept once, with the higher score: a file that
+        grew in between gets a new entry and the old one is skipped from
+        then on (lazy deletion, so O(log K) amortized). Only keys in the
+        heap are remembered: an evicted key is below the threshold, which
+        never drops.
+        """
+
+        seq = next(self._seq)
+        if key is not None and key in self._keys:
+            if score > self._keys[key][0]:
+                heapq.heappush(self._heap, (score, seq, key, item))
+                self._keys[key] = (score, seq)
+                self._stale += 1
+                self._drop_stale()
+            return True
+
+        if len(self) < self.k:
+            heapq.heappush(self._heap, (score, seq, key, item))
+        elif score > self._heap[0][0]:
+            evicted = heapq.heapreplace(self._heap, (score, seq, key, item))
+            self._keys.pop(evicted[2], None)
+        else:
+            return False
+
+        if key is not None:
+            self._keys[key] = (score, seq)
+        self._drop_stale()
+        return True
+
+    def threshold(self):
+        """Lowest score that is still kept (None until the heap is full)"""
+        return self._heap[0][0] if len(self) >= self.k else None
+
+    def items(self):
+        """Items ordered from highest to lowest score"""
+        live = [entry for entry in self._heap if not self._is_stale(entry)]
+        return [entry[3] for entry in sorted(live, key=lambda e: (e[0], -e[1]), reverse=True)]
+
+    def __len__(self):
+        return len(self._heap) - self._stale
+
+
+def categorize(path):
+    """Storage category of a directory path, used for growth tracking"""
+
+    lowered = path.lower()
+    name = lowered.rstrip('/').rsplit('/', 1)[-1]
+
+    if '/node_modules' in lowered:
+        return 'node_modules'
+    if name in ('venv', '.venv', 'env') or '/venv/' in lowered or '/.venv/' in lowered:
+        return 'python_venv'
+    if 'com.docker.docker' in lowered or '/docker' in lowered:
+        return 'docker'
+    if '/caches' in lowered or 'cache' in name:
+        return 'caches'
+    if lowered.endswith('.app') or '.app/' in lowered:
+        return 'applications'
+    return 'other'
+
+
+class HeavyHitters:
+    """
+    Streaming heavy-hitter reports fed file by file during traversal
+
+    Args:
+        k: Entries kept per report
+        large_file_threshold: Minimum size (bytes) for the oldest-large-files report
+        previous_sizes: {directory_path: (size, timestamp)} from an earlier scan,
+                        used to compute growth rates
+    """
+
+    def __init__(self, k=20, large_file_threshold=100 * 1024 * 1024, previous_sizes=None):
+        self.k = k
+        self.large_file_threshold = large_file_threshold
+        self.previous_sizes = previous_sizes or {}
+        self.now = time.time()
+
+        self.largest_files = TopK(k)
+        self.largest_directories = TopK(k)
+        self.oldest_large_files = TopK(k)
+        self.fastest_growing = {}
+        self._lock = threading.Lock()
+
+    def add_file(self, path, size, mtime, atime=None):
+        with self._lock:
+            self.largest_files.push(size, (path, size, mtime), key=path)
+
+            if size >= self.large_file_threshold:
+                # Older files score higher
+                self.oldest_large_files.push(-mtime, (path, size, mtime), key=path)
+
+    def add_directory(self, path, size, file_count=0):
+        with self._lock:
+            self._add_directory(path, size, file_count)
+
+    def _add_directory(self, path, size, file_count):
+        self.largest_directories.push(size, (path, size, file_count), key=path)
+
+        previous = self.previous_sizes.get(path)
+        if previous:
+            prev_size, prev_time = previous
+            elapsed_days = (self.now - prev_time) / (24 * 3600)
+            growth = size - prev_size
+            if elapsed_days > 0 and growth > 0:
+                category = categorize(path)
+                if category not in self.fastest_growing:
+                    self.fastest_growing[category] = TopK(self.k)
+                self.fastest_growing[category].push(growth / elapsed_days, (path, size, growth, elapsed_days),
+                                                    key=path)
+
+    def report(self, format_size):
+        """Serializable report of every tracked ranking"""
+
+        with self._lock:
+            return self._report(format_size)
+
+    def _report(self, format_size):
+        def file_entry(item):
+            path, size, mtime = item
+            return {
+                'path': path,
+                'size': size,
+                'size_formatted': format_size(size),
+                'age_days': round((self.now - mtime) / (24 * 3600), 1)
+            }
+
+        return {
+            'largest_files': [file_entry(item) for item in self.largest_files.items()],
+            'largest_directories': [
+                {'path': path, 'size': size, 'size_formatted': format_size(size), 'file_count': count}
+                for path, size, count in self.largest_directories.items()
+            ],
+            'oldest_large_files': [file_entry(item) for item in self.oldest_large_files.items()],
+            'fastest_growing': {
+                category: [
+                    {
+                        'path': path,
+                        'size': size,
+                        'size_formatted': format_size(size),
+                        'growth': growth,
+                        'growth_formatted': format_size(growth),
+                        'growth_per_day': format_size(growth / days)
+                    }
+                    for path, size, growth, days in top.items()
+                ]
+                for category, top in self.fastest_growing.items()
+            }
+        }